@@ -2,7 +2,7 @@ import streamlit as st
 from ui.layout import set_page_config, display_banner, initialize_chat_history, display_chat_history
 from ui.sidebar import configure_sidebar
 from services.chat_service import handle_user_input
-from services.indexing_service import run_web_indexing_mode, run_file_indexing_mode
+from ui.indexing import run_web_indexing_mode, run_file_indexing_mode
 
 def main():
     # Set up the Streamlit page configuration
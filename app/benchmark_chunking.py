@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import random
+import argparse
+from statistics import mean
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from config.settings import CHUNK_PROFILES
+from utils.chunker import StructuredChunker, markdown_heading, text_heading
+from utils.token_counter import count_text_tokens
+
+# Compare the structured chunker with the previous character splitter, run from app/ with:
+# python benchmark_chunking.py [files...] [--size-mb 5] [--repeat 3]
+
+WORDS = (
+    "aluno matrícula disciplina prazo calendário acadêmico coordenação curso semestre trancamento "
+    "estágio bolsa monitoria requerimento secretaria colegiado regimento frequência avaliação nota"
+).split()
+
+def synthetic_regulation(size_chars: int, seed: int = 7) -> str:
+    """Generate a regulation-like text with chapters, articles, paragraphs and wrapped lines."""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    chapter = article = 0
+    while total < size_chars:
+        if article % 8 == 0:
+            chapter += 1
+            parts.append(f"\nCAPÍTULO {chapter}\nDAS NORMAS DO {rng.choice(WORDS).upper()}\n")
+        article += 1
+        sentences = [" ".join(rng.choices(WORDS, k=rng.randint(8, 25))).capitalize() + "." for _ in range(rng.randint(2, 6))]
+        body = " ".join(sentences)
+        lines = [body[i:i + 90] for i in range(0, len(body), 90)]
+        parts.append(f"Art. {article}º " + "\n".join(lines))
+        parts.append(f"§ 1º {' '.join(rng.choices(WORDS, k=15)).capitalize()}.\n")
+        total += sum(len(part) for part in parts[-2:])
+    return "\n".join(parts)
+
+def load_documents(paths: list) -> list:
+    """Extract (source type, documents) pairs from files with the indexing extractors."""
+    from utils.text_extractor import iter_documents_from_file
+    loaded = []
+    for path in paths:
+        file_ext = os.path.splitext(path)[-1].lower()
+        with open(path, "rb") as f:
+            loaded.append((file_ext, list(iter_documents_from_file(f, file_ext, os.path.basename(path)))))
+    return loaded
+
+def run(name: str, chunker, documents: list, repeat: int) -> dict:
+    """Chunk the documents several times and report the best throughput with chunk statistics."""
+    best = float("inf")
+    chunks = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = [chunk for document in documents for chunk in chunker.split_documents([document])]
+        best = min(best, time.perf_counter() - start)
+
+    source_chars = sum(len(document.page_content) for document in documents)
+    tokens = [count_text_tokens(chunk.page_content) for chunk in chunks] or [0]
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "avg_tokens": round(mean(tokens), 1),
+        "max_tokens": max(tokens),
+        "stored_ratio": round(sum(len(chunk.page_content) for chunk in chunks) / max(source_chars, 1), 3),
+        "seconds": round(best, 4),
+        "mb_per_s": round(source_chars / 1e6 / best, 2) if best else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the document chunkers.")
+    parser.add_argument("files", nargs="*", help="PDF, DOCX or TXT files, a synthetic regulation is used when omitted")
+    parser.add_argument("--size-mb", type=float, default=5.0, help="Size of the synthetic text")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per chunker, the fastest is reported")
+    args = parser.parse_args()
+
+    if args.files:
+        corpora = load_documents(args.files)
+    else:
+        text = synthetic_regulation(int(args.size_mb * 1e6))
+        corpora = [(".pdf", [Document(page_content=text, metadata={"source": "synthetic"})])]
+
+    for source_type, documents in corpora:
+        chunk_size, chunk_overlap = CHUNK_PROFILES.get(source_type, CHUNK_PROFILES[".txt"])
+        heading_detector = markdown_heading if source_type == "html" else text_heading
+        chunkers = [
+            ("recursive 1000/200 chars", RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)),
+            (f"structured {chunk_size}/{chunk_overlap} tokens", StructuredChunker(chunk_size, chunk_overlap, heading_detector, fast_path_chars=sys.maxsize)),
+            (f"structured {chunk_size}/{chunk_overlap} fast path", StructuredChunker(chunk_size, chunk_overlap, heading_detector, fast_path_chars=0)),
+        ]
+        sources = ", ".join(sorted({document.metadata.get("source", "") for document in documents}))
+        print(f"\n{source_type} - {sources} - {sum(len(d.page_content) for d in documents) / 1e6:.2f} MB in {len(documents)} documents")
+        for name, chunker in chunkers:
+            print(run(name, chunker, documents, args.repeat))
+
+if __name__ == "__main__":
+    sys.exit(main())
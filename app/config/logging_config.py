@@ -46,6 +46,18 @@ class EnhancedLogger:
     def llm_tool_last_message(self, llm_role_info, message):
         self.logger.info(f"[#6819B3][LLM TOOL][/#6819B3] [#4169E1][{llm_role_info}][/#4169E1] '{message}'\n")
 
+    def pool(self, pool_info, stats):
+        self.logger.info(f"[#1E90FF][POOL][/#1E90FF] [#4169E1][{pool_info}][/#4169E1] {stats}\n")
+
+    def cache(self, cache_info, stats):
+        self.logger.info(f"[#1E90FF][CACHE][/#1E90FF] [#4169E1][{cache_info}][/#4169E1] {stats}\n")
+
+    def retrieval(self, retrieval_info, stats):
+        self.logger.info(f"[#6819B3][RETRIEVAL][/#6819B3] [#4169E1][{retrieval_info}][/#4169E1] {stats}\n")
+
+    def route(self, decision, stats):
+        self.logger.info(f"[#6819B3][ROUTER][/#6819B3] [#4169E1][{decision.route or 'llm fallback'}][/#4169E1] confidence={decision.confidence:.3f} reason={decision.reason} {stats}\n")
+
     def parser_error(self, parser_status):
         self.logger.error(f"[#FF4F4F][PARSER][/#FF4F4F] {parser_status}\n")
 
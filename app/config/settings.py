@@ -0,0 +1,129 @@
+import os
+
+# Vector store registry
+VECTORSTORE_REGISTRY_MAX_SIZE = int(os.getenv("VECTORSTORE_REGISTRY_MAX_SIZE", "8"))
+VECTORSTORE_REGISTRY_IDLE_TTL = float(os.getenv("VECTORSTORE_REGISTRY_IDLE_TTL", "900"))
+PINECONE_POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "4"))
+
+# Local cache directory shared by the on-disk caches
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"))
+
+# Persistent embedding cache
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(CACHE_DIR, "embeddings.sqlite"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Source manifest for incremental re-indexing
+INDEX_MANIFEST_PATH = os.getenv("INDEX_MANIFEST_PATH", os.path.join(CACHE_DIR, "index_manifest.sqlite"))
+
+# Batched indexing pipeline
+INDEXING_BATCH_SIZE = int(os.getenv("INDEXING_BATCH_SIZE", "64"))
+INDEXING_EMBED_WORKERS = int(os.getenv("INDEXING_EMBED_WORKERS", "2"))
+INDEXING_UPSERT_WORKERS = int(os.getenv("INDEXING_UPSERT_WORKERS", "4"))
+INDEXING_MAX_PENDING_BATCHES = int(os.getenv("INDEXING_MAX_PENDING_BATCHES", "8"))
+
+# Parallel file extraction
+PARALLEL_EXTRACTION_ENABLED = os.getenv("PARALLEL_EXTRACTION_ENABLED", "true").lower() == "true"
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+
+# Streaming ZIP ingestion limits
+ZIP_MAX_TOTAL_BYTES = int(os.getenv("ZIP_MAX_TOTAL_BYTES", str(4 * 1024 * 1024 * 1024)))
+ZIP_MAX_MEMBER_BYTES = int(os.getenv("ZIP_MAX_MEMBER_BYTES", str(512 * 1024 * 1024)))
+ZIP_MAX_COMPRESSION_RATIO = float(os.getenv("ZIP_MAX_COMPRESSION_RATIO", "100"))
+ZIP_SPOOL_THRESHOLD = int(os.getenv("ZIP_SPOOL_THRESHOLD", str(16 * 1024 * 1024)))
+
+# Page-streaming extraction
+STREAMING_EXTRACTION_ENABLED = os.getenv("STREAMING_EXTRACTION_ENABLED", "true").lower() == "true"
+
+# Headless browser pool for web indexing
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "4"))
+BROWSER_WAIT_UNTIL = os.getenv("BROWSER_WAIT_UNTIL", "domcontentloaded")
+BROWSER_WAIT_FOR_SELECTOR = os.getenv("BROWSER_WAIT_FOR_SELECTOR") or None
+BROWSER_TIMEOUT_MS = int(os.getenv("BROWSER_TIMEOUT_MS", "30000"))
+BROWSER_BLOCKED_RESOURCES = [r for r in os.getenv("BROWSER_BLOCKED_RESOURCES", "image,font,media").split(",") if r]
+
+# Main-content extraction for web pages
+HTML_CONTENT_EXTRACTION_ENABLED = os.getenv("HTML_CONTENT_EXTRACTION_ENABLED", "true").lower() == "true"
+HTML_BOILERPLATE_PATH = os.getenv("HTML_BOILERPLATE_PATH", os.path.join(CACHE_DIR, "html_boilerplate.sqlite"))
+
+# Multi-page site crawl for web indexing
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "2"))
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "50"))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+CRAWL_HOST_DELAY = float(os.getenv("CRAWL_HOST_DELAY", "0.5"))
+CRAWL_USE_SITEMAP = os.getenv("CRAWL_USE_SITEMAP", "true").lower() == "true"
+
+# Conditional re-fetch and plain HTTP fast path for web indexing
+WEB_FETCH_STATE_PATH = os.getenv("WEB_FETCH_STATE_PATH", os.path.join(CACHE_DIR, "web_fetch_state.sqlite"))
+WEB_HTTP_FAST_PATH_ENABLED = os.getenv("WEB_HTTP_FAST_PATH_ENABLED", "true").lower() == "true"
+WEB_STATIC_MIN_TEXT_CHARS = int(os.getenv("WEB_STATIC_MIN_TEXT_CHARS", "500"))
+WEB_HTTP_TIMEOUT = float(os.getenv("WEB_HTTP_TIMEOUT", "15"))
+WEB_USER_AGENT = os.getenv("WEB_USER_AGENT", "Mozilla/5.0 (compatible; CampusDocsAssistant/1.0)")
+WEB_HTTP_RECHECK_INTERVAL = float(os.getenv("WEB_HTTP_RECHECK_INTERVAL", str(6 * 3600)))
+
+# Vector store backend ("pinecone" or "local")
+VECTORSTORE_BACKEND = os.getenv("VECTORSTORE_BACKEND", "pinecone")
+LOCAL_VECTORSTORE_DIR = os.getenv("LOCAL_VECTORSTORE_DIR", os.path.join(CACHE_DIR, "local_indexes"))
+LOCAL_VECTORSTORE_COMPACT_RATIO = float(os.getenv("LOCAL_VECTORSTORE_COMPACT_RATIO", "0.3"))
+
+# Semantic query cache in front of the retrieve tool
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+QUERY_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("QUERY_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+
+# Final-answer cache for generate
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(CACHE_DIR, "answers.sqlite"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+# Local query router in front of the LLM tool decision
+QUERY_ROUTER_ENABLED = os.getenv("QUERY_ROUTER_ENABLED", "true").lower() == "true"
+QUERY_ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("QUERY_ROUTER_CONFIDENCE_THRESHOLD", "0.85"))
+
+# Conversation history trimming
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "40000"))
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+# Durable conversation checkpoints
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join(CACHE_DIR, "checkpoints.sqlite"))
+CHECKPOINT_RETENTION = int(os.getenv("CHECKPOINT_RETENTION", "10"))
+
+# Streaming token rendering in the chat UI
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.08"))
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "2000"))
+
+# Hybrid retrieval: local BM25 index fused with the dense search by reciprocal rank fusion
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+SPARSE_INDEX_DIR = os.getenv("SPARSE_INDEX_DIR", os.path.join(CACHE_DIR, "sparse_indexes"))
+SPARSE_INDEX_COMPACT_RATIO = float(os.getenv("SPARSE_INDEX_COMPACT_RATIO", "0.3"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+# Retrieval stage: over-fetch candidates, then re-rank them by maximal marginal relevance
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+MMR_ENABLED = os.getenv("MMR_ENABLED", "true").lower() == "true"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+MMR_LEXICAL_WEIGHT = float(os.getenv("MMR_LEXICAL_WEIGHT", "0.3"))
+
+# Context packing for the RAG prompt
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+CONTEXT_MIN_OVERLAP_CHARS = int(os.getenv("CONTEXT_MIN_OVERLAP_CHARS", "50"))
+
+# Chunking: "structured" for the token-based, heading-aware chunker, "recursive" for the character splitter
+CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", "structured")
+CHUNK_SIZE_TOKENS = int(os.getenv("CHUNK_SIZE_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+CHUNK_MIN_FILL = float(os.getenv("CHUNK_MIN_FILL", "0.6"))
+CHUNK_FAST_PATH_CHARS = int(os.getenv("CHUNK_FAST_PATH_CHARS", str(200_000)))
+
+# Per source type chunk size and overlap in tokens, PDFs and DOCX sections tend to hold longer articles
+CHUNK_PROFILES = {
+    ".pdf": (int(os.getenv("CHUNK_SIZE_TOKENS_PDF", "320")), int(os.getenv("CHUNK_OVERLAP_TOKENS_PDF", "48"))),
+    ".docx": (int(os.getenv("CHUNK_SIZE_TOKENS_DOCX", "320")), int(os.getenv("CHUNK_OVERLAP_TOKENS_DOCX", "32"))),
+    ".txt": (CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS),
+    "html": (int(os.getenv("CHUNK_SIZE_TOKENS_HTML", "256")), int(os.getenv("CHUNK_OVERLAP_TOKENS_HTML", "32"))),
+}
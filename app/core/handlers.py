@@ -1,15 +1,54 @@
+import time
 from langchain.callbacks.base import BaseCallbackHandler
+from config.settings import STREAM_FLUSH_INTERVAL, STREAM_FLUSH_CHARS
 
 class StreamHandler(BaseCallbackHandler):
     """ 
     A callback handler for streaming responses from the LLM.
-    This handler updates the UI dynamically with the new tokens received.        
+    This handler updates the UI dynamically with the new tokens received.
+    Tokens are buffered and the container is re-rendered at most once per flush interval,
+    or sooner when enough characters are pending; a flush interval of 0 renders every token.
     """
-    def __init__(self, container):
+    def __init__(self, container, flush_interval: float = STREAM_FLUSH_INTERVAL, flush_chars: int = STREAM_FLUSH_CHARS):
         self.container = container
-        self.text = ""
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self._parts = []
+        self._text = ""
+        self._pending_chars = 0
+        self._last_flush = 0.0
+
+    @property
+    def text(self) -> str:
+        """The full response received so far, rendered or not."""
+        if self._parts:
+            self._text += "".join(self._parts)
+            self._parts = []
+        return self._text
 
     def on_llm_new_token(self, token: str, **kwargs) -> None:
-        """ Append new tokens to the response and update the UI dynamically."""
-        self.text += token
-        self.container.markdown(self.text)
\ No newline at end of file
+        """ Buffer new tokens and update the UI once the flush budget is reached."""
+        if not token:
+            return
+        self._parts.append(token)
+        self._pending_chars += len(token)
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval or (self.flush_chars and self._pending_chars >= self.flush_chars):
+            self.flush(now)
+
+    def flush(self, now: float = None) -> None:
+        """ Render every pending token."""
+        if not self._pending_chars:
+            return
+        self.container.markdown(self.text)
+        self._pending_chars = 0
+        self._last_flush = time.monotonic() if now is None else now
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        """ Always render the final text."""
+        self.flush()
+
+    def on_llm_error(self, error, **kwargs) -> None:
+        """ Keep what was generated before the error visible."""
+        self.flush()
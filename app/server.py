@@ -0,0 +1,179 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, File, Form, Header, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import CHECKPOINT_DB_PATH, VECTORSTORE_BACKEND
+from services.checkpointer import thread_config, prune_checkpoints
+from services.state_machine import build_graph, conversation_messages
+from services.vectorstore_service import get_vectorstore, local_index_key
+from services.indexing_service import index_web_page, index_file_items
+from utils.file_extractor import SUPPORTED_EXTS, iter_files_from_zip, FileExtractorError
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+logger = EnhancedLogger(setup_logging())
+
+@asynccontextmanager
+async def lifespan(api: FastAPI):
+    # Open the async checkpointer on the server event loop and compile the graph with it
+    os.makedirs(os.path.dirname(CHECKPOINT_DB_PATH) or ".", exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB_PATH) as checkpointer:
+        api.state.graph = build_graph(checkpointer)
+        yield
+
+# Headless HTTP API for the RAG graph, run with: uvicorn server:api --app-dir app
+# Every replica must share CHECKPOINT_DB_PATH, or the load balancer must pin each thread to one replica
+api = FastAPI(title="Campus Docs Assistant API", lifespan=lifespan)
+
+class IndexSettings(BaseModel):
+    pinecone_index_name: str
+    embedding_model: str
+    vectorstore_backend: str = VECTORSTORE_BACKEND
+
+class ChatRequest(IndexSettings):
+    message: str
+    thread_id: Optional[str] = None
+
+class WebIndexRequest(IndexSettings):
+    url: str
+
+# Checkpoint metadata key holding a fingerprint of the API key that started the thread
+THREAD_OWNER_KEY = "thread_owner"
+
+def _owner_fingerprint(llm_api_key: str) -> str:
+    """Fingerprint an API key so threads can be bound to it without storing the key."""
+    return hashlib.sha256(llm_api_key.encode("utf-8")).hexdigest()
+
+async def _authorize_thread(graph, thread_id: str, llm_api_key: str):
+    """
+    Return the state of a thread, raising a 404 when it was started with another API key.
+    Answering 404 rather than 403 keeps other users' thread IDs from being probed.
+    """
+    snapshot = await graph.aget_state(thread_config(thread_id))
+    if snapshot.created_at is not None and (snapshot.metadata or {}).get(THREAD_OWNER_KEY) != _owner_fingerprint(llm_api_key):
+        raise HTTPException(status_code=404, detail="Thread not found.")
+    return snapshot
+
+def _sse(event: str, data: dict) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@api.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@api.post("/chat")
+async def chat(request: ChatRequest, x_llm_api_key: str = Header(...), x_pinecone_api_key: str = Header("")):
+    """
+    Answer a message on a conversation thread, streaming tokens as server-sent events.
+    Events are "token" and "status" as written by the graph nodes, then "done" with the
+    thread ID and the final answer, or "error".
+    """
+    thread_id = request.thread_id or str(uuid.uuid4())
+    graph = api.state.graph
+    if request.thread_id:
+        await _authorize_thread(graph, thread_id, x_llm_api_key)
+    inputs = {
+        "messages": [HumanMessage(content=request.message)],
+        "pinecone_index_name": request.pinecone_index_name,
+        "embedding_model": request.embedding_model,
+        "vectorstore_backend": request.vectorstore_backend,
+    }
+    config = thread_config(thread_id, llm_api_key=x_llm_api_key, pinecone_api_key=x_pinecone_api_key)
+    config["metadata"] = {THREAD_OWNER_KEY: _owner_fingerprint(x_llm_api_key)}
+
+    async def events():
+        output = None
+        try:
+            async for mode, chunk in graph.astream(inputs, config, stream_mode=["custom", "values"]):
+                if mode == "custom":
+                    yield _sse(chunk["type"], chunk)
+                else:
+                    output = chunk
+
+            messages = conversation_messages(output["messages"]) if output else []
+            answer = messages[-1].content if messages and messages[-1].type == "ai" else ""
+            yield _sse("done", {"thread_id": thread_id, "answer": answer})
+
+        except Exception as e:
+            logger.error("API chat stream", e)
+            yield _sse("error", {"thread_id": thread_id, "message": str(e)})
+
+        finally:
+            # Keep only the latest checkpoints of the thread
+            await asyncio.to_thread(prune_checkpoints, thread_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api.get("/chat/{thread_id}")
+async def chat_history(thread_id: str, x_llm_api_key: str = Header(...)):
+    """Return the conversation of a thread, only to the API key that started it."""
+    snapshot = await _authorize_thread(api.state.graph, thread_id, x_llm_api_key)
+    if snapshot.created_at is None:
+        raise HTTPException(status_code=404, detail="Thread not found.")
+    messages = conversation_messages(snapshot.values.get("messages", []))
+    return {"thread_id": thread_id, "messages": [{"role": msg.type, "content": msg.content} for msg in messages]}
+
+def _vectorstore_or_400(settings: IndexSettings, pinecone_api_key: str):
+    try:
+        return get_vectorstore(pinecone_api_key, settings.pinecone_index_name, settings.embedding_model, settings.vectorstore_backend)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+@api.post("/index/web")
+async def index_web(request: WebIndexRequest, x_pinecone_api_key: str = Header("")):
+    """Index a single web page, skipping it when unchanged since it was last indexed."""
+    vector_store = await asyncio.to_thread(_vectorstore_or_400, request, x_pinecone_api_key)
+    try:
+        index_key = local_index_key(x_pinecone_api_key, request.pinecone_index_name, request.embedding_model, request.vectorstore_backend)
+        result = await asyncio.to_thread(index_web_page, vector_store, request.url, index_key)
+    except Exception as e:
+        logger.error("API web indexing", e)
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"url": request.url, "unchanged": result is None, "chunks": result}
+
+def _iter_upload_items(files: List[UploadFile], errors: dict):
+    """Yield (filename, file extension, file object) for every upload and ZIP member, collecting errors."""
+    for upload in files:
+        file_extension = os.path.splitext(upload.filename)[-1].lower()
+        if file_extension == ".zip":
+            try:
+                for inner_filename, inner_file in iter_files_from_zip(upload.file):
+                    yield inner_filename, os.path.splitext(inner_filename)[-1].lower(), inner_file
+            except FileExtractorError as e:
+                errors[upload.filename] = str(e)
+        elif file_extension in SUPPORTED_EXTS:
+            yield upload.filename, file_extension, upload.file
+        else:
+            errors[upload.filename] = f"Unsupported file type: {file_extension}"
+
+@api.post("/index/files")
+async def index_files(
+    files: List[UploadFile] = File(...),
+    pinecone_index_name: str = Form(...),
+    embedding_model: str = Form(...),
+    vectorstore_backend: str = Form(VECTORSTORE_BACKEND),
+    x_pinecone_api_key: str = Header(""),
+):
+    """Index uploaded PDF, TXT, DOCX and ZIP files through one batched pipeline."""
+    settings = IndexSettings(pinecone_index_name=pinecone_index_name, embedding_model=embedding_model, vectorstore_backend=vectorstore_backend)
+    vector_store = await asyncio.to_thread(_vectorstore_or_400, settings, x_pinecone_api_key)
+
+    upload_errors = {}
+    index_key = local_index_key(x_pinecone_api_key, pinecone_index_name, embedding_model, vectorstore_backend)
+    result = await asyncio.to_thread(index_file_items, _iter_upload_items(files, upload_errors), vector_store, index_key)
+    result["errors"].update(upload_errors)
+    return result
@@ -0,0 +1,129 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Optional
+from config.settings import ANSWER_CACHE_PATH, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+from services.query_cache import normalize_query
+
+def context_fingerprints(tool_messages: list) -> List[str]:
+    """
+    Identify the context retrieved for a question.
+    Chunk IDs are derived from chunk content, so any change to a contributing chunk
+    changes its fingerprint; tool messages without chunk IDs fall back to a content hash.
+
+    Args:
+        tool_messages (list): The tool messages whose content forms the RAG context.
+
+    Returns:
+        List[str]: One fingerprint per retrieved chunk, in context order.
+    """
+    fingerprints = []
+    for message in tool_messages:
+        documents = getattr(message, "artifact", None) or []
+        chunk_ids = [doc.metadata.get("chunk_id") for doc in documents]
+        if documents and all(chunk_ids):
+            fingerprints.extend(chunk_ids)
+        else:
+            fingerprints.append(hashlib.sha256(message.content.encode("utf-8")).hexdigest())
+    return fingerprints
+
+class AnswerCache:
+    """
+    Persistent cache of final answers keyed by the normalized question, the fingerprints
+    of the retrieved context and the prompt and model that produced the answer.
+    A reverse index from chunk IDs to answers lets re-indexing drop answers built on
+    chunks that were removed.
+    """
+    def __init__(self, path: str = ANSWER_CACHE_PATH, ttl: float = ANSWER_CACHE_TTL, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL, created_at REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS answer_chunks (chunk_id TEXT NOT NULL, key TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_chunks_chunk ON answer_chunks (chunk_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_chunks_key ON answer_chunks (key)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    @staticmethod
+    def make_key(question: str, fingerprints: List[str], generator: str) -> str:
+        """Hash the normalized question, context fingerprints and generator identity into the cache key."""
+        payload = "\0".join([normalize_query(question), generator, *fingerprints])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _delete_keys(self, keys: List[str]):
+        self._entries -= self._conn.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys]).rowcount
+        self._conn.executemany("DELETE FROM answer_chunks WHERE key = ?", [(key,) for key in keys])
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer for a key, or None when missing or expired."""
+        with self._lock:
+            row = self._conn.execute("SELECT answer, created_at FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is not None and time.time() - row[1] > self.ttl:
+                self._delete_keys([key])
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, answer: str, fingerprints: List[str]):
+        """Store an answer with the fingerprints of the context it was generated from."""
+        with self._lock:
+            self._delete_keys([key])
+            self._conn.execute("INSERT INTO answers (key, answer, created_at) VALUES (?, ?, ?)", (key, answer, time.time()))
+            self._entries += 1
+            self._conn.executemany("INSERT INTO answer_chunks (chunk_id, key) VALUES (?, ?)", [(fp, key) for fp in set(fingerprints)])
+
+            # Evict the oldest answers when over capacity
+            overflow = self._entries - self.max_entries
+            if overflow > 0:
+                oldest = [row[0] for row in self._conn.execute("SELECT key FROM answers ORDER BY created_at ASC LIMIT ?", (overflow,))]
+                self._delete_keys(oldest)
+            self._conn.commit()
+
+    def invalidate_chunks(self, chunk_ids: List[str]):
+        """Drop every answer generated from any of the given chunks."""
+        if not chunk_ids:
+            return
+        with self._lock:
+            keys = set()
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                keys.update(row[0] for row in self._conn.execute(f"SELECT key FROM answer_chunks WHERE chunk_id IN ({placeholders})", batch))
+            self._delete_keys(list(keys))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Return cache counters for logging and monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache() -> AnswerCache:
+    """Return the process-wide answer cache, opening it on first use."""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache()
+        return _answer_cache
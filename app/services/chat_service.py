@@ -1,13 +1,65 @@
 import uuid
 import streamlit as st
 from config.logging_config import setup_logging, EnhancedLogger
-from services.state_machine import app
+from core.handlers import StreamHandler
+from services.state_machine import app, conversation_messages, EVENT_TOKEN, EVENT_STATUS
+from services.checkpointer import thread_config, prune_checkpoints
+from utils.token_counter import message_token_count
 from utils.error_handler import handle_maritalk_error, handle_runtime_error, handle_unexpected_error
 from langchain_core.messages import HumanMessage
 from langchain_community.chat_models.maritalk import MaritalkHTTPError
 
 logger = EnhancedLogger(setup_logging())
 
+def get_session_thread_id() -> str:
+    """
+    Return the stable conversation thread ID of the current chat session.
+    The ID is kept in the URL query parameters, so reloading the page after a
+    server restart resumes the same thread from the checkpointer.
+
+    Returns:
+        str: The thread ID.
+    """
+    if "thread_id" not in st.session_state:
+        thread_id = st.query_params.get("thread")
+        try:
+            thread_id = str(uuid.UUID(thread_id))
+        except (TypeError, ValueError):
+            thread_id = str(uuid.uuid4())
+        st.query_params["thread"] = thread_id
+        st.session_state["thread_id"] = thread_id
+    return st.session_state["thread_id"]
+
+class GraphStreamRenderer:
+    """
+    Render the custom stream events of the state machine in the chat.
+    Each node streaming tokens gets its own assistant message, and status events become toasts.
+    """
+    AVATARS = {
+        "query_or_respond": ":material/mindfulness:",
+        "generate": ":material/psychology:",
+    }
+
+    def __init__(self):
+        self.handlers = {}
+
+    def render(self, event: dict):
+        if event["type"] == EVENT_STATUS:
+            st.toast(event["content"], icon=":material/robot:")
+        elif event["type"] == EVENT_TOKEN:
+            handler = self.handlers.get(event["node"])
+            if handler is None:
+                # A new node started streaming, so the previous messages are final
+                self.close()
+                message = st.chat_message("assistant", avatar=self.AVATARS.get(event["node"], ":material/smart_toy:"))
+                handler = self.handlers[event["node"]] = StreamHandler(message.empty())
+            handler.on_llm_new_token(event["content"])
+
+    def close(self):
+        """Render the final text of every message still holding buffered tokens."""
+        for handler in self.handlers.values():
+            handler.flush()
+
 def handle_user_input(prompt: str):
     """
     Handle user input by appending it to the chat history, invoking the LLM, 
@@ -23,9 +75,9 @@ def handle_user_input(prompt: str):
         logger.warning("LLM API Key is missing. User cannot proceed without it.")
         return
     
-    # Define the Pinecone API key
+    # Define the Pinecone API key, not needed by the local vector store backend
     pinecone_api_key = st.session_state.get("pinecone_api_key")
-    if not pinecone_api_key:
+    if not pinecone_api_key and st.session_state.get("vectorstore_backend") != "local":
         st.toast("Please add your Pinecone API key.", icon=":material/passkey:")
         logger.warning("LLM API Key is missing. User cannot proceed without it.")
         return
@@ -44,26 +96,41 @@ def handle_user_input(prompt: str):
     if "messages" not in st.session_state:
         st.session_state["messages"] = []
 
-    # Append the user's message to the chat history
-    st.session_state["messages"].append(HumanMessage(content=prompt))
+    # Only the new message is sent, the history is restored from the thread checkpoint
+    human_message = HumanMessage(content=prompt)
+    message_token_count(human_message)
+    st.session_state["messages"].append(human_message)
     st.chat_message("user", avatar=":material/face:").write(prompt)
 
     try:
-        # Invoke the state machine to process the input
-        thread_id = str(uuid.uuid4())
-        output = app.invoke(
-            {
-                "messages": st.session_state["messages"],
-                "llm_api_key": llm_api_key,
-                "pinecone_api_key": pinecone_api_key,
-                "pinecone_index_name": pinecone_index_name,
-            },
-            {"configurable": {"thread_id": thread_id}}
-        )
+        # Stream the state machine on the session thread, rendering its events as they arrive
+        thread_id = get_session_thread_id()
+        renderer = GraphStreamRenderer()
+        output = None
+        try:
+            for mode, chunk in app.stream(
+                {
+                    "messages": [human_message],
+                    "pinecone_index_name": pinecone_index_name,
+                    "embedding_model": st.session_state.get("embedding_model"),
+                    "vectorstore_backend": st.session_state.get("vectorstore_backend", "pinecone"),
+                },
+                thread_config(thread_id, llm_api_key=llm_api_key, pinecone_api_key=pinecone_api_key),
+                stream_mode=["custom", "values"],
+            ):
+                if mode == "custom":
+                    renderer.render(chunk)
+                else:
+                    output = chunk
+        finally:
+            renderer.close()
+
+        # Keep only the latest checkpoints of the thread
+        prune_checkpoints(thread_id)
 
         # Update the session state with the new chat history
-        st.session_state["messages"] = output["messages"]
-        logger.chat_history(output["messages"])
+        st.session_state["messages"] = conversation_messages(output["messages"])
+        logger.chat_history(st.session_state["messages"])
 
     except MaritalkHTTPError as e:
         logger.error("Maritalk API", e)
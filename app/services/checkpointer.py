@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+from typing import List
+from config.settings import CHECKPOINT_DB_PATH, CHECKPOINT_RETENTION
+from pydantic import SecretStr
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+def get_checkpointer() -> SqliteSaver:
+    """Return the process-wide SQLite checkpointer, opening it on first use."""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            os.makedirs(os.path.dirname(CHECKPOINT_DB_PATH) or ".", exist_ok=True)
+            connection = sqlite3.connect(CHECKPOINT_DB_PATH, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            _checkpointer = SqliteSaver(connection)
+            _checkpointer.setup()
+        return _checkpointer
+
+def thread_config(thread_id: str, **secrets) -> dict:
+    """
+    Build the graph config for a conversation thread.
+    Checkpoint metadata copies plain string values of the configurable dict, so secrets
+    are wrapped in SecretStr to keep them out of the checkpoint database.
+
+    Args:
+        thread_id (str): The conversation thread ID.
+        **secrets: Per-run secrets such as API keys.
+
+    Returns:
+        dict: The run configuration.
+    """
+    wrapped = {key: SecretStr(value or "") for key, value in secrets.items()}
+    return {"configurable": {"thread_id": thread_id, **wrapped}}
+
+def config_secret(config: dict, key: str) -> str:
+    """Read a secret passed through thread_config from a run configuration."""
+    value = (config or {}).get("configurable", {}).get(key)
+    return value.get_secret_value() if isinstance(value, SecretStr) else value
+
+def load_thread_messages(thread_id: str) -> List:
+    """
+    Load the messages of the latest checkpoint of a thread.
+
+    Args:
+        thread_id (str): The conversation thread ID.
+
+    Returns:
+        List: The stored conversation, empty when the thread has no checkpoint yet.
+    """
+    checkpoint_tuple = get_checkpointer().get_tuple(thread_config(thread_id))
+    if checkpoint_tuple is None:
+        return []
+    return list(checkpoint_tuple.checkpoint["channel_values"].get("messages", []))
+
+def prune_checkpoints(thread_id: str, keep: int = CHECKPOINT_RETENTION) -> int:
+    """
+    Delete all but the most recent checkpoints of a thread.
+    Checkpoint IDs are time ordered, so sorting them keeps the newest ones.
+
+    Args:
+        thread_id (str): The conversation thread ID.
+        keep (int): Number of checkpoints to keep.
+
+    Returns:
+        int: Number of deleted checkpoints.
+    """
+    saver = get_checkpointer()
+    with saver.lock, saver.conn:
+        rows = saver.conn.execute(
+            "SELECT checkpoint_ns, checkpoint_id FROM checkpoints WHERE thread_id = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, max(keep, 1)),
+        ).fetchall()
+        if not rows:
+            return 0
+        params = [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_ns, checkpoint_id in rows]
+        saver.conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+        )
+        saver.conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+        )
+    return len(rows)
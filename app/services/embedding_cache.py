@@ -0,0 +1,232 @@
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from array import array
+from typing import List
+from config.settings import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES
+from langchain_core.embeddings import Embeddings
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk store for embedding vectors.
+    Vectors are stored as packed float32 blobs in SQLite, keyed by the hash of
+    the embedding model name and the embedded text.
+    """
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._entries, self._total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Hash the model name and text into the cache key."""
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _pack(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get_many(self, keys: List[str]) -> dict:
+        """
+        Look up several keys at once.
+
+        Args:
+            keys (List[str]): Cache keys to look up.
+
+        Returns:
+            dict: Mapping of found keys to their vectors.
+        """
+        found = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Query in slices to stay under SQLite's bound parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = self._unpack(blob)
+
+            # Refresh access time so eviction removes the least recently used vectors
+            now = time.time()
+            self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+            self._conn.commit()
+
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+
+        return found
+
+    def put_many(self, items: dict):
+        """
+        Store several vectors at once and evict old entries when over the size limit.
+
+        Args:
+            items (dict): Mapping of cache keys to vectors.
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [(key, self._pack(vector), now) for key, vector in items.items()]
+
+        with self._lock:
+            existing_entries, existing_bytes = self._stored([row[0] for row in rows])
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows)
+            self._entries += len(rows) - existing_entries
+            self._total_bytes += sum(len(row[1]) for row in rows) - existing_bytes
+            self._evict()
+            self._conn.commit()
+
+    def _stored(self, keys: List[str]) -> tuple:
+        """Return the number of entries and bytes already stored for the given keys."""
+        entries = total = 0
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            count, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchone()
+            entries += count
+            total += size
+        return entries, total
+
+    def _evict(self):
+        """Delete the least recently used vectors until the cache fits in 90% of its budget."""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access ASC")
+        expired = []
+        for key, size in cursor:
+            if self._total_bytes <= target:
+                break
+            expired.append((key,))
+            self._total_bytes -= size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", expired)
+        self._entries -= len(expired)
+        self.evictions += len(expired)
+
+    def stats(self) -> dict:
+        """Return cache counters for logging and monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._entries,
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves vectors from the embedding cache and only
+    sends the texts that were never embedded before to the underlying model.
+    The async methods run the SQLite lookups and writes on worker threads.
+    """
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, reusing cached vectors where available."""
+        keys = [self.cache.make_key(self.model_name, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Embed each missing text only once even when it repeats in the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing the cached vector if available."""
+        key = self.cache.make_key(self.model_name, text)
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key]
+
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many({key: vector})
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents asynchronously, reusing cached vectors where available."""
+        keys = [self.cache.make_key(self.model_name, text) for text in texts]
+        cached = await asyncio.to_thread(self.cache.get_many, keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self.cache.put_many, computed)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query asynchronously, reusing the cached vector if available."""
+        key = self.cache.make_key(self.model_name, text)
+        cached = await asyncio.to_thread(self.cache.get_many, [key])
+        if key in cached:
+            return cached[key]
+
+        vector = await self.embeddings.aembed_query(text)
+        await asyncio.to_thread(self.cache.put_many, {key: vector})
+        return vector
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache, opening it on first use."""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
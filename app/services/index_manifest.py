@@ -0,0 +1,116 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Callable, List, Set
+from config.settings import INDEX_MANIFEST_PATH
+
+def make_chunk_id(source: str, content: str) -> str:
+    """
+    Build a deterministic chunk ID from its source and content.
+
+    Args:
+        source (str): The source the chunk was produced from (file name or URL).
+        content (str): The chunk text.
+
+    Returns:
+        str: Hex digest identifying the chunk.
+    """
+    return hashlib.sha256(f"{source}\0{content}".encode("utf-8")).hexdigest()
+
+class IndexManifest:
+    """
+    Local record of the chunk IDs each source produced in each index.
+    It allows re-indexing a source to upsert only new chunks and delete stale ones.
+    Entries live in SQLite, one row per source, so recording a source writes only that row.
+    """
+    def __init__(self, path: str = INDEX_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._adopted = set()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            "index_name TEXT NOT NULL, source TEXT NOT NULL, chunk_ids TEXT NOT NULL, PRIMARY KEY (index_name, source))"
+        )
+        self._conn.commit()
+        self._import_legacy(os.path.splitext(path)[0] + ".json")
+
+    def _import_legacy(self, legacy_path: str):
+        """Import the JSON manifest written by earlier versions, once, into an empty database."""
+        if not os.path.exists(legacy_path) or self._conn.execute("SELECT 1 FROM manifest LIMIT 1").fetchone():
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO manifest (index_name, source, chunk_ids) VALUES (?, ?, ?)",
+            [(index_name, source, json.dumps(chunk_ids)) for index_name, sources in data.items() for source, chunk_ids in sources.items()],
+        )
+        self._conn.commit()
+
+    def get(self, index_name: str, source: str) -> List[str]:
+        """Return the chunk IDs recorded for a source in an index."""
+        with self._lock:
+            row = self._conn.execute("SELECT chunk_ids FROM manifest WHERE index_name = ? AND source = ?", (index_name, source)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def set(self, index_name: str, source: str, chunk_ids: List[str]):
+        """Record the chunk IDs a source currently produces in an index."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifest (index_name, source, chunk_ids) VALUES (?, ?, ?)",
+                (index_name, source, json.dumps(list(chunk_ids))),
+            )
+            self._conn.commit()
+
+    def chunk_ids(self, index_name: str) -> List[str]:
+        """Return the chunk IDs of every source recorded for an index."""
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_ids FROM manifest WHERE index_name = ?", (index_name,)).fetchall()
+        return [chunk_id for (chunk_ids,) in rows for chunk_id in json.loads(chunk_ids)]
+
+    def adopt(self, index_name: str, legacy_index_name: str, stored_ids: Callable[[List[str]], Set[str]]) -> int:
+        """
+        Copy the rows of a legacy index name whose chunks are stored in the index, once per process.
+        The legacy name may hold the rows of several indexes, so the first chunk ID of each source is
+        checked against the index and only the sources it confirms are copied. Rows the index already
+        has are kept.
+
+        Args:
+            index_name (str): The index name the rows are copied to.
+            legacy_index_name (str): The index name the rows were recorded under.
+            stored_ids (Callable): Returns which of the given chunk IDs the index stores.
+
+        Returns:
+            int: Number of sources copied.
+        """
+        with self._lock:
+            if index_name in self._adopted or index_name == legacy_index_name:
+                return 0
+            rows = self._conn.execute("SELECT source, chunk_ids FROM manifest WHERE index_name = ?", (legacy_index_name,)).fetchall()
+
+        # Confirm each source by its first chunk, outside the lock since stored_ids may call the network
+        first_ids = {source: ids[0] for source, ids in ((source, json.loads(chunk_ids)) for source, chunk_ids in rows) if ids}
+        present = stored_ids(list(first_ids.values())) if first_ids else set()
+        confirmed = [(index_name, source, chunk_ids) for source, chunk_ids in rows if first_ids.get(source) in present]
+
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO manifest (index_name, source, chunk_ids) VALUES (?, ?, ?)", confirmed)
+            self._conn.commit()
+            self._adopted.add(index_name)
+        return len(confirmed)
+
+    def sources(self, index_name: str) -> List[str]:
+        """Return every source recorded for an index."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT source FROM manifest WHERE index_name = ?", (index_name,))]
+
+# Process-wide manifest shared by the indexing paths
+index_manifest = IndexManifest()
@@ -0,0 +1,139 @@
+import threading
+from collections import defaultdict
+from typing import Callable, List
+from concurrent.futures import ThreadPoolExecutor, wait
+from config.settings import INDEXING_BATCH_SIZE, INDEXING_EMBED_WORKERS, INDEXING_UPSERT_WORKERS, INDEXING_MAX_PENDING_BATCHES, HYBRID_SEARCH_ENABLED
+from config.logging_config import setup_logging, EnhancedLogger
+from services.vectorstore_service import upsert_embeddings
+from services.sparse_index import get_sparse_index
+
+logger = EnhancedLogger(setup_logging())
+
+class IndexingPipeline:
+    """
+    Batched indexing stage shared by every file of an upload.
+    Chunks are grouped into fixed-size batches across files, batches are embedded
+    concurrently by a bounded pool of workers, and embedded batches are upserted by a
+    separate pool so network writes overlap with the embedding of the next batches.
+    When an index key is given, upserted batches are also added to its sparse index.
+    """
+    def __init__(
+        self,
+        vector_store,
+        index_key: str = None,
+        batch_size: int = INDEXING_BATCH_SIZE,
+        embed_workers: int = INDEXING_EMBED_WORKERS,
+        upsert_workers: int = INDEXING_UPSERT_WORKERS,
+        max_pending_batches: int = INDEXING_MAX_PENDING_BATCHES,
+    ):
+        self.vector_store = vector_store
+        self.index_key = index_key
+        self.batch_size = batch_size
+        self._embed_executor = ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix="embed")
+        self._upsert_executor = ThreadPoolExecutor(max_workers=upsert_workers, thread_name_prefix="upsert")
+
+        # Bound the number of batches in flight so memory stays flat on large uploads
+        self._pending = threading.BoundedSemaphore(max_pending_batches)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._embed_futures = []
+        self._upsert_futures = []
+        self._on_complete = defaultdict(list)
+        self.failed_sources = {}
+        self.indexed_chunks = 0
+
+    def add(self, documents: list, ids: List[str], source: str):
+        """
+        Queue chunks for embedding and upsert.
+
+        Args:
+            documents (list): The chunked documents.
+            ids (List[str]): The chunk IDs, aligned with the documents.
+            source (str): The source the chunks belong to, used for error reporting.
+        """
+        for document, chunk_id in zip(documents, ids):
+            self._buffer.append((chunk_id, document, source))
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+
+    def on_source_complete(self, source: str, callback: Callable):
+        """Register a callback that runs on close if every batch of the source was indexed."""
+        self._on_complete[source].append(callback)
+
+    def _flush(self):
+        """Hand the buffered chunks to the embedding workers as one batch."""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+
+        # Block the producer while too many batches are still in flight
+        self._pending.acquire()
+        self._embed_futures.append(self._embed_executor.submit(self._embed_batch, batch))
+
+    def _embed_batch(self, batch: list):
+        """Embed a batch and hand it to the upsert workers."""
+        try:
+            texts = [document.page_content for _, document, _ in batch]
+            vectors = self.vector_store.embeddings.embed_documents(texts)
+        except Exception as e:
+            self._record_failure(batch, e)
+            self._pending.release()
+            return
+
+        future = self._upsert_executor.submit(self._upsert_batch, batch, texts, vectors)
+        with self._lock:
+            self._upsert_futures.append(future)
+
+    def _upsert_batch(self, batch: list, texts: list, vectors: list):
+        """Upsert an embedded batch into the vector store and the sparse index."""
+        try:
+            ids = [chunk_id for chunk_id, _, _ in batch]
+            metadatas = [document.metadata for _, document, _ in batch]
+            upsert_embeddings(self.vector_store, ids=ids, texts=texts, vectors=vectors, metadatas=metadatas)
+
+            # Keep the keyword index in step with what reached the vector store
+            if HYBRID_SEARCH_ENABLED and self.index_key:
+                get_sparse_index(self.index_key).add(ids, texts, metadatas)
+            with self._lock:
+                self.indexed_chunks += len(batch)
+        except Exception as e:
+            self._record_failure(batch, e)
+        finally:
+            self._pending.release()
+
+    def _record_failure(self, batch: list, exception: Exception):
+        """Remember which sources lost chunks so their manifest entries are not updated."""
+        logger.error("Indexing pipeline batch", exception)
+        with self._lock:
+            for _, _, source in batch:
+                self.failed_sources.setdefault(source, str(exception))
+
+    def close(self) -> dict:
+        """
+        Flush the remaining chunks and wait for every batch to be embedded and upserted.
+
+        Returns:
+            dict: Sources that failed, mapped to the first error they hit.
+        """
+        self._flush()
+
+        # Embedding jobs submit their upserts before returning, so all upserts are known afterwards
+        wait(self._embed_futures)
+        with self._lock:
+            upsert_futures = list(self._upsert_futures)
+        wait(upsert_futures)
+
+        self._embed_executor.shutdown()
+        self._upsert_executor.shutdown()
+
+        # A failing callback, such as the delete of stale chunks, fails only its own source
+        for source, callbacks in self._on_complete.items():
+            if source not in self.failed_sources:
+                try:
+                    for callback in callbacks:
+                        callback()
+                except Exception as e:
+                    logger.error("Indexing pipeline source completion", e)
+                    self.failed_sources[source] = str(e)
+
+        return dict(self.failed_sources)
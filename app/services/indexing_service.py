@@ -1,170 +1,210 @@
-import os
-import streamlit as st
+from typing import Optional
 from langchain_core.documents import Document
-from services.vectorstore_service import initialize_vectorstore
-from utils.text_extractor import extract_text_from_file
-from utils.file_extractor import extract_files_from_zip, FileExtractorError
-from utils.web_scraper import get_rendered_webpage
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from services.index_manifest import index_manifest, make_chunk_id
+from services.query_cache import query_cache
+from services.answer_cache import get_answer_cache
+from services.indexing_pipeline import IndexingPipeline
+from services.sparse_index import get_sparse_index
+from config.settings import PARALLEL_EXTRACTION_ENABLED, STREAMING_EXTRACTION_ENABLED, INDEXING_BATCH_SIZE, HTML_CONTENT_EXTRACTION_ENABLED, ANSWER_CACHE_ENABLED, HYBRID_SEARCH_ENABLED
+from utils.text_extractor import extract_text_from_file, iter_documents_from_file
+from utils.parallel_extractor import extract_documents_in_parallel
+from utils.web_fetcher import fetch_page, get_fetch_state
+from utils.html_extractor import extract_main_content, get_boilerplate_filter
+from utils.chunker import get_chunker
+
+def html_to_document(html: str, url: str) -> Document:
+    """
+    Convert rendered HTML into a document holding only the page's main content.
+
+    Args:
+        html (str): The rendered HTML content.
+        url (str): The URL of the page.
+
+    Returns:
+        Document: The extracted text with the page title in the metadata.
+    """
+    text, title = extract_main_content(html)
+    text = get_boilerplate_filter().filter(url, text)
+    return Document(page_content=text, metadata={"source": url, "title": title})
 
-def run_web_indexing_mode(config: dict):
+def index_web_page(vector_store, web_url: str, index_key: str) -> Optional[dict]:
     """
-    Run the web indexing mode to scrape a web page and index its content into Pinecone.
-    
+    Fetch a single web page and index the chunks that changed since it was last indexed.
+
     Args:
-        config (dict): Configuration dictionary containing the web URL, Pinecone API key,
-                       Pinecone index name, and embedding model.
+        vector_store: The vector store to index into.
+        web_url (str): The URL of the page.
+        index_key (str): Key of the index's local state, from local_index_key.
+
+    Returns:
+        dict: Chunk counts as returned by index_chunks.
+        None: If the page is unchanged since it was last indexed.
     """
-    # Set configuration parameters
-    web_url = config.get("web_url")
-    pinecone_api_key = config.get("pinecone_api_key")
-    pinecone_index_name = config.get("pinecone_index_name")
-    embedding_model = config.get("embedding_model")
-
-    with st.chat_message("assistant", avatar=":material/cognition_2:"):
-        try:
-            with st.spinner("Processing web page and indexing...", show_time=True):
-
-                # Initialize Pinecone
-                vector_store = initialize_vectorstore(pinecone_api_key, pinecone_index_name, embedding_model)
-                st.toast('Pinecone initialized successfully!', icon=":material/table_eye:")
-
-                # Load and chunk the web page content
-                doc = get_rendered_webpage(web_url)
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-                all_splits = text_splitter.split_documents([doc])
-                st.toast('Web page content chunked successfully!', icon=":material/package:")
-
-                # Display the number of chunks
-                st.status(f"Number of chunks created: {len(all_splits)}",state="complete")
-
-                # Index the chunks
-                vector_store.add_documents(documents=all_splits)
-                st.toast('Chunks indexed successfully!', icon=":material/cloud_upload:")
-
-                st.status(f"Web page content indexed successfully at Pinecone!", state="complete")
-
-        except ValueError as ve:
-            st.toast(f"A value error occurred during indexing process.", icon=":material/settings_alert:")
-            with st.expander("Error details"):
-                st.write(f"A value error occurred: {ve}")
-
-        except RuntimeError as re:
-            st.toast(f"A runtime error occurred during indexing process.", icon=":material/database_off:")
-            with st.expander("Error details"):
-                st.write(f"A runtime error occurred: {re}")
-
-        except Exception as e:
-            st.toast(f"An unexpected error occurred during indexing process.", icon=":material/cloud_off:")
-            with st.expander("Error details"):
-                st.write(f"An unexpected error occurred: {e}")
-
-def run_file_indexing_mode(config: dict, uploaded_files: list):
+    # Fetch the web page, conditionally when it was indexed before
+    fetched = fetch_page(web_url, index_key, conditional=bool(index_manifest.get(index_key, web_url)))
+    if fetched["unchanged"]:
+        return None
+
+    # Keep only the main readable content of the page
+    if HTML_CONTENT_EXTRACTION_ENABLED:
+        doc = html_to_document(fetched["html"], web_url)
+    else:
+        doc = Document(page_content=fetched["html"], metadata={"source": web_url})
+
+    # Chunk the web page content and index only the chunks that changed since the last run
+    result = index_chunks(vector_store, get_chunker("html").split_documents([doc]), web_url, index_key)
+    get_fetch_state().save(index_key, web_url, fetched["state"])
+    return result
+
+def index_file(file_obj, filename: str, file_ext: str, vector_store, index_key: str, pipeline: IndexingPipeline = None, extracted_documents: list = None) -> dict:
     """
-    Run the file indexing mode to extract text from uploaded files and index the content into Pinecone.
+    Extract, chunk and index a single file.
 
     Args:
-        config (dict): Configuration dictionary containing Pinecone credentials and embedding model.
-        file: The uploaded file from Streamlit's file_uploader.
+        file_obj: The file object, unused when extracted_documents is given.
+        filename (str): The name of the file, used as the chunk source.
+        file_ext (str): The file extension.
+        vector_store: The vector store to index into.
+        index_key (str): Key of the index's local state, from local_index_key.
+        pipeline (IndexingPipeline): Optional batched pipeline the chunks are queued into.
+        extracted_documents (list): Documents already extracted from the file, skips extraction when given.
+
+    Returns:
+        dict: Chunk counts as returned by index_chunks.
     """
-    # Set configuration parameters
-    pinecone_api_key = config.get("pinecone_api_key")
-    pinecone_index_name = config.get("pinecone_index_name")
-    embedding_model = config.get("embedding_model")
-    
-    with st.chat_message("assistant", avatar=":material/cognition_2:"):
-        for file in uploaded_files:
-            file_extension = os.path.splitext(file.name)[-1].lower()
-            
-            # If the uploaded file is a ZIP archive extract its contents
-            if file_extension == ".zip":
-                try:
-                    with st.spinner(f"Extracting files from ZIP: {file.name}"):
-                        extracted_items = extract_files_from_zip(file)
-                    
-                    # Warn the user if no supported files were found in the ZIP    
-                    if not extracted_items:
-                        st.toast(f"No supported files found in {file.name}", icon=":material/folder_zip:")
-                        with st.expander("Error details"):
-                            st.write(f"An error occurred: {e}")
-                        continue
-                    
-                    # Process each extracted file individually                                
-                    for inner_filename, inner_file in extracted_items:
-                        inner_ext = os.path.splitext(inner_filename)[-1].lower()
-                        try:
-                            process_file_for_indexing(inner_file, inner_filename, inner_ext, pinecone_api_key, pinecone_index_name, embedding_model)
-                        except Exception as e:
-                            st.toast(f"Error processing file '{inner_filename}': {e}", icon=":material/folder_zip:")
-                            with st.expander("Error details"):
-                                st.write(f"An error occurred: {e}")
-
-                except FileExtractorError as e:
-                    st.toast(f"Error extracting ZIP file '{file.name}': {e}", icon=":material/folder_zip:")
-                    with st.expander("Error details"):
-                        st.write(f"An error occurred: {e}")
+    # Extract page or section documents lazily so large files never sit in memory as one string
+    if extracted_documents is not None:
+        documents = extracted_documents
+    elif STREAMING_EXTRACTION_ENABLED:
+        documents = iter_documents_from_file(file_obj, file_ext, filename)
+    else:
+        extracted_text = extract_text_from_file(file_obj, file_ext)
+        documents = [Document(page_content=extracted_text, metadata={"source": filename})]
+
+    # Split each document into chunks as it arrives, keeping its page metadata
+    chunker = get_chunker(file_ext)
+    all_splits = (split for document in documents for split in chunker.split_documents([document]))
+    return index_chunks(vector_store, all_splits, filename, index_key, pipeline)
+
+def index_file_items(items, vector_store, index_key: str) -> dict:
+    """
+    Index several files through one batched pipeline, without any UI.
+
+    Args:
+        items: Iterable of (filename, file extension, file object) tuples.
+        vector_store: The vector store to index into.
+        index_key (str): Key of the index's local state, from local_index_key.
+
+    Returns:
+        dict: Chunk counts per file, errors per file and the number of chunks indexed.
+    """
+    pipeline = IndexingPipeline(vector_store, index_key)
+    files = {}
+    errors = {}
+    try:
+        # Fan the files out to the extraction process pool
+        if PARALLEL_EXTRACTION_ENABLED:
+            for filename, file_ext, extracted_documents, error in extract_documents_in_parallel(items):
+                if error is not None:
+                    errors[filename] = str(error)
                     continue
-            
-            # Regular simple file process it directly    
-            else:
+                files[filename] = index_file(None, filename, file_ext, vector_store, index_key, pipeline, extracted_documents)
+        else:
+            for filename, file_ext, file_obj in items:
                 try:
-                    process_file_for_indexing(
-                        file, file.name, file_extension,
-                        pinecone_api_key, pinecone_index_name, embedding_model
-                    )
+                    files[filename] = index_file(file_obj, filename, file_ext, vector_store, index_key, pipeline)
                 except Exception as e:
-                    st.toast(f"Error processing file '{file.name}': {e}", icon=":material/feedback:")
-                    with st.expander("Error details"):
-                        st.write(f"An error occurred: {e}")
-
-def process_file_for_indexing(file_obj, filename, file_ext, pinecone_api_key, pinecone_index_name, embedding_model):
+                    errors[filename] = str(e)
+    finally:
+        # Wait for the batches still being embedded and upserted
+        failed_sources = pipeline.close()
+
+    errors.update({source: str(error) for source, error in failed_sources.items()})
+    return {"files": files, "errors": errors, "indexed_chunks": pipeline.indexed_chunks}
+
+def _add_chunk_batch(vector_store, batch: list, index_key: str):
+    """Add a batch of chunks to the vector store and then to the sparse index of the same index."""
+    ids = [chunk.metadata["chunk_id"] for chunk in batch]
+    vector_store.add_documents(documents=batch, ids=ids)
+    if HYBRID_SEARCH_ENABLED:
+        get_sparse_index(index_key).add(ids, [chunk.page_content for chunk in batch], [chunk.metadata for chunk in batch])
+
+def index_chunks(vector_store, chunks, source: str, index_key: str, pipeline: IndexingPipeline = None) -> dict:
     """
-    Process a single file for indexing into Pinecone.
+    Incrementally index the chunks of a single source.
+    Chunk IDs are derived from the source and chunk content, so only new or changed
+    chunks are embedded and upserted, and chunks the source no longer produces are deleted.
+    Chunks are consumed one at a time, so a generator keeps memory flat for large sources.
 
     Args:
-        file_obj: The uploaded file object.
-        filename (str): The name of the file.
-        file_ext (str): The file extension.
-        pinecone_api_key (str): Pinecone API key.
-        pinecone_index_name (str): Pinecone index name.
-        embedding_model (str): Embedding model to use.
+        vector_store: The vector store to index into.
+        chunks (Iterable[Document]): The chunked documents of the source.
+        source (str): The source identifier (file name or URL).
+        index_key (str): Key of the index's local state the manifest entry belongs to, from local_index_key.
+        pipeline (IndexingPipeline): Optional batched pipeline; when given, new chunks are queued
+                                     and the manifest is only updated once all of them are upserted.
+
+    Returns:
+        dict: Number of chunks in total, added, unchanged and removed.
     """
-    try:
-        with st.spinner(f"Processing file {filename}..."):
-            
-            # Extract text from the uploaded file
-            extracted_text = extract_text_from_file(file_obj, file_ext)
-            st.toast('File content extracted successfully!', icon=":material/draft:")
-            
-            # Create a LangChain document
-            doc = Document(page_content=extracted_text, metadata={"source": filename})
-            st.toast('Pinecone initialized successfully!', icon=":material/table_eye:")
-            
-            # Split the document into chunks
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            all_splits = text_splitter.split_documents([doc])
-            st.toast('File content chunked successfully!', icon=":material/package:")
-            
-            # Display number of chunks created
-            st.status(f"Number of chunks created: {len(all_splits)}", state="complete")
-
-            # Initialize Pinecone and index the chunks
-            vector_store = initialize_vectorstore(pinecone_api_key, pinecone_index_name, embedding_model)
-            vector_store.add_documents(documents=all_splits)
-            st.toast('Chunks indexed successfully!', icon=":material/cloud_upload:")
-            st.status(f"File {filename} indexed successfully at Pinecone!", state="complete")
-
-    except ValueError as ve:
-        st.toast(f"A value error occurred during indexing process.", icon=":material/settings_alert:")
-        with st.expander("Error details"):
-            st.write(f"A value error occurred: {ve}")
-
-    except RuntimeError as re:
-        st.toast(f"A runtime error occurred during indexing process.", icon=":material/database_off:")
-        with st.expander("Error details"):
-            st.write(f"A runtime error occurred: {re}")
-
-    except Exception as e:
-        st.toast(f"An unexpected error occurred during indexing process.", icon=":material/cloud_off:")
-        with st.expander("Error details"):
-            st.write(f"An unexpected error occurred: {e}")    
\ No newline at end of file
+    # Compare against what the source produced the last time it was indexed
+    previous_ids = set(index_manifest.get(index_key, source))
+    chunk_ids = {}
+    batch = []
+    added = 0
+
+    for chunk in chunks:
+        # Assign deterministic IDs and drop chunks repeated within the same source
+        chunk_id = make_chunk_id(source, chunk.page_content)
+        if chunk_id in chunk_ids:
+            continue
+        chunk_ids[chunk_id] = None
+        chunk.metadata["chunk_id"] = chunk_id
+
+        # Embed and upsert only the new chunks
+        if chunk_id in previous_ids:
+            continue
+        added += 1
+
+        if pipeline is not None:
+            pipeline.add([chunk], [chunk_id], source)
+            continue
+
+        batch.append(chunk)
+        if len(batch) >= INDEXING_BATCH_SIZE:
+            _add_chunk_batch(vector_store, batch, index_key)
+            batch = []
+
+    if batch:
+        _add_chunk_batch(vector_store, batch, index_key)
+
+    stale_ids = [chunk_id for chunk_id in previous_ids if chunk_id not in chunk_ids]
+    current_ids = list(chunk_ids)
+    index_changed = bool(added or stale_ids)
+
+    def commit():
+        # Remove the chunks the source no longer produces only once its new chunks are stored,
+        # so a failed batch leaves the previous version of the source searchable
+        if stale_ids:
+            vector_store.delete(ids=stale_ids)
+            if HYBRID_SEARCH_ENABLED:
+                get_sparse_index(index_key).delete(stale_ids)
+
+        # Record the new chunk IDs and drop cached retrievals that may now be outdated
+        index_manifest.set(index_key, source, current_ids)
+        if index_changed:
+            query_cache.invalidate(index_key)
+            if ANSWER_CACHE_ENABLED:
+                get_answer_cache().invalidate_chunks(stale_ids)
+
+    if pipeline is None:
+        commit()
+    else:
+        pipeline.on_source_complete(source, commit)
+
+    return {
+        "total": len(current_ids),
+        "added": added,
+        "unchanged": len(current_ids) - added,
+        "removed": len(stale_ids),
+    }
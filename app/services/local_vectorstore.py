@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import uuid
+import threading
+import numpy as np
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from config.settings import LOCAL_VECTORSTORE_DIR, LOCAL_VECTORSTORE_COMPACT_RATIO
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store backed by a memory-mapped float32 matrix on disk.
+    Vectors are L2-normalized so a single matrix-vector product gives cosine scores.
+    Records live in an append-only JSON lines log replayed on load; deletions are
+    tombstones until the deleted share of rows makes a compaction worthwhile.
+    """
+    def __init__(self, embedding: Embeddings, index_name: str, base_dir: str = LOCAL_VECTORSTORE_DIR):
+        self._embedding = embedding
+        self.index_name = index_name
+        self.directory = os.path.join(base_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", index_name))
+        self._vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._records_path = os.path.join(self.directory, "records.jsonl")
+        self._lock = threading.RLock()
+        self._dimension = None
+        self._matrix = None
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._alive = bytearray()
+        self._rows = {}
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _load(self):
+        """Replay the records log and map the vectors file."""
+        if os.path.exists(self._records_path):
+            with open(self._records_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["op"] == "dim":
+                        self._dimension = record["dim"]
+                    elif record["op"] == "add":
+                        self._append_record(record["id"], record["text"], record["metadata"])
+                    elif record["op"] == "delete":
+                        self._tombstone(record["id"])
+
+        # Drop vectors written by an add whose records never reached the log
+        if os.path.exists(self._vectors_path) and self._dimension:
+            expected_size = len(self._ids) * self._dimension * 4
+            if os.path.getsize(self._vectors_path) > expected_size:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(expected_size)
+        self._remap()
+
+    def _remap(self):
+        """Map the vectors file read-only after it changed on disk."""
+        rows = len(self._ids)
+        if self._dimension is None or rows == 0:
+            self._matrix = np.zeros((0, self._dimension or 0), dtype=np.float32)
+            return
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dimension))
+
+    def _append_record(self, chunk_id: str, text: str, metadata: dict):
+        """Register a new row, tombstoning the previous row of the same ID."""
+        self._tombstone(chunk_id)
+        self._rows[chunk_id] = len(self._ids)
+        self._ids.append(chunk_id)
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+        self._alive.append(1)
+
+    def _tombstone(self, chunk_id: str) -> bool:
+        row = self._rows.pop(chunk_id, None)
+        if row is None:
+            return False
+        self._alive[row] = 0
+        return True
+
+    def add_embeddings(self, ids: List[str], texts: List[str], vectors: List[List[float]], metadatas: List[dict]) -> List[str]:
+        """
+        Add precomputed embeddings, replacing rows that share an ID.
+
+        Args:
+            ids (List[str]): Chunk IDs.
+            texts (List[str]): Chunk texts.
+            vectors (List[List[float]]): Embedding vectors for the texts.
+            metadatas (List[dict]): Metadata dictionaries for the chunks.
+
+        Returns:
+            List[str]: The IDs that were added.
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            records = []
+            if self._dimension is None:
+                self._dimension = matrix.shape[1]
+                records.append({"op": "dim", "dim": self._dimension})
+            elif matrix.shape[1] != self._dimension:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match the index dimension {self._dimension}.")
+
+            # Write vectors before the log so a crash never leaves records without vectors
+            with open(self._vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                self._append_record(chunk_id, text, metadata)
+                records.append({"op": "add", "id": chunk_id, "text": text, "metadata": metadata})
+
+            with open(self._records_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+
+            self._remap()
+        return list(ids)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """Embed and add texts to the store."""
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        return self.add_embeddings(ids, texts, vectors, metadatas)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete rows by ID, compacting the files when enough rows are dead."""
+        if not ids:
+            return False
+        with self._lock:
+            deleted = [chunk_id for chunk_id in ids if self._tombstone(chunk_id)]
+            if deleted:
+                with open(self._records_path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps({"op": "delete", "id": chunk_id}) + "\n" for chunk_id in deleted)
+            if len(self._ids) and 1 - len(self._rows) / len(self._ids) > LOCAL_VECTORSTORE_COMPACT_RATIO:
+                self._compact()
+        return True
+
+    def _compact(self):
+        """Rewrite the vectors file and records log without dead rows."""
+        alive_rows = np.flatnonzero(self._alive_mask())
+        vectors = np.array(self._matrix[alive_rows]) if len(alive_rows) else np.zeros((0, self._dimension), dtype=np.float32)
+        ids = [self._ids[row] for row in alive_rows]
+        texts = [self._texts[row] for row in alive_rows]
+        metadatas = [self._metadatas[row] for row in alive_rows]
+
+        # Release the map before replacing the file it points to
+        self._matrix = None
+        tmp_vectors, tmp_records = self._vectors_path + ".tmp", self._records_path + ".tmp"
+        with open(tmp_vectors, "wb") as f:
+            f.write(vectors.tobytes())
+        with open(tmp_records, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "dim", "dim": self._dimension}) + "\n")
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                f.write(json.dumps({"op": "add", "id": chunk_id, "text": text, "metadata": metadata}) + "\n")
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_records, self._records_path)
+
+        self._ids, self._texts, self._metadatas = ids, texts, metadatas
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        self._alive = bytearray(b"\x01" * len(ids))
+        self._remap()
+
+    def _alive_mask(self) -> np.ndarray:
+        return np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+
+    def get_vectors(self, ids: List[str]) -> dict:
+        """Return the stored, normalized vectors of the given IDs."""
+        with self._lock:
+            return {chunk_id: np.array(self._matrix[self._rows[chunk_id]]) for chunk_id in ids if chunk_id in self._rows}
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        """Return the stored documents of the given IDs, skipping unknown ones."""
+        with self._lock:
+            rows = [(chunk_id, self._rows[chunk_id]) for chunk_id in ids if chunk_id in self._rows]
+            return [Document(id=chunk_id, page_content=self._texts[row], metadata=dict(self._metadatas[row])) for chunk_id, row in rows]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        """
+        Return the k most similar documents to a vector with their cosine scores.
+
+        Args:
+            embedding (List[float]): The query vector.
+            k (int): Number of documents to return.
+            filter (dict): Optional metadata equality filter.
+
+        Returns:
+            List[Tuple[Document, float]]: Documents and scores, best first.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        with self._lock:
+            if self._matrix is None or len(self._matrix) == 0:
+                return []
+            scores = np.asarray(self._matrix @ query)
+            mask = self._alive_mask()
+            if filter:
+                mask &= np.array([all(metadata.get(key) == value for key, value in filter.items()) for metadata in self._metadatas])
+            scores = np.where(mask, scores, -np.inf)
+
+            # Partial sort only the top candidates
+            k = min(k, int(mask.sum()))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            return [
+                (Document(id=self._ids[row], page_content=self._texts[row], metadata=dict(self._metadatas[row])), float(scores[row]))
+                for row in top
+            ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, index_name: str = "default", **kwargs: Any) -> "LocalVectorStore":
+        store = cls(embedding=embedding, index_name=index_name)
+        store.add_texts(texts, metadatas=metadatas, ids=kwargs.get("ids"))
+        return store
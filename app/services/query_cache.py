@@ -0,0 +1,149 @@
+import re
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional
+from config.settings import QUERY_CACHE_TTL, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_SIMILARITY_THRESHOLD
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query and strip punctuation and repeated whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+class SemanticQueryCache:
+    """
+    Cache of retrieval results keyed by normalized query text, with a fallback lookup
+    that reuses results of earlier queries whose embedding is similar enough.
+    Entries are grouped by the key of the index's local state, from local_index_key, the same
+    key invalidate receives. It carries the API key hash of Pinecone indexes, so a query never
+    gets another project's documents and invalidating an index never touches the others.
+    """
+    def __init__(self, ttl: float = QUERY_CACHE_TTL, max_entries: int = QUERY_CACHE_MAX_ENTRIES, threshold: float = QUERY_CACHE_SIMILARITY_THRESHOLD):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._matrices = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return now - entry["created_at"] > self.ttl
+
+    def _remove(self, key: tuple):
+        self._entries.pop(key, None)
+        self._matrices.pop(key[0], None)
+
+    def get_exact(self, index_key: str, query: str) -> Optional[List]:
+        """
+        Return cached documents for the same normalized query, or None.
+
+        Args:
+            index_key (str): Key of the index's local state, from local_index_key.
+            query (str): The user query.
+        """
+        key = (index_key, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.monotonic()):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["documents"]
+
+    def get_similar(self, index_key: str, query_vector: List[float]) -> Optional[List]:
+        """
+        Return cached documents of the most similar earlier query above the threshold, or None.
+
+        Args:
+            index_key (str): Key of the index's local state, from local_index_key.
+            query_vector (List[float]): Embedding of the user query.
+        """
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1)
+
+        with self._lock:
+            keys, matrix = self._index_matrix(index_key)
+            if not keys:
+                self.misses += 1
+                return None
+
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            key = keys[best]
+            entry = self._entries.get(key)
+            if scores[best] < self.threshold or entry is None or self._expired(entry, time.monotonic()):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return entry["documents"]
+
+    def _index_matrix(self, index_key: str):
+        """Return the keys and stacked query vectors of an index, rebuilding them when stale."""
+        cached = self._matrices.get(index_key)
+        if cached is None:
+            keys = [key for key in self._entries if key[0] == index_key]
+            matrix = np.stack([self._entries[key]["vector"] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+            cached = (keys, matrix)
+            self._matrices[index_key] = cached
+        return cached
+
+    def put(self, index_key: str, query: str, query_vector: List[float], documents: List):
+        """
+        Cache the documents retrieved for a query.
+
+        Args:
+            index_key (str): Key of the index's local state, from local_index_key.
+            query (str): The user query.
+            query_vector (List[float]): Embedding of the user query.
+            documents (List): The retrieved documents.
+        """
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1)
+        key = (index_key, normalize_query(query))
+
+        with self._lock:
+            self._entries[key] = {"vector": vector, "documents": documents, "created_at": time.monotonic()}
+            self._entries.move_to_end(key)
+            self._matrices.pop(index_key, None)
+
+            # Evict the least recently used entries when over capacity
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._matrices.pop(evicted_key[0], None)
+                self.evictions += 1
+
+    def invalidate(self, index_key: str = None):
+        """Drop every entry of an index, or the whole cache when no index key is given."""
+        with self._lock:
+            if index_key is None:
+                self._entries.clear()
+                self._matrices.clear()
+                return
+            for key in [key for key in self._entries if key[0] == index_key]:
+                self._remove(key)
+
+    def stats(self) -> dict:
+        """Return cache counters for logging and monitoring."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+# Process-wide query cache shared by every chat session
+query_cache = SemanticQueryCache()
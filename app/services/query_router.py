@@ -0,0 +1,182 @@
+import re
+import math
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import List, NamedTuple, Optional, Tuple
+from config.settings import QUERY_ROUTER_CONFIDENCE_THRESHOLD
+from template.router_examples import ROUTER_EXAMPLES
+
+ROUTE_RETRIEVE = "retrieve"
+ROUTE_RESPOND = "respond"
+
+# Greetings, thanks and farewells followed at most by a few courtesy words, nothing else in the message
+SMALL_TALK_PATTERN = re.compile(
+    r"^(oi+|ola+|e ai|eai|bom dia|boa tarde|boa noite|tudo bem|obrigad[oa]|valeu|vlw|tchau|ate mais|"
+    r"hi|hello|hey|good (morning|afternoon|evening)|thanks?( you)?|thank you|thx|bye|goodbye|ok|okay|beleza)"
+    r"( (tudo|bem|pessoal|amigo|amiga|gente|muito|mesmo|pela|ajuda|entao|ai|la|"
+    r"there|all|everyone|so|much|a|lot|very|again|for|the|help|obrigad[oa]|valeu|thanks?)){0,3}$"
+)
+
+# Questions about the conversation itself or about the assistant
+CONVERSATION_PATTERN = re.compile(
+    r"(minha (ultima|primeira|anterior) (pergunta|mensagem)|o que eu (perguntei|disse|falei)|nossa conversa|"
+    r"resposta anterior|quem e voce|o que voce (consegue|pode) fazer|"
+    r"my (last|previous|first) (question|message)|what did i (ask|say)|our conversation|previous answer|"
+    r"who are you|what can you do)"
+)
+
+# Course codes like "MAT123" or "INF-1010", and article references in regulations
+CODE_PATTERN = re.compile(r"\b[A-Z]{2,4}[- ]?\d{3,4}\b")
+ARTICLE_PATTERN = re.compile(r"\b(art|artigo|article|paragrafo|inciso|section)\.? ?\d+")
+
+# Terms that only make sense against the university documents
+DOMAIN_TERMS = {
+    "edital", "resolucao", "portaria", "regimento", "regulamento", "ementa", "matricula", "rematricula",
+    "trancamento", "disciplina", "disciplinas", "coordenacao", "coordenador", "secretaria", "calendario",
+    "estagio", "tcc", "bolsa", "monitoria", "colacao", "campus", "biblioteca", "departamento", "reitoria",
+    "syllabus", "enrollment", "regulation", "transcript", "scholarship", "semester", "coordinator",
+}
+
+# Short messages starting like this refer to the previous turn and need the LLM to rewrite the query
+FOLLOW_UP_PATTERN = re.compile(r"^(e |e o |e a |and |what about|e quanto|e sobre|isso|disso|dele|dela|it |that )")
+
+class RouteDecision(NamedTuple):
+    route: Optional[str]
+    confidence: float
+    reason: str
+
+# Combining diacritical marks left by the NFKD decomposition of accented letters
+COMBINING_MARKS_PATTERN = re.compile("[\u0300-\u036f]")
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    text = text.lower()
+    if not text.isascii():
+        text = COMBINING_MARKS_PATTERN.sub("", unicodedata.normalize("NFKD", text))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+def extract_features(normalized: str) -> List[str]:
+    """Word unigrams and bigrams used by the lexical classifier."""
+    words = normalized.split()
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+class QueryRouter:
+    """
+    Local router deciding whether a user message needs the retrieve tool or can be answered directly.
+    Deterministic rules handle the clear cases, and a multinomial Naive Bayes classifier trained on
+    labelled examples scores the rest. Decisions below the confidence threshold are left to the LLM.
+    """
+    def __init__(self, examples: List[Tuple[str, str]] = ROUTER_EXAMPLES, threshold: float = QUERY_ROUTER_CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.local_decisions = Counter()
+        self.fallbacks = 0
+        self._train(examples)
+
+    def _train(self, examples: List[Tuple[str, str]]):
+        """Fit the class priors and feature likelihoods with Laplace smoothing."""
+        class_counts = Counter()
+        feature_counts = defaultdict(Counter)
+        for text, label in examples:
+            class_counts[label] += 1
+            feature_counts[label].update(extract_features(normalize_text(text)))
+
+        vocabulary = set()
+        for counts in feature_counts.values():
+            vocabulary.update(counts)
+
+        total = sum(class_counts.values())
+        self._log_priors = {label: math.log(count / total) for label, count in class_counts.items()}
+        self._log_likelihoods = {}
+        self._log_unknown = {}
+        for label, counts in feature_counts.items():
+            denominator = sum(counts.values()) + len(vocabulary)
+            self._log_likelihoods[label] = {feature: math.log((count + 1) / denominator) for feature, count in counts.items()}
+            self._log_unknown[label] = math.log(1 / denominator)
+        self._vocabulary = vocabulary
+
+    def classify(self, normalized: str) -> Tuple[str, float]:
+        """
+        Score a normalized message with the lexical classifier.
+
+        Returns:
+            tuple: (label, posterior probability of the label).
+        """
+        features = [feature for feature in extract_features(normalized) if feature in self._vocabulary]
+        scores = {}
+        for label, prior in self._log_priors.items():
+            likelihoods = self._log_likelihoods[label]
+            scores[label] = prior + sum(likelihoods.get(feature, self._log_unknown[label]) for feature in features)
+
+        # Softmax over the log scores for a calibrated-enough confidence
+        best = max(scores.values())
+        exps = {label: math.exp(score - best) for label, score in scores.items()}
+        label = max(exps, key=exps.get)
+        confidence = exps[label] / sum(exps.values())
+
+        # Shrink towards 0.5 by the share of words seen in training, so unfamiliar messages go to the LLM
+        words = normalized.split()
+        coverage = sum(1 for word in words if word in self._vocabulary) / len(words) if words else 0.0
+        confidence = 0.5 + (confidence - 0.5) * coverage
+        return label, confidence
+
+    def _decide(self, message: str, has_history: bool) -> RouteDecision:
+        normalized = normalize_text(message)
+        if not normalized:
+            return RouteDecision(ROUTE_RESPOND, 1.0, "empty message")
+
+        # Follow-ups need the conversation to build a standalone retrieval query
+        if has_history and len(normalized.split()) <= 6 and FOLLOW_UP_PATTERN.match(normalized + " "):
+            return RouteDecision(None, 0.0, "follow-up question")
+
+        if CONVERSATION_PATTERN.search(normalized):
+            return RouteDecision(ROUTE_RESPOND, 0.95, "question about the conversation")
+
+        # Document references win over a greeting in the same message, like "bom dia, calendário acadêmico?"
+        if CODE_PATTERN.search(message) or ARTICLE_PATTERN.search(normalized):
+            return RouteDecision(ROUTE_RETRIEVE, 0.99, "course code or article reference")
+        if DOMAIN_TERMS.intersection(normalized.split()):
+            return RouteDecision(ROUTE_RETRIEVE, 0.95, "university domain term")
+        if SMALL_TALK_PATTERN.match(normalized):
+            return RouteDecision(ROUTE_RESPOND, 0.99, "small talk")
+
+        label, confidence = self.classify(normalized)
+        return RouteDecision(label, confidence, "lexical classifier")
+
+    def route(self, message: str, has_history: bool = False) -> RouteDecision:
+        """
+        Decide the route for a user message.
+
+        Args:
+            message (str): The last human message.
+            has_history (bool): Whether earlier turns exist in the conversation.
+
+        Returns:
+            RouteDecision: The route, or None when the LLM should decide, with its confidence and reason.
+        """
+        decision = self._decide(message, has_history)
+        if decision.route is not None and decision.confidence < self.threshold:
+            decision = RouteDecision(None, decision.confidence, f"{decision.reason} below threshold ({decision.route})")
+
+        with self._lock:
+            if decision.route is None:
+                self.fallbacks += 1
+            else:
+                self.local_decisions[decision.route] += 1
+        return decision
+
+    def stats(self) -> dict:
+        """Return routing counters for logging and tuning."""
+        with self._lock:
+            local = sum(self.local_decisions.values())
+            total = local + self.fallbacks
+            return {
+                "retrieve": self.local_decisions[ROUTE_RETRIEVE],
+                "respond": self.local_decisions[ROUTE_RESPOND],
+                "llm_fallbacks": self.fallbacks,
+                "local_rate": round(local / total, 3) if total else 0.0,
+            }
+
+# Process-wide router trained once at import
+query_router = QueryRouter()
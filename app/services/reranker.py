@@ -0,0 +1,78 @@
+import numpy as np
+from typing import List, Tuple
+from config.settings import MMR_LAMBDA, MMR_LEXICAL_WEIGHT
+from services.sparse_index import tokenize
+
+def lexical_scores(query: str, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the lexical overlap of the candidates with the query and with each other.
+    Texts become rows of a binary term incidence matrix, so both scores are matrix products.
+
+    Args:
+        query (str): The search query.
+        texts (List[str]): The candidate texts.
+
+    Returns:
+        tuple: (share of distinct query terms in each text, pairwise Jaccard similarity of the texts).
+    """
+    term_sets = [set(tokenize(text)) for text in texts]
+    vocabulary = {term: column for column, term in enumerate(set().union(*term_sets))}
+    incidence = np.zeros((len(texts), len(vocabulary)), dtype=np.float32)
+    for row, terms in enumerate(term_sets):
+        incidence[row, [vocabulary[term] for term in terms]] = 1.0
+
+    query_columns = [vocabulary[term] for term in set(tokenize(query)) if term in vocabulary]
+    query_terms = len(set(tokenize(query)))
+    query_overlap = incidence[:, query_columns].sum(axis=1) / query_terms if query_terms else np.zeros(len(texts), dtype=np.float32)
+
+    intersection = incidence @ incidence.T
+    sizes = incidence.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - intersection
+    jaccard = intersection / np.where(union == 0, 1, union)
+    return query_overlap, jaccard
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def mmr_select(query: str, query_vector, texts: List[str], candidate_vectors, k: int, lambda_mult: float = MMR_LAMBDA, lexical_weight: float = MMR_LEXICAL_WEIGHT) -> List[int]:
+    """
+    Pick k candidates by maximal marginal relevance.
+    Relevance blends the cosine similarity to the query with the share of query terms in the
+    candidate. Redundancy with an already picked candidate is the higher of their cosine and
+    Jaccard similarities, so near-copies left by overlapping chunks are caught even when their
+    embeddings drift apart. Pairwise similarities are computed once, each pick is one vectorized step.
+
+    Args:
+        query (str): The search query.
+        query_vector: The query embedding.
+        texts (List[str]): The candidate texts.
+        candidate_vectors: One embedding per candidate, aligned with the texts.
+        k (int): Number of candidates to pick.
+        lambda_mult (float): Weight of relevance against redundancy, 1 disables diversity.
+        lexical_weight (float): Share of the lexical overlap in the relevance.
+
+    Returns:
+        List[int]: Indices of the picked candidates, in pick order.
+    """
+    matrix = _normalize_rows(np.asarray(candidate_vectors, dtype=np.float32))
+    query_direction = _normalize_rows(np.asarray(query_vector, dtype=np.float32))
+    k = min(k, len(matrix))
+    if k <= 0:
+        return []
+
+    query_overlap, jaccard = lexical_scores(query, texts)
+    relevance = (1 - lexical_weight) * (matrix @ query_direction) + lexical_weight * query_overlap
+    similarity = np.maximum(matrix @ matrix.T, jaccard)
+
+    picked = []
+    redundancy = np.zeros(len(matrix), dtype=np.float32)
+    available = np.ones(len(matrix), dtype=bool)
+    for _ in range(k):
+        # The first pick has no redundancy term and is simply the most relevant candidate
+        scores = relevance if not picked else lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        index = int(np.argmax(np.where(available, scores, -np.inf)))
+        picked.append(index)
+        available[index] = False
+        redundancy = np.maximum(redundancy, similarity[index])
+    return picked
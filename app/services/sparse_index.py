@@ -0,0 +1,372 @@
+import os
+import re
+import gzip
+import json
+import math
+import zlib
+import threading
+import numpy as np
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+from config.settings import SPARSE_INDEX_DIR, SPARSE_INDEX_COMPACT_RATIO, BM25_K1, BM25_B
+from config.logging_config import setup_logging, EnhancedLogger
+from services.query_router import normalize_text
+from services.index_manifest import index_manifest
+from services.vectorstore_service import fetch_documents
+from langchain_core.documents import Document
+
+logger = EnhancedLogger(setup_logging())
+
+# Codes split by normalization ("MAT-123" becomes "mat 123") are also indexed joined as "mat123"
+SPLIT_CODE_PATTERN = re.compile(r"\b([a-z]{2,4}) (\d{3,4})\b")
+
+# Ordinals like "5º" normalize to "5o", also indexed as the bare number
+ORDINAL_PATTERN = re.compile(r"\b(\d+)[oa]\b")
+
+# Frequent words that carry no weight in keyword matching
+STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na", "nos", "nas", "um", "uma",
+    "para", "por", "com", "que", "se", "ao", "aos", "ou", "the", "of", "and", "to", "in", "on", "for", "is", "an",
+}
+
+# Records log compression, favouring indexing speed over the last few percent of size
+GZIP_LEVEL = 6
+
+# Term frequencies are stored as 16-bit counts
+MAX_TERM_FREQUENCY = 65535
+
+# Gzip member header and the zlib window bits that read one gzip member
+GZIP_MAGIC = b"\x1f\x8b"
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# Compressed bytes fed to the decompressor at a time while replaying the records log
+LOG_READ_SIZE = 1 << 20
+
+def iter_gzip_members(data: bytes) -> Iterator[Optional[bytes]]:
+    """
+    Decompress concatenated gzip members one at a time.
+    A member that fails to decompress yields None and reading resumes at the next gzip header,
+    and a member cut short at the end of the data yields what could be decompressed.
+
+    Args:
+        data (bytes): The concatenated members.
+
+    Yields:
+        bytes | None: The content of each member, None for a corrupt one.
+    """
+    view = memoryview(data)
+    position = 0
+    while position < len(data):
+        start = position
+        decompressor = zlib.decompressobj(GZIP_WBITS)
+        parts = []
+        try:
+            while not decompressor.eof and position < len(data):
+                block = view[position:position + LOG_READ_SIZE]
+                parts.append(decompressor.decompress(block))
+                position += len(block) - len(decompressor.unused_data)
+        except zlib.error:
+            yield None
+            next_member = data.find(GZIP_MAGIC, start + 1)
+            position = next_member if next_member != -1 else len(data)
+            continue
+        yield b"".join(parts)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into the terms used by the sparse index.
+    Accents and case are folded like in the query router, and course codes and
+    ordinals get an extra joined form so "INF-1010", "INF1010" and "art. 5º" match.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        List[str]: The terms, repeated as often as they occur.
+    """
+    normalized = normalize_text(text)
+    terms = [term for term in normalized.split() if term not in STOPWORDS]
+    terms.extend(prefix + number for prefix, number in SPLIT_CODE_PATTERN.findall(normalized))
+    terms.extend(ORDINAL_PATTERN.findall(normalized))
+    return terms
+
+class BM25Index:
+    """
+    Local BM25 inverted index over the chunks of one index, named by its local_index_key.
+    Postings are kept in memory as compact typed arrays and scored with numpy, so a query
+    costs a few vector operations per query term. On disk only the chunk records are kept,
+    in a gzip-compressed append-only log replayed on load; postings are rebuilt from it.
+    Deletions are tombstones until the deleted share of rows makes a compaction worthwhile.
+    """
+    def __init__(self, index_name: str, base_dir: str = SPARSE_INDEX_DIR, k1: float = BM25_K1, b: float = BM25_B):
+        self.index_name = index_name
+        self.k1 = k1
+        self.b = b
+        self.directory = os.path.join(base_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", index_name))
+        self._records_path = os.path.join(self.directory, "records.jsonl.gz")
+        self._lock = threading.RLock()
+        self._backfill_lock = threading.Lock()
+        self._backfilled = False
+        self._reset()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _reset(self):
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._lengths = array("I")
+        self._alive = bytearray()
+        self._rows = {}
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._document_frequency = Counter()
+        self._total_length = 0
+
+    def _load(self):
+        """
+        Replay the records log, skipping records that cannot be decoded.
+        Each append is its own gzip member, so a corrupt append only loses its own records;
+        the log is then compacted so the damage is not replayed again.
+        """
+        if not os.path.exists(self._records_path):
+            return
+        with open(self._records_path, "rb") as f:
+            data = f.read()
+
+        skipped = 0
+        for member in iter_gzip_members(data):
+            if member is None:
+                skipped += 1
+                continue
+            for line in member.splitlines():
+                try:
+                    record = json.loads(line)
+                    if record["op"] == "add":
+                        self._append_row(record["id"], record["text"], record["metadata"])
+                    elif record["op"] == "delete":
+                        self._remove_row(record["id"])
+                except (ValueError, KeyError, TypeError):
+                    skipped += 1
+
+        if skipped:
+            logger.warning(f"Sparse index '{self.index_name}' skipped {skipped} unreadable log entries, compacting the log")
+            self._compact()
+
+    def _append_row(self, chunk_id: str, text: str, metadata: dict):
+        """Add the postings of a chunk, removing the previous row of the same ID."""
+        self._remove_row(chunk_id)
+        row = len(self._ids)
+        term_frequencies = Counter(tokenize(text))
+        all_postings = self._postings
+        for term, frequency in term_frequencies.items():
+            postings = all_postings.get(term)
+            if postings is None:
+                postings = all_postings[term] = (array("I"), array("H"))
+            postings[0].append(row)
+            postings[1].append(frequency if frequency < MAX_TERM_FREQUENCY else MAX_TERM_FREQUENCY)
+        self._document_frequency.update(term_frequencies.keys())
+
+        length = sum(term_frequencies.values())
+        self._rows[chunk_id] = row
+        self._ids.append(chunk_id)
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+        self._lengths.append(length)
+        self._alive.append(1)
+        self._total_length += length
+
+    def _remove_row(self, chunk_id: str) -> bool:
+        """Tombstone the row of a chunk and take it out of the collection statistics."""
+        row = self._rows.pop(chunk_id, None)
+        if row is None:
+            return False
+        self._alive[row] = 0
+        self._total_length -= self._lengths[row]
+        self._document_frequency.subtract(set(tokenize(self._texts[row])))
+        return True
+
+    def _write(self, records: List[dict]):
+        # Each append is a new gzip member, which gzip readers concatenate transparently
+        with gzip.open(self._records_path, "at", compresslevel=GZIP_LEVEL, encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def backfill(self, vector_store) -> int:
+        """
+        Add the chunks the index manifest records for this index but the sparse index lacks, once per process.
+        This covers sources indexed before the sparse index existed and records lost to a corrupt log.
+        The manifest rows are read under the same tenant-aware key, so only this index's chunks are fetched.
+
+        Args:
+            vector_store (PineconeVectorStore | LocalVectorStore): The vector store of the same index.
+
+        Returns:
+            int: Number of chunks added.
+        """
+        with self._backfill_lock:
+            if self._backfilled:
+                return 0
+            self._backfilled = True
+
+            with self._lock:
+                missing = [chunk_id for chunk_id in index_manifest.chunk_ids(self.index_name) if chunk_id not in self._rows]
+            if not missing:
+                return 0
+            try:
+                documents = fetch_documents(vector_store, missing)
+            except RuntimeError as e:
+                logger.error(f"Sparse index '{self.index_name}' backfill", e)
+                return 0
+            self.add([document.id for document in documents], [document.page_content for document in documents], [document.metadata for document in documents])
+            logger.retrieval("Sparse index backfill", {"index": self.index_name, "missing": len(missing), "added": len(documents)})
+            return len(documents)
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[dict]):
+        """
+        Index chunks, replacing rows that share an ID.
+
+        Args:
+            ids (List[str]): Chunk IDs, the same IDs used in the vector store.
+            texts (List[str]): Chunk texts.
+            metadatas (List[dict]): Metadata dictionaries for the chunks.
+        """
+        with self._lock:
+            records = []
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                self._append_row(chunk_id, text, metadata)
+                records.append({"op": "add", "id": chunk_id, "text": text, "metadata": metadata})
+            if records:
+                self._write(records)
+
+    def delete(self, ids: List[str]):
+        """Delete chunks by ID, compacting the log when enough rows are dead."""
+        with self._lock:
+            deleted = [chunk_id for chunk_id in ids if self._remove_row(chunk_id)]
+            if deleted:
+                self._write([{"op": "delete", "id": chunk_id} for chunk_id in deleted])
+            if len(self._ids) and 1 - len(self._rows) / len(self._ids) > SPARSE_INDEX_COMPACT_RATIO:
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the log with the live rows only, as a single gzip member, and rebuild the postings."""
+        live = [(self._ids[row], self._texts[row], self._metadatas[row]) for row in self._rows.values()]
+        tmp_records = self._records_path + ".tmp"
+        with gzip.open(tmp_records, "wt", compresslevel=GZIP_LEVEL, encoding="utf-8") as f:
+            for chunk_id, text, metadata in live:
+                f.write(json.dumps({"op": "add", "id": chunk_id, "text": text, "metadata": metadata}) + "\n")
+        os.replace(tmp_records, self._records_path)
+
+        self._reset()
+        for chunk_id, text, metadata in live:
+            self._append_row(chunk_id, text, metadata)
+
+    def _score(self, terms: set) -> np.ndarray:
+        """
+        Compute the BM25 score of every row for a set of query terms.
+        The numpy views over the postings arrays are released before returning,
+        since typed arrays exporting a buffer cannot grow.
+        """
+        live_rows = len(self._rows)
+        average_length = self._total_length / live_rows or 1.0
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+        scores = np.zeros(len(self._ids), dtype=np.float32)
+
+        for term in terms:
+            postings = self._postings.get(term)
+            frequency = self._document_frequency.get(term, 0)
+            if postings is None or frequency == 0:
+                continue
+            idf = math.log(1 + (live_rows - frequency + 0.5) / (frequency + 0.5))
+            rows = np.frombuffer(postings[0], dtype=np.uint32)
+            term_frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+            norms = self.k1 * (1 - self.b + self.b * lengths[rows] / average_length)
+            scores[rows] += idf * term_frequencies * (self.k1 + 1) / (term_frequencies + norms)
+
+        scores *= np.frombuffer(self._alive, dtype=np.uint8)
+        return scores
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """
+        Return the k chunks with the highest BM25 score for a query.
+
+        Args:
+            query (str): The search query.
+            k (int): Number of chunks to return.
+
+        Returns:
+            List[Tuple[Document, float]]: Documents and scores, best first; only chunks sharing a term with the query.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._rows:
+                return []
+            scores = self._score(terms)
+
+            candidates = np.flatnonzero(scores > 0)
+            k = min(k, len(candidates))
+            if k <= 0:
+                return []
+            top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+
+            return [
+                (Document(id=self._ids[row], page_content=self._texts[row], metadata=dict(self._metadatas[row])), float(scores[row]))
+                for row in top
+            ]
+
+    def stats(self) -> dict:
+        """Return the size of the index for logging."""
+        with self._lock:
+            return {"chunks": len(self._rows), "terms": len(self._postings), "dead_rows": len(self._ids) - len(self._rows)}
+
+def document_key(document: Document) -> str:
+    """Identify a retrieved chunk across the dense and sparse result lists."""
+    return document.id or document.metadata.get("chunk_id") or document.page_content
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Merge ranked result lists by reciprocal rank fusion.
+    Each document scores the sum of 1 / (rrf_k + rank) over the lists it appears in, so
+    ranks are combined without having to calibrate cosine and BM25 scores against each other.
+
+    Args:
+        result_lists (List[List[Document]]): Ranked documents, best first, from each retriever.
+        k (int): Number of documents to return.
+        rrf_k (int): Rank offset damping the weight of the top positions.
+
+    Returns:
+        List[Document]: The fused ranking, best first.
+    """
+    scores = Counter()
+    documents = {}
+    for results in result_lists:
+        for rank, document in enumerate(results, start=1):
+            key = document_key(document)
+            scores[key] += 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    return [documents[key] for key, _ in scores.most_common(k)]
+
+# Sparse indexes by index key, which carries the API key hash of Pinecone indexes, so tenants never share one
+_sparse_indexes = {}
+_sparse_indexes_lock = threading.Lock()
+
+def get_sparse_index(index_key: str, vector_store=None) -> BM25Index:
+    """
+    Return the process-wide sparse index of an index, loading it on first use.
+    Given the vector store of the same index, chunks it lacks are backfilled first, see BM25Index.backfill.
+
+    Args:
+        index_key (str): Key of the index's local state, from local_index_key.
+        vector_store (PineconeVectorStore | LocalVectorStore): The vector store the index key was built for.
+
+    Returns:
+        BM25Index: The sparse index.
+    """
+    with _sparse_indexes_lock:
+        if index_key not in _sparse_indexes:
+            _sparse_indexes[index_key] = BM25Index(index_key)
+        sparse_index = _sparse_indexes[index_key]
+    if vector_store is not None:
+        sparse_index.backfill(vector_store)
+    return sparse_index
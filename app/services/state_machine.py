@@ -1,23 +1,57 @@
-import streamlit as st
+import re
+import time
+import uuid
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated
 from typing_extensions import TypedDict, List
 from config.logging_config import setup_logging, EnhancedLogger
-from core.handlers import StreamHandler
-from services.vectorstore_service import initialize_vectorstore
+from services.vectorstore_service import get_vectorstore, vectorstore_registry, similarity_search_with_vectors, local_index_key
+from services.embedding_cache import get_embedding_cache
+from services.query_cache import query_cache
+from services.answer_cache import AnswerCache, get_answer_cache, context_fingerprints
+from services.checkpointer import get_checkpointer, config_secret
+from services.query_router import query_router, ROUTE_RETRIEVE, ROUTE_RESPOND
+from services.sparse_index import get_sparse_index, reciprocal_rank_fusion, document_key
+from services.reranker import mmr_select
+from config.settings import QUERY_CACHE_ENABLED, ANSWER_CACHE_ENABLED, QUERY_ROUTER_ENABLED, HISTORY_MAX_TOKENS, VECTORSTORE_BACKEND
+from config.settings import HYBRID_SEARCH_ENABLED, HYBRID_RRF_K, RETRIEVAL_K, RETRIEVAL_FETCH_K, MMR_ENABLED, CONTEXT_MAX_TOKENS
 from template.rag_prompt import RAG_SYSTEM_PROMPT
 from template.tool_decision_prompt import TOOL_DECISION_SYSTEM_PROMPT
-from utils.tool_call_parser import parse_tool_call
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, trim_messages
-from langchain_core.tools import tool
+from utils.token_counter import message_token_count, trim_history
+from utils.context_packer import pack_context
+from utils.tool_call_parser import IncrementalJSONParser, parse_tool_call_object
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, RemoveMessage
+from langchain_core.tools import StructuredTool
+from langchain_core.runnables import RunnableLambda, RunnableConfig
 from langchain_community.chat_models import ChatMaritalk
-from langgraph.graph import StateGraph, MessagesState, END
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt import ToolNode, tools_condition, InjectedState
 
 logger = EnhancedLogger(setup_logging())
 
+# Model used for every chat completion
+LLM_MODEL = "sabia-3"
+
+# Events written by the nodes to the custom stream, consumed by the UI and the HTTP API
+EVENT_TOKEN = "token"
+EVENT_STATUS = "status"
+TOOL_CALL_STATUS = "I will use the tool to get more information, please wait a moment."
+
+# Cached answers are replayed word by word, so clients render them like a streamed answer
+REPLAY_CHUNK_PATTERN = re.compile(r"\s*\S+")
+
 # Define the state for the graph
+# History and index configuration travel in the state, API keys only in config["configurable"]
+# so they are never written to the checkpoints
 class MessagesState(TypedDict):
-    messages: List
+    messages: Annotated[List, add_messages]
+    pinecone_index_name: str
+    embedding_model: str
+    vectorstore_backend: str
 
 def initialize_llm(llm_api_key: str, stream: bool = True) -> ChatMaritalk:
     """
@@ -32,7 +66,7 @@ def initialize_llm(llm_api_key: str, stream: bool = True) -> ChatMaritalk:
     """
 
     return ChatMaritalk(
-        model="sabia-3",
+        model=LLM_MODEL,
         api_key=llm_api_key,
         max_tokens=50000,
         temperature=0.2,
@@ -40,29 +74,131 @@ def initialize_llm(llm_api_key: str, stream: bool = True) -> ChatMaritalk:
         callbacks=[],
     )
 
-@tool(response_format="content_and_artifact")
-def retrieve(query: str, pinecone_api_key: str, pinecone_index_name: str, embedding_model: str) -> tuple[str, List]:
+def conversation_messages(messages: List) -> List:
+    """Keep the human messages and final AI answers, dropping tool calls and tool results."""
+    return [
+        msg for msg in messages
+        if msg.type == "human" or (msg.type == "ai" and not getattr(msg, "tool_calls", None))
+    ]
+
+def _emit(event_type: str, node: str, content: str):
+    """Write an event to the custom stream, a no-op when the caller does not stream it."""
+    get_stream_writer()({"type": event_type, "node": node, "content": content})
+
+def _replay_chunks(text: str) -> List[str]:
+    """Split a stored answer into the word-sized chunks a streamed answer would arrive in."""
+    chunks = REPLAY_CHUNK_PATTERN.findall(text)
+    # Keep trailing whitespace so the chunks join back to the exact answer
+    tail = text[sum(map(len, chunks)):]
+    if tail:
+        chunks.append(tail)
+    return chunks
+
+def _retrieval_target(state: dict, config: RunnableConfig):
+    """Get the pooled vector store and the key of the index's local state, which also keys the query cache."""
+    pinecone_index_name = state.get("pinecone_index_name")
+    embedding_model = state.get("embedding_model")
+    vectorstore_backend = state.get("vectorstore_backend") or VECTORSTORE_BACKEND
+    pinecone_api_key = config_secret(config, "pinecone_api_key")
+
+    vector_store = get_vectorstore(
+        api_key=pinecone_api_key,
+        index_name=pinecone_index_name,
+        embedding_model=embedding_model,
+        backend=vectorstore_backend
+    )
+    logger.pool("Vector store registry", vectorstore_registry.stats())
+    return vector_store, local_index_key(pinecone_api_key, pinecone_index_name, embedding_model, vectorstore_backend)
+
+def _serialize_retrieved(retrieved_docs: List) -> tuple[str, List]:
+    """Log the retrieval and serialize the documents into the tool message content."""
+    logger.tool_document("Documents found", retrieved_docs)
+    logger.cache("Query cache", query_cache.stats())
+    logger.cache("Embedding cache", get_embedding_cache().stats())
+
+    serialized = "\n\n".join(
+        f"Source: {doc.metadata}\nContent: {doc.page_content}"
+        for doc in retrieved_docs
+    )
+    return serialized, retrieved_docs
+
+# Keyword searches run on these threads while the sync retrieval embeds the query and searches the vector store
+_sparse_executor = ThreadPoolExecutor(thread_name_prefix="sparse-search")
+
+def _sparse_search(vector_store, index_key: str, query: str) -> List:
+    """Search the BM25 index of an index for the candidates of the hybrid retrieval."""
+    try:
+        start = time.perf_counter()
+        sparse_index = get_sparse_index(index_key, vector_store)
+        results = sparse_index.search(query, k=RETRIEVAL_FETCH_K)
+        logger.retrieval("Sparse search", {**sparse_index.stats(), "hits": len(results), "ms": round((time.perf_counter() - start) * 1000, 2)})
+        return [doc for doc, _ in results]
+
+    # The dense results alone still answer the query
+    except Exception as e:
+        logger.error("Sparse search", e)
+        return []
+
+def _fuse_results(dense_docs: List, sparse_docs: List) -> List:
+    """Merge the dense and keyword candidates by reciprocal rank fusion."""
+    if not HYBRID_SEARCH_ENABLED:
+        return dense_docs
+    fused = reciprocal_rank_fusion([dense_docs, sparse_docs], k=RETRIEVAL_FETCH_K, rrf_k=HYBRID_RRF_K)
+    logger.retrieval("Rank fusion", {"dense": len(dense_docs), "sparse": len(sparse_docs), "fused": len(fused)})
+    return fused
+
+def _missing_vectors(candidates: List, vectors: dict) -> List:
+    """Candidates without a stored vector, the keyword-only matches, which MMR needs embedded."""
+    if not MMR_ENABLED:
+        return []
+    return [doc for doc in candidates if document_key(doc) not in vectors]
+
+def _rerank(query: str, query_vector: List[float], candidates: List, vectors: dict) -> List:
+    """Re-rank the candidates by maximal marginal relevance and keep the top RETRIEVAL_K."""
+    if not MMR_ENABLED or len(candidates) <= RETRIEVAL_K:
+        return candidates[:RETRIEVAL_K]
+    picked = mmr_select(
+        query,
+        query_vector,
+        [doc.page_content for doc in candidates],
+        [vectors[document_key(doc)] for doc in candidates],
+        RETRIEVAL_K,
+    )
+    logger.retrieval("MMR re-rank", {"candidates": len(candidates), "picked": picked})
+    return [candidates[index] for index in picked]
+
+# Candidates fetched from each retriever, more than the final k only when a later stage selects among them
+FETCH_K = RETRIEVAL_FETCH_K if HYBRID_SEARCH_ENABLED or MMR_ENABLED else RETRIEVAL_K
+
+def _retrieve(query: str, state: Annotated[dict, InjectedState], config: RunnableConfig) -> tuple[str, List]:
     """Retrieve relevant documents based on the user query about university files and related subjects."""
     try:
         logger.tool_query("Retrieve with query", query)
+        vector_store, index_key = _retrieval_target(state, config)
 
-        # Initialize the vector store
-        vector_store = initialize_vectorstore(
-            api_key=pinecone_api_key,
-            index_name=pinecone_index_name,
-            embedding_model=embedding_model
-        )  
+        # Serve repeated and near-duplicate queries from the query cache
+        retrieved_docs = query_cache.get_exact(index_key, query) if QUERY_CACHE_ENABLED else None
 
-        # Perform the similarity search     
-        retrieved_docs = vector_store.similarity_search(query, k=3)
-        logger.tool_document("Documents found", retrieved_docs)
+        if retrieved_docs is None:
+            # Start the keyword search while the query is embedded and searched densely
+            sparse_future = _sparse_executor.submit(_sparse_search, vector_store, index_key, query) if HYBRID_SEARCH_ENABLED else None
 
-        # Serialize the retrieved documents
-        serialized = "\n\n".join(
-            f"Source: {doc.metadata}\nContent: {doc.page_content}"
-            for doc in retrieved_docs
-        )
-        return serialized, retrieved_docs
+            query_vector = vector_store.embeddings.embed_query(query)
+            retrieved_docs = query_cache.get_similar(index_key, query_vector) if QUERY_CACHE_ENABLED else None
+
+            # Over-fetch with the similarity search, fuse it with the keyword matches and re-rank
+            if retrieved_docs is None:
+                dense_docs, vectors = similarity_search_with_vectors(vector_store, query_vector, k=FETCH_K)
+                candidates = _fuse_results(dense_docs, sparse_future.result() if sparse_future else [])
+                missing = _missing_vectors(candidates, vectors)
+                if missing:
+                    embedded = vector_store.embeddings.embed_documents([doc.page_content for doc in missing])
+                    vectors.update(zip(map(document_key, missing), embedded))
+                retrieved_docs = _rerank(query, query_vector, candidates, vectors)
+                if QUERY_CACHE_ENABLED:
+                    query_cache.put(index_key, query, query_vector, retrieved_docs)
+
+        return _serialize_retrieved(retrieved_docs)
 
     except RuntimeError as re:
         error_msg = f"Tool Error {str(re)}"
@@ -74,109 +210,236 @@ def retrieve(query: str, pinecone_api_key: str, pinecone_index_name: str, embedd
         logger.error("Unexpected error in 'retrieve' tool", e)
         return error_msg, []
 
-def query_or_respond(state: MessagesState):
-    """Handles the logic for querying or responding based on the user's input and system instructions."""
-    llm_api_key = st.session_state.get("llm_api_key")
+async def _aretrieve(query: str, state: Annotated[dict, InjectedState], config: RunnableConfig) -> tuple[str, List]:
+    """Retrieve relevant documents based on the user query about university files and related subjects."""
+    try:
+        logger.tool_query("Retrieve with query", query)
+        # Opening a vector store on a registry miss connects to the backend, keep it off the event loop
+        vector_store, index_key = await asyncio.to_thread(_retrieval_target, state, config)
+
+        # Serve repeated and near-duplicate queries from the query cache
+        retrieved_docs = query_cache.get_exact(index_key, query) if QUERY_CACHE_ENABLED else None
+
+        if retrieved_docs is None:
+            # Start the keyword search while the query is embedded and searched densely
+            sparse_task = asyncio.create_task(asyncio.to_thread(_sparse_search, vector_store, index_key, query)) if HYBRID_SEARCH_ENABLED else None
+
+            try:
+                query_vector = await vector_store.embeddings.aembed_query(query)
+                retrieved_docs = query_cache.get_similar(index_key, query_vector) if QUERY_CACHE_ENABLED else None
+
+                # Over-fetch with the similarity search off the event loop, fuse it with the keyword matches and re-rank
+                if retrieved_docs is None:
+                    dense_docs, vectors = await asyncio.to_thread(similarity_search_with_vectors, vector_store, query_vector, FETCH_K)
+                    candidates = _fuse_results(dense_docs, await sparse_task if sparse_task else [])
+                    missing = _missing_vectors(candidates, vectors)
+                    if missing:
+                        embedded = await vector_store.embeddings.aembed_documents([doc.page_content for doc in missing])
+                        vectors.update(zip(map(document_key, missing), embedded))
+                    retrieved_docs = _rerank(query, query_vector, candidates, vectors)
+                    if QUERY_CACHE_ENABLED:
+                        query_cache.put(index_key, query, query_vector, retrieved_docs)
+            finally:
+                # Never leave the keyword search task unawaited
+                if sparse_task and not sparse_task.done():
+                    sparse_task.cancel()
+
+        return _serialize_retrieved(retrieved_docs)
 
-    # Initialize the LLM without streaming for tool detection
-    # At this point, there is no need to stream for tool detection
-    llm_for_tools = initialize_llm(llm_api_key, stream=False) 
+    except RuntimeError as re:
+        error_msg = f"Tool Error {str(re)}"
+        logger.error("Runtime error in 'retrieve' tool", re)
+        return error_msg, []
 
-    # Create a copy of messages for trimming excluding system message
-    history_for_trimming = [msg for msg in state["messages"] if msg.type != "system"]
+    except Exception as e:
+        error_msg = f"Tool Error {str(e)}"
+        logger.error("Unexpected error in 'retrieve' tool", e)
+        return error_msg, []
+
+# Retrieve tool with sync and async implementations, picked by invoke or ainvoke
+# The LLM only provides the query, the index configuration is injected from the graph state
+retrieve = StructuredTool.from_function(
+    func=_retrieve,
+    coroutine=_aretrieve,
+    name="retrieve",
+    response_format="content_and_artifact",
+)
+
+def _prepare_decision(state: MessagesState):
+    """
+    Build the tool decision prompt and route the last human message locally.
+
+    Returns:
+        tuple: (prompt, local tool call response or None).
+    """
+    # Create a copy of the conversation for trimming excluding system and tool messages
+    history_for_trimming = [msg for msg in conversation_messages(state["messages"]) if msg.type != "system"]
     
     logger.initializing()
 
-    # Trim messages to fit within the token limit from the LLM
-    trimmer = trim_messages(
-        max_tokens=40000,
-        strategy="last",
-        token_counter=llm_for_tools,
-        include_system=False,
-        allow_partial=False,
-        start_on="human",
-    )
-
-    trimmed_messages = trimmer.invoke(history_for_trimming)
+    # Trim messages to fit within the token limit using the cached per-message counts
+    trimmed_messages = trim_history(history_for_trimming, HISTORY_MAX_TOKENS)
 
     # Log trimmed messages for debugging
     logger.trimmer("All state messages excluding system", trimmed_messages)
 
-    # Generate system instructions that is oriented to generate the tool call or not
-    tool_decision_system_prompt = TOOL_DECISION_SYSTEM_PROMPT.format(
-        pinecone_api_key=st.session_state.get("pinecone_api_key"),
-        pinecone_index_name=st.session_state.get("pinecone_index_name"),
-        embedding_model=st.session_state.get("embedding_model")
-    )
-
-    prompt = [SystemMessage(content=tool_decision_system_prompt)] + trimmed_messages
-    
-    # Call the LLM to get initial response
-    logger.llm_decision("Validating", "Checking if tool call is needed")
-    
-    response = llm_for_tools.invoke(prompt)
-    content = response.content.strip()
-    
-    logger.llm_response("Response content", content)
-    
-    # Check if it looks like a JSON response starts with open brace
-    if content.startswith('{'):
-        st.toast("I will use the tool to get more information, please wait a moment.", icon=":material/robot:")
-        logger.llm_decision("Analyzing", "Potential tool call detected")
-        
-        # Try to balance braces if they're unbalanced
-        open_braces = content.count('{')
-        close_braces = content.count('}')
-        if open_braces > close_braces:
-            logger.llm_decision("Detected unbalanced braces", f"{open_braces} opening vs {close_braces} closing")
-            # Add missing closing braces
-            content = content + ('}' * (open_braces - close_braces))
-            response.content = content
-
-        # Check if the response contains a tool call
-        tool_call = parse_tool_call(response)
-    
-        if tool_call:
-            # At AI message add the tool call attribute so it can be processed later
-            response.tool_calls = [tool_call]    
-            
-            # Add response to history for tool processing
-            state["messages"].append(response)
-            return {"messages": [response]}
-    
-    # No tool call detected
+    # System instructions oriented to generate the tool call or not
+    prompt = [SystemMessage(content=TOOL_DECISION_SYSTEM_PROMPT.format())] + trimmed_messages
+
+    # Route locally first and only ask the LLM when the router is not confident
+    decision = None
+    human_messages = [msg for msg in history_for_trimming if msg.type == "human"]
+    if QUERY_ROUTER_ENABLED and human_messages:
+        decision = query_router.route(human_messages[-1].content, has_history=len(history_for_trimming) > 1)
+        logger.route(decision, query_router.stats())
+
+    if decision is not None and decision.route == ROUTE_RETRIEVE:
+        _emit(EVENT_STATUS, "query_or_respond", TOOL_CALL_STATUS)
+        response = AIMessage(content="", tool_calls=[{
+            "name": "retrieve",
+            "args": {"query": human_messages[-1].content},
+            "id": str(uuid.uuid4()),
+        }])
+        return prompt, response
+
+    # The decision call is streamed once and routed on its first non-blank character
+    if decision is not None and decision.route == ROUTE_RESPOND:
+        logger.llm_decision("Routed locally", "Generating and streaming final response")
     else:
-        logger.llm_decision("No tool call detected", "Generating and streaming final response")
-        # For direct answers use streaming in UI
-        with st.chat_message("assistant", avatar=":material/mindfulness:"):
-            stream_container = st.empty()
-            stream_handler = StreamHandler(stream_container)
-            
-            # Initialize streaming LLM for direct response
-            streaming_llm = initialize_llm(llm_api_key, stream=True)
-            streaming_llm.callbacks = [stream_handler]
-            
-            # Generate a new streaming response
-            accumulated_response = ""
-            for chunk in streaming_llm.stream(prompt):
-                if chunk.content:
-                    accumulated_response += chunk.content
-            
-            # Create final message and add to history
-            ai_message = AIMessage(content=accumulated_response)
-            state["messages"].append(ai_message)
-            return {"messages": state["messages"]}
-        
-def generate(state: MessagesState):
-    """Generate the final response using the tool's content."""
-    llm_api_key = st.session_state.get("llm_api_key")
+        logger.llm_decision("Validating", "Checking if tool call is needed")
+    return prompt, None
+
+def _start_tool_call(leading: str) -> IncrementalJSONParser:
+    """Announce a potential tool call and start parsing it."""
+    _emit(EVENT_STATUS, "query_or_respond", TOOL_CALL_STATUS)
+    logger.llm_decision("Analyzing", "Potential tool call detected")
+    parser = IncrementalJSONParser()
+    parser.feed(leading)
+    return parser
+
+def _finish_tool_call(parser: IncrementalJSONParser):
+    """Turn a parsed tool call into the AI message routed to the tools node, or None if it is not one."""
+    logger.llm_response("Response content", parser.text)
+
+    # Check if the response contains a tool call
+    tool_call = parse_tool_call_object(parser.result())
+    if not tool_call:
+        return None
+
+    # At AI message add the tool call attribute so it can be processed later
+    return {"messages": [AIMessage(content=parser.text, tool_calls=[tool_call])]}
+
+def _finish_direct_response(accumulated_response: str):
+    """Add a direct answer to the history."""
+    logger.llm_response("Response content", accumulated_response)
+
+    # Create final message and add to history
+    ai_message = AIMessage(content=accumulated_response)
+    message_token_count(ai_message)
+    return {"messages": [ai_message]}
+
+def query_or_respond(state: MessagesState, config: RunnableConfig):
+    """Handles the logic for querying or responding based on the user's input and system instructions."""
+    prompt, routed_response = _prepare_decision(state)
+    if routed_response is not None:
+        return {"messages": [routed_response]}
+
+    streaming_llm = initialize_llm(config_secret(config, "llm_api_key"), stream=True)
+    stream = streaming_llm.stream(prompt)
+    leading = ""
+    for chunk in stream:
+        leading += chunk.content or ""
+        if leading.strip():
+            break
+    leading = leading.lstrip()
+
+    # Potential tool call, consume the stream only until the JSON object closes
+    if leading.startswith("{"):
+        parser = _start_tool_call(leading)
+        if not parser.complete:
+            for chunk in stream:
+                if parser.feed(chunk.content or ""):
+                    break
+        stream.close()
+
+        tool_call_response = _finish_tool_call(parser)
+        if tool_call_response is not None:
+            return tool_call_response
+
+        # Not a tool call, show the JSON-looking text as the answer
+        _emit(EVENT_TOKEN, "query_or_respond", parser.text)
+        return _finish_direct_response(parser.text)
+
+    # No tool call detected, keep streaming the in-flight answer
+    logger.llm_decision("No tool call detected", "Generating and streaming final response")
+    accumulated_response = leading
+    _emit(EVENT_TOKEN, "query_or_respond", leading)
+    for chunk in stream:
+        if chunk.content:
+            accumulated_response += chunk.content
+            _emit(EVENT_TOKEN, "query_or_respond", chunk.content)
+
+    return _finish_direct_response(accumulated_response)
+
+async def aquery_or_respond(state: MessagesState, config: RunnableConfig):
+    """Async version of query_or_respond, streaming the decision call without blocking the event loop."""
+    prompt, routed_response = _prepare_decision(state)
+    if routed_response is not None:
+        return {"messages": [routed_response]}
+
+    streaming_llm = initialize_llm(config_secret(config, "llm_api_key"), stream=True)
+    stream = streaming_llm.astream(prompt)
+    leading = ""
+    async for chunk in stream:
+        leading += chunk.content or ""
+        if leading.strip():
+            break
+    leading = leading.lstrip()
+
+    # Potential tool call, consume the stream only until the JSON object closes
+    if leading.startswith("{"):
+        parser = _start_tool_call(leading)
+        if not parser.complete:
+            async for chunk in stream:
+                if parser.feed(chunk.content or ""):
+                    break
+        await stream.aclose()
+
+        tool_call_response = _finish_tool_call(parser)
+        if tool_call_response is not None:
+            return tool_call_response
+
+        # Not a tool call, show the JSON-looking text as the answer
+        _emit(EVENT_TOKEN, "query_or_respond", parser.text)
+        return _finish_direct_response(parser.text)
+
+    # No tool call detected, keep streaming the in-flight answer
+    logger.llm_decision("No tool call detected", "Generating and streaming final response")
+    accumulated_response = leading
+    _emit(EVENT_TOKEN, "query_or_respond", leading)
+    async for chunk in stream:
+        if chunk.content:
+            accumulated_response += chunk.content
+            _emit(EVENT_TOKEN, "query_or_respond", chunk.content)
+
+    return _finish_direct_response(accumulated_response)
+
+def _prepare_generation(state: MessagesState):
+    """
+    Build the RAG prompt from the tool messages and look up the answer cache.
+
+    Returns:
+        tuple: (prompt, answer cache key, context fingerprints, cached answer or None, messages to remove).
 
+    Raises:
+        RuntimeError: If no tool message is found or the tool reported an error.
+    """
     logger.llm_with_tools("Generating final response using knowledge base")
 
-    # Get recent tool messages to extract context
-    recent_tool_messages = [
-        m for m in reversed(state["messages"]) if m.type == "tool"
-    ][::-1]
+    # Get the tool messages answering the last tool call
+    messages = state["messages"]
+    tool_call_index = max((i for i, m in enumerate(messages) if m.type == "ai" and getattr(m, "tool_calls", None)), default=-1)
+    recent_tool_messages = [m for m in messages[tool_call_index + 1:] if m.type == "tool"]
     
     logger.llm_tool_response("Recent tool messages", recent_tool_messages)
     
@@ -188,29 +451,26 @@ def generate(state: MessagesState):
     # Check if the last tool message contains an error
     last_tool_msg = recent_tool_messages[0]
     if "Tool Error" in last_tool_msg.content:
-        last_tool_msg.content = last_tool_msg.content.replace("Tool Error", "")
-
-        # Remove last AI message from history to avoid message displaying in UI
-        if st.session_state["messages"] and isinstance(st.session_state["messages"][-1], AIMessage):
-            st.session_state["messages"].pop()
+        raise RuntimeError(last_tool_msg.content.replace("Tool Error", ""))
 
-        raise RuntimeError(last_tool_msg.content)
-
-    # Extract context from tool responses
-    docs_content = "\n\n".join(t.content for t in recent_tool_messages)
+    # Pack the retrieved documents into the context budget, or fall back to the raw tool responses
+    retrieved_docs = [doc for t in recent_tool_messages for doc in (t.artifact or [])]
+    if retrieved_docs:
+        docs_content, packing_stats = pack_context(retrieved_docs, CONTEXT_MAX_TOKENS)
+        logger.retrieval("Context packing", packing_stats)
+    else:
+        docs_content = "\n\n".join(t.content for t in recent_tool_messages)
 
     # Filter conversation messages to include only human messages
-    conversation_messages = [
-        m for m in st.session_state["messages"] if isinstance(m, HumanMessage)
-    ]
-    logger.llm_tool_response("All human conversation messages", conversation_messages)
+    human_messages = [m for m in messages if isinstance(m, HumanMessage)]
+    logger.llm_tool_response("All human conversation messages", human_messages)
 
     # Get the last human message
-    if conversation_messages:
-        last_human_message = conversation_messages[-1]
-        logger.llm_tool_last_message("Last human message", last_human_message.content)
-    else:
+    if not human_messages:
         logger.warning("No human messages found in the conversation history.")
+        raise RuntimeError("No question found in the conversation history.")
+    last_human_message = human_messages[-1]
+    logger.llm_tool_last_message("Last human message", last_human_message.content)
 
     # Generate the system prompt for RAG
     rag_system_prompt = RAG_SYSTEM_PROMPT.format(context=docs_content)
@@ -218,55 +478,108 @@ def generate(state: MessagesState):
     # Create the final prompt for the LLM last human message and context
     prompt = [SystemMessage(content=rag_system_prompt), HumanMessage(content=last_human_message.content)] 
 
-    # Stream the response to UI
-    with st.chat_message("assistant", avatar=":material/psychology:"):
-        stream_container = st.empty()
-        stream_handler = StreamHandler(stream_container)
-        
-        # Re-initialize LLM with streaming for UI
-        streaming_llm = initialize_llm(llm_api_key, stream=True)
-        streaming_llm.callbacks = [stream_handler]
-        
-        # Stream response chunks to UI
-        accumulated_response = ""
-        for chunk in streaming_llm.stream(prompt):
-            if chunk.content:
-                accumulated_response += chunk.content
-        
-        # Remove last AI message from history to avoid tool call messsage persisting to next query
-        if st.session_state["messages"] and isinstance(st.session_state["messages"][-1], AIMessage):
-            st.session_state["messages"].pop()
-
-        # Create final message and add to history
-        ai_message = AIMessage(content=accumulated_response)
-        st.session_state["messages"].append(ai_message)
-        return {"messages": st.session_state["messages"]}
-
-
-# Build the state graph
-builder = StateGraph(MessagesState)
-builder.add_node("query_or_respond", query_or_respond)
-tool_node = ToolNode([retrieve])
-builder.add_node("tools", tool_node)
-builder.add_node("generate", generate)
-
-# Define entry point
-builder.set_entry_point("query_or_respond")
-
-# Define conditional edges
-builder.add_conditional_edges(
-    "query_or_respond",
-    tools_condition,
-    {"tools": "tools", END: END},
-)
-builder.add_edge("tools", "generate")
-builder.add_edge("generate", END)
+    # Identify the answer by question, retrieved chunks, prompt template and model
+    fingerprints = context_fingerprints(recent_tool_messages)
+    generator = f"{LLM_MODEL}:{hashlib.sha256(RAG_SYSTEM_PROMPT.template.encode('utf-8')).hexdigest()[:16]}:{CONTEXT_MAX_TOKENS}"
+    answer_key = AnswerCache.make_key(last_human_message.content, fingerprints, generator)
+    cached_answer = get_answer_cache().get(answer_key) if ANSWER_CACHE_ENABLED else None
+    if cached_answer is not None:
+        logger.cache("Answer cache hit", get_answer_cache().stats())
+
+    # The tool call and its results do not persist to the next query
+    tool_call_messages = [messages[tool_call_index]] if tool_call_index >= 0 else []
+    removed = [RemoveMessage(id=m.id) for m in tool_call_messages + recent_tool_messages]
+    return prompt, answer_key, fingerprints, cached_answer, removed
+
+def _finish_generation(accumulated_response: str, answer_key: str, fingerprints: List[str], cached: bool, removed: List):
+    """Store a new answer in the answer cache and replace the tool exchange with it in the history."""
+    if ANSWER_CACHE_ENABLED and accumulated_response and not cached:
+        get_answer_cache().put(answer_key, accumulated_response, fingerprints)
+
+    # Create final message and add to history
+    ai_message = AIMessage(content=accumulated_response)
+    message_token_count(ai_message)
+    return {"messages": removed + [ai_message]}
+
+def generate(state: MessagesState, config: RunnableConfig):
+    """Generate the final response using the tool's content."""
+    prompt, answer_key, fingerprints, cached_answer, removed = _prepare_generation(state)
+
+    # Serve a cached answer without calling the LLM
+    if cached_answer is not None:
+        for chunk in _replay_chunks(cached_answer):
+            _emit(EVENT_TOKEN, "generate", chunk)
+        return _finish_generation(cached_answer, answer_key, fingerprints, True, removed)
+
+    streaming_llm = initialize_llm(config_secret(config, "llm_api_key"), stream=True)
+
+    # Stream response chunks
+    accumulated_response = ""
+    for chunk in streaming_llm.stream(prompt):
+        if chunk.content:
+            accumulated_response += chunk.content
+            _emit(EVENT_TOKEN, "generate", chunk.content)
+
+    return _finish_generation(accumulated_response, answer_key, fingerprints, False, removed)
+
+async def agenerate(state: MessagesState, config: RunnableConfig):
+    """Async version of generate, streaming the answer without blocking the event loop."""
+    # Context packing and the answer cache lookup run on a worker thread
+    prompt, answer_key, fingerprints, cached_answer, removed = await asyncio.to_thread(_prepare_generation, state)
+
+    # Serve a cached answer without calling the LLM
+    if cached_answer is not None:
+        for chunk in _replay_chunks(cached_answer):
+            _emit(EVENT_TOKEN, "generate", chunk)
+            # Yield to the event loop so each chunk is flushed to the client as it is emitted
+            await asyncio.sleep(0)
+        return await asyncio.to_thread(_finish_generation, cached_answer, answer_key, fingerprints, True, removed)
+
+    streaming_llm = initialize_llm(config_secret(config, "llm_api_key"), stream=True)
+
+    # Stream response chunks
+    accumulated_response = ""
+    async for chunk in streaming_llm.astream(prompt):
+        if chunk.content:
+            accumulated_response += chunk.content
+            _emit(EVENT_TOKEN, "generate", chunk.content)
 
-# Compile the graph
-graph = builder.compile()
+    return await asyncio.to_thread(_finish_generation, accumulated_response, answer_key, fingerprints, False, removed)
+
+
+def build_graph(checkpointer=None):
+    """
+    Build and compile the state graph.
+    Nodes and the retrieve tool have sync and async implementations, so the compiled graph
+    runs with invoke/stream as well as ainvoke/astream. Async runs need a checkpointer with
+    async methods, such as AsyncSqliteSaver, opened on the event loop that drives the graph.
+
+    Args:
+        checkpointer (BaseCheckpointSaver): Checkpointer that persists the conversation threads.
+
+    Returns:
+        CompiledStateGraph: The compiled graph.
+    """
+    builder = StateGraph(MessagesState)
+    builder.add_node("query_or_respond", RunnableLambda(query_or_respond, afunc=aquery_or_respond))
+    tool_node = ToolNode([retrieve])
+    builder.add_node("tools", tool_node)
+    builder.add_node("generate", RunnableLambda(generate, afunc=agenerate))
+
+    # Define entry point
+    builder.set_entry_point("query_or_respond")
+
+    # Define conditional edges
+    builder.add_conditional_edges(
+        "query_or_respond",
+        tools_condition,
+        {"tools": "tools", END: END},
+    )
+    builder.add_edge("tools", "generate")
+    builder.add_edge("generate", END)
 
-# Initialize memory for conversation persistence
-if "memory" not in st.session_state:
-    st.session_state["memory"] = MemorySaver()
+    return builder.compile(checkpointer=checkpointer)
 
-app = graph.with_config(checkpointer=st.session_state["memory"])
\ No newline at end of file
+# Compile the graph with the durable checkpointer, one thread per chat session
+graph = build_graph(get_checkpointer())
+app = graph
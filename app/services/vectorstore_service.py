@@ -1,49 +1,194 @@
+import time
+import asyncio
+import weakref
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Tuple
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import VECTORSTORE_REGISTRY_MAX_SIZE, VECTORSTORE_REGISTRY_IDLE_TTL, PINECONE_POOL_THREADS, EMBEDDING_CACHE_ENABLED, VECTORSTORE_BACKEND
+from services.embedding_cache import CachedEmbeddings, get_embedding_cache
+from services.index_manifest import index_manifest
+from services.local_vectorstore import LocalVectorStore
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_ollama import OllamaEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone, PineconeException
 
-def initialize_vectorstore(api_key: str, index_name: str, embedding_model: str) -> PineconeVectorStore:
+logger = EnhancedLogger(setup_logging())
+
+VECTORSTORE_BACKENDS = ("pinecone", "local")
+
+# Chunk IDs per Pinecone fetch request, which sends them in the query string
+PINECONE_FETCH_BATCH_SIZE = 100
+
+def api_key_fingerprint(api_key: str) -> str:
+    """Hash an API key so state can be keyed by it without keeping the raw key."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+
+def local_index_key(api_key: str, index_name: str, embedding_model: str, backend: str = VECTORSTORE_BACKEND) -> str:
     """
-    Initialize the vector store using Pinecone and Ollama embeddings.
-    
+    Build the key of the local state kept for an index: manifest entries, sparse index, fetch state,
+    local vectors and the query cache namespace.
+    The same index name under another backend or embedding model holds other vectors, so it gets its own state.
+    Pinecone index names are only unique within a project, so Pinecone keys also carry a hash of the API key,
+    and two projects with an index of the same name never share state.
+
+    Args:
+        api_key (str): Pinecone API key, not part of the key for the local backend.
+        index_name (str): Name of the Pinecone or local index.
+        embedding_model (str): Model name for Ollama embeddings.
+        backend (str): Vector store backend, "pinecone" or "local".
+
+    Returns:
+        str: The key, "local/embedding model/index name" or "pinecone/API key hash/embedding model/index name".
+    """
+    backend = (backend or VECTORSTORE_BACKEND).lower()
+    if backend == "local":
+        return f"{backend}/{embedding_model}/{index_name}"
+    return f"{backend}/{api_key_fingerprint(api_key)[:16]}/{embedding_model}/{index_name}"
+
+def legacy_index_key(index_name: str, embedding_model: str, backend: str = VECTORSTORE_BACKEND) -> str:
+    """Build the key earlier versions kept Pinecone state under, without the API key hash."""
+    return f"{(backend or VECTORSTORE_BACKEND).lower()}/{embedding_model}/{index_name}"
+
+def adopt_legacy_manifest(vector_store, api_key: str, index_name: str, embedding_model: str, backend: str = VECTORSTORE_BACKEND) -> int:
+    """
+    Copy the manifest rows a Pinecone index has under the legacy key to its tenant-aware key.
+    The legacy key mixes the rows of every project with an index of that name, so a source is only
+    adopted when its first chunk is stored in this vector store, see IndexManifest.adopt.
+    A failed adoption is logged and retried by the next initialization of the store.
+
     Args:
+        vector_store (PineconeVectorStore): The vector store of the index.
         api_key (str): Pinecone API key.
         index_name (str): Name of the Pinecone index.
         embedding_model (str): Model name for Ollama embeddings.
+        backend (str): Vector store backend.
+
+    Returns:
+        int: Number of sources adopted.
+    """
+    index_key = local_index_key(api_key, index_name, embedding_model, backend)
+    try:
+        adopted = index_manifest.adopt(
+            index_key,
+            legacy_index_key(index_name, embedding_model, backend),
+            lambda ids: {document.id for document in fetch_documents(vector_store, ids)},
+        )
+    except Exception as e:
+        logger.error(f"Legacy manifest adoption for index '{index_name}'", e)
+        return 0
+    if adopted:
+        logger.retrieval("Legacy manifest adoption", {"index": index_key, "sources": adopted})
+    return adopted
+
+class LoopBoundOllamaEmbeddings(Embeddings):
+    """
+    Ollama embeddings whose async client is created per event loop.
+    The Ollama async HTTP client keeps pooled connections tied to the loop that opened them,
+    so a pooled vector store shared by several loops gets one async client per loop.
+    """
+    def __init__(self, embedding_model: str):
+        self.embedding_model = embedding_model
+        self.embeddings = OllamaEmbeddings(model=embedding_model)
+        self._loop_embeddings = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _for_running_loop(self) -> OllamaEmbeddings:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            embeddings = self._loop_embeddings.get(loop)
+            if embeddings is None:
+                embeddings = OllamaEmbeddings(model=self.embedding_model)
+                self._loop_embeddings[loop] = embeddings
+            return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._for_running_loop().aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._for_running_loop().aembed_query(text)
+
+def initialize_embeddings(embedding_model: str):
+    """
+    Initialize the Ollama embeddings, wrapped by the persistent embedding cache when enabled.
+
+    Args:
+        embedding_model (str): Model name for Ollama embeddings.
+
+    Returns:
+        Embeddings: The embeddings used by the vector stores.
+
+    Raises:
+        RuntimeError: If initialization of the embeddings fails.
+    """
+    try:
+        embeddings = LoopBoundOllamaEmbeddings(embedding_model)
+        if EMBEDDING_CACHE_ENABLED:
+            embeddings = CachedEmbeddings(embeddings, embedding_model, get_embedding_cache())
+        return embeddings
+    except Exception as e:
+        raise RuntimeError(f"Failed to initialize embeddings with model '{embedding_model}'.") from e
+
+def initialize_vectorstore(api_key: str, index_name: str, embedding_model: str, backend: str = VECTORSTORE_BACKEND):
+    """
+    Initialize the vector store using Pinecone or the local backend and Ollama embeddings.
+    
+    Args:
+        api_key (str): Pinecone API key, not needed by the local backend.
+        index_name (str): Name of the Pinecone or local index.
+        embedding_model (str): Model name for Ollama embeddings.
+        backend (str): Vector store backend, "pinecone" or "local".
     
     Returns:
-        PineconeVectorStore: Initialized vector store.
+        PineconeVectorStore | LocalVectorStore: Initialized vector store.
     
     Raises:
         ValueError: If any of the required parameters are missing.
         RuntimeError: If initialization of Pinecone or index fails.
     """
     # Validate parameters
-    if not api_key:
+    backend = (backend or VECTORSTORE_BACKEND).lower()
+    if backend not in VECTORSTORE_BACKENDS:
+        raise ValueError(f"Unsupported vector store backend: {backend}")
+    if backend == "pinecone" and not api_key:
         raise ValueError("Pinecone API key is required.")
     if not index_name:
         raise ValueError("Pinecone index name is required.")
     if not embedding_model:
         raise ValueError("Embedding model name is required.")
 
+    # Initialize embeddings
+    embeddings = initialize_embeddings(embedding_model)
+
+    # Open the local memory-mapped index
+    if backend == "local":
+        try:
+            return LocalVectorStore(embedding=embeddings, index_name=local_index_key(api_key, index_name, embedding_model, backend))
+        except Exception as e:
+            raise RuntimeError(f"Failed to initialize local vector store: {str(e)}") from e
+
     # Initialize Pinecone client
     try:
-        pinecone = Pinecone(api_key=api_key)
+        pinecone = Pinecone(api_key=api_key, pool_threads=PINECONE_POOL_THREADS)
     except Exception as e:
         raise RuntimeError(f"Failed to initialize Pinecone client: {str(e)}") from e
 
     # Connect to existing index
     try:
-        index = pinecone.Index(index_name)
+        index = pinecone.Index(index_name, pool_threads=PINECONE_POOL_THREADS)
     except PineconeException as e:
         raise RuntimeError(f"Failed to connect to Pinecone index '{index_name}'.") from e
 
-    # Initialize embeddings
-    try:
-        embeddings = OllamaEmbeddings(model=embedding_model)
-    except Exception as e:
-        raise RuntimeError(f"Failed to initialize embeddings with model '{embedding_model}'.") from e
-
     # Initialize vector store
     try:
         vectorstore = PineconeVectorStore(embedding=embeddings, index=index)
@@ -51,3 +196,230 @@ def initialize_vectorstore(api_key: str, index_name: str, embedding_model: str)
         raise RuntimeError(f"Failed to initialize PineconeVectorStore: {str(e)}") from e
 
     return vectorstore
+
+class VectorStoreRegistry:
+    """
+    Thread-safe registry of initialized vector stores shared by the whole process.
+    Reusing the same Pinecone client keeps its HTTP connections alive between calls,
+    so retrieval and indexing skip the client setup and TLS handshake on every request.
+    """
+    def __init__(self, max_size: int = VECTORSTORE_REGISTRY_MAX_SIZE, idle_ttl: float = VECTORSTORE_REGISTRY_IDLE_TTL):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _make_key(api_key: str, index_name: str, embedding_model: str, backend: str) -> tuple:
+        """Build the registry key without keeping the raw API key in memory."""
+        return (backend, api_key_fingerprint(api_key), index_name, embedding_model)
+
+    def _evict_idle(self, now: float):
+        """Drop entries that have not been used within the idle TTL."""
+        expired = [key for key, (_, last_used) in self._entries.items() if now - last_used > self.idle_ttl]
+        for key in expired:
+            del self._entries[key]
+            self.evictions += 1
+
+    def get(self, api_key: str, index_name: str, embedding_model: str, backend: str = VECTORSTORE_BACKEND):
+        """
+        Return a pooled vector store, initializing it on the first request.
+
+        Args:
+            api_key (str): Pinecone API key.
+            index_name (str): Name of the Pinecone index.
+            embedding_model (str): Model name for Ollama embeddings.
+            backend (str): Vector store backend, "pinecone" or "local".
+
+        Returns:
+            PineconeVectorStore | LocalVectorStore: Shared vector store for the given configuration.
+        """
+        backend = (backend or VECTORSTORE_BACKEND).lower()
+        key = self._make_key(api_key, index_name, embedding_model, backend)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries[key] = (entry[0], now)
+                self._entries.move_to_end(key)
+                return entry[0]
+
+            # Concurrent callers of the same store wait for the one initialization already running
+            pending = self._pending.get(key)
+            initializing = pending is None
+            if initializing:
+                self.misses += 1
+                pending = self._pending[key] = Future()
+            else:
+                self.hits += 1
+
+        if initializing:
+            return self._initialize(key, pending, api_key, index_name, embedding_model, backend)
+        return pending.result()
+
+    def _initialize(self, key: tuple, pending: Future, api_key: str, index_name: str, embedding_model: str, backend: str):
+        """Initialize a store outside the registry lock, so slow network setup never blocks other keys."""
+        try:
+            vectorstore = initialize_vectorstore(api_key, index_name, embedding_model, backend)
+            if backend == "pinecone":
+                adopt_legacy_manifest(vectorstore, api_key, index_name, embedding_model, backend)
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            self._pending.pop(key, None)
+            self._entries[key] = (vectorstore, time.monotonic())
+
+            # Evict the least recently used entries when over capacity
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        pending.set_result(vectorstore)
+        return vectorstore
+
+    def invalidate(self, api_key: str = None, index_name: str = None, embedding_model: str = None, backend: str = VECTORSTORE_BACKEND):
+        """Remove a single entry, or every entry when no configuration is given."""
+        with self._lock:
+            if api_key is None and index_name is None and embedding_model is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._make_key(api_key, index_name, embedding_model, (backend or VECTORSTORE_BACKEND).lower()), None)
+
+    def stats(self) -> dict:
+        """Return registry counters for logging and monitoring."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+# Process-wide registry shared by the indexing and retrieval paths
+vectorstore_registry = VectorStoreRegistry()
+
+def get_vectorstore(api_key: str, index_name: str, embedding_model: str, backend: str = VECTORSTORE_BACKEND):
+    """
+    Get a pooled vector store from the process-wide registry.
+
+    Args:
+        api_key (str): Pinecone API key, not needed by the local backend.
+        index_name (str): Name of the Pinecone or local index.
+        embedding_model (str): Model name for Ollama embeddings.
+        backend (str): Vector store backend, "pinecone" or "local".
+
+    Returns:
+        PineconeVectorStore | LocalVectorStore: Shared vector store for the given configuration.
+
+    Raises:
+        ValueError: If any of the required parameters are missing.
+        RuntimeError: If initialization of Pinecone or index fails.
+    """
+    return vectorstore_registry.get(api_key, index_name, embedding_model, backend)
+
+def upsert_embeddings(vector_store, ids: list, texts: list, vectors: list, metadatas: list):
+    """
+    Upsert precomputed embeddings into the vector store.
+    Mirrors what PineconeVectorStore.add_texts writes, without embedding the texts again.
+
+    Args:
+        vector_store (PineconeVectorStore | LocalVectorStore): The target vector store.
+        ids (list): Chunk IDs.
+        texts (list): Chunk texts, stored in the metadata like add_texts does.
+        vectors (list): Embedding vectors for the texts.
+        metadatas (list): Metadata dictionaries for the chunks.
+
+    Raises:
+        RuntimeError: If the upsert request fails.
+    """
+    if isinstance(vector_store, LocalVectorStore):
+        vector_store.add_embeddings(ids, texts, vectors, metadatas)
+        return
+
+    records = [
+        {"id": chunk_id, "values": vector, "metadata": {**metadata, vector_store._text_key: text}}
+        for chunk_id, text, vector, metadata in zip(ids, texts, vectors, metadatas)
+    ]
+    try:
+        vector_store._index.upsert(vectors=records, namespace=vector_store._namespace)
+    except Exception as e:
+        raise RuntimeError(f"Failed to upsert vectors into Pinecone: {str(e)}") from e
+
+def similarity_search_with_vectors(vector_store, query_vector: List[float], k: int) -> Tuple[List[Document], dict]:
+    """
+    Run a dense search that also returns the stored vectors of the results.
+    Mirrors what PineconeVectorStore.similarity_search_by_vector returns, with the match values kept.
+
+    Args:
+        vector_store (PineconeVectorStore | LocalVectorStore): The vector store to search.
+        query_vector (List[float]): The query embedding.
+        k (int): Number of documents to return.
+
+    Returns:
+        tuple: (documents, best first, and their vectors keyed by chunk ID).
+
+    Raises:
+        RuntimeError: If the query request fails.
+    """
+    if isinstance(vector_store, LocalVectorStore):
+        documents = vector_store.similarity_search_by_vector(query_vector, k=k)
+        return documents, vector_store.get_vectors([document.id for document in documents])
+
+    try:
+        response = vector_store._index.query(
+            vector=query_vector, top_k=k, include_values=True, include_metadata=True, namespace=vector_store._namespace
+        )
+    except Exception as e:
+        raise RuntimeError(f"Failed to query Pinecone: {str(e)}") from e
+
+    documents, vectors = [], {}
+    for match in response["matches"]:
+        metadata = dict(match["metadata"] or {})
+        if vector_store._text_key not in metadata:
+            continue
+        text = metadata.pop(vector_store._text_key)
+        documents.append(Document(id=match["id"], page_content=text, metadata=metadata))
+        vectors[match["id"]] = match["values"]
+    return documents, vectors
+
+def fetch_documents(vector_store, ids: list) -> List[Document]:
+    """
+    Fetch stored chunks by ID, skipping IDs the vector store does not have.
+    Pinecone keeps the chunk text in the metadata under the text key, like add_texts writes it.
+
+    Args:
+        vector_store (PineconeVectorStore | LocalVectorStore): The vector store to read.
+        ids (list): Chunk IDs.
+
+    Returns:
+        List[Document]: The stored chunks with their IDs set.
+
+    Raises:
+        RuntimeError: If a fetch request fails.
+    """
+    if isinstance(vector_store, LocalVectorStore):
+        return vector_store.get_by_ids(ids)
+
+    documents = []
+    for start in range(0, len(ids), PINECONE_FETCH_BATCH_SIZE):
+        try:
+            response = vector_store._index.fetch(ids=ids[start:start + PINECONE_FETCH_BATCH_SIZE], namespace=vector_store._namespace)
+        except Exception as e:
+            raise RuntimeError(f"Failed to fetch vectors from Pinecone: {str(e)}") from e
+        for chunk_id, vector in response.vectors.items():
+            metadata = dict(vector.metadata or {})
+            if vector_store._text_key not in metadata:
+                continue
+            text = metadata.pop(vector_store._text_key)
+            documents.append(Document(id=chunk_id, page_content=text, metadata=metadata))
+    return documents
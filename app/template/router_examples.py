@@ -0,0 +1,61 @@
+# Labelled examples for the local query router
+# "retrieve" needs the university document database, "respond" is answered directly from the conversation
+ROUTER_EXAMPLES = [
+    # Retrieve
+    ("Qual o prazo para trancamento de matrícula?", "retrieve"),
+    ("Quando começa o período de rematrícula?", "retrieve"),
+    ("Quais são os pré-requisitos da disciplina de cálculo 2?", "retrieve"),
+    ("Qual a ementa da disciplina de estrutura de dados?", "retrieve"),
+    ("Onde fica a sala do coordenador do curso?", "retrieve"),
+    ("Qual o horário de funcionamento da biblioteca central?", "retrieve"),
+    ("Como solicito o aproveitamento de estudos?", "retrieve"),
+    ("O que diz o artigo 12 do regimento geral?", "retrieve"),
+    ("Qual o e-mail da secretaria do departamento?", "retrieve"),
+    ("Quantas horas complementares preciso para me formar?", "retrieve"),
+    ("Como funciona o estágio obrigatório?", "retrieve"),
+    ("Qual é o calendário acadêmico deste semestre?", "retrieve"),
+    ("Quem é o professor responsável pelo laboratório de redes?", "retrieve"),
+    ("Quais documentos preciso para a colação de grau?", "retrieve"),
+    ("Como funciona o auxílio permanência estudantil?", "retrieve"),
+    ("Qual a nota mínima para aprovação na resolução de avaliação?", "retrieve"),
+    ("Quais são as regras do edital de monitoria?", "retrieve"),
+    ("Qual o valor da bolsa de iniciação científica?", "retrieve"),
+    ("What is the deadline to drop a course?", "retrieve"),
+    ("Where is the computer science department office?", "retrieve"),
+    ("Which courses are required in the third semester?", "retrieve"),
+    ("What are the library opening hours?", "retrieve"),
+    ("How do I apply for a student scholarship?", "retrieve"),
+    ("What does the academic regulation say about attendance?", "retrieve"),
+    ("Who is the coordinator of the engineering program?", "retrieve"),
+    ("What is the syllabus of the operating systems course?", "retrieve"),
+    ("How many credits do I need to graduate?", "retrieve"),
+    ("When is the enrollment period for next semester?", "retrieve"),
+
+    # Respond directly
+    ("Oi, tudo bem?", "respond"),
+    ("Olá!", "respond"),
+    ("Bom dia", "respond"),
+    ("Obrigado pela ajuda", "respond"),
+    ("Valeu!", "respond"),
+    ("Quem é você?", "respond"),
+    ("O que você consegue fazer?", "respond"),
+    ("Qual foi a minha última pergunta?", "respond"),
+    ("O que eu perguntei antes?", "respond"),
+    ("Resuma nossa conversa", "respond"),
+    ("Pode repetir a resposta anterior?", "respond"),
+    ("Não entendi, pode explicar melhor?", "respond"),
+    ("Quanto é dois mais dois?", "respond"),
+    ("Me conte uma piada", "respond"),
+    ("Traduza isso para o inglês", "respond"),
+    ("Hi there", "respond"),
+    ("Hello, how are you?", "respond"),
+    ("Thanks a lot!", "respond"),
+    ("Who are you?", "respond"),
+    ("What can you do?", "respond"),
+    ("What did I ask you before?", "respond"),
+    ("Summarize our conversation so far", "respond"),
+    ("Can you explain that again?", "respond"),
+    ("Tell me a joke", "respond"),
+    ("What is the capital of France?", "respond"),
+    ("Goodbye", "respond"),
+]
@@ -0,0 +1,314 @@
+import os
+import streamlit as st
+from langchain_core.documents import Document
+from services.vectorstore_service import get_vectorstore, local_index_key
+from services.index_manifest import index_manifest
+from services.indexing_pipeline import IndexingPipeline
+from services.indexing_service import html_to_document, index_web_page, index_file, index_chunks
+from config.settings import PARALLEL_EXTRACTION_ENABLED, HTML_CONTENT_EXTRACTION_ENABLED, VECTORSTORE_BACKEND
+from utils.parallel_extractor import extract_documents_in_parallel
+from utils.file_extractor import iter_files_from_zip, FileExtractorError
+from utils.web_fetcher import get_fetch_state
+from utils.web_crawler import iter_crawled_pages
+from utils.chunker import get_chunker
+
+def run_web_indexing_mode(config: dict):
+    """
+    Run the web indexing mode to scrape a web page and index its content into Pinecone.
+    
+    Args:
+        config (dict): Configuration dictionary containing the web URL, Pinecone API key,
+                       Pinecone index name, and embedding model.
+    """
+    # Set configuration parameters
+    web_url = config.get("web_url")
+    pinecone_api_key = config.get("pinecone_api_key")
+    pinecone_index_name = config.get("pinecone_index_name")
+    embedding_model = config.get("embedding_model")
+    vectorstore_backend = config.get("vectorstore_backend", VECTORSTORE_BACKEND)
+
+    with st.chat_message("assistant", avatar=":material/cognition_2:"):
+        try:
+            with st.spinner("Processing web page and indexing...", show_time=True):
+
+                # Initialize Pinecone
+                vector_store = get_vectorstore(pinecone_api_key, pinecone_index_name, embedding_model, vectorstore_backend)
+                index_key = local_index_key(pinecone_api_key, pinecone_index_name, embedding_model, vectorstore_backend)
+                st.toast('Pinecone initialized successfully!', icon=":material/table_eye:")
+
+                # Crawl the whole site and index pages as they arrive
+                if config.get("crawl_enabled"):
+                    _index_crawled_site(vector_store, web_url, index_key, config)
+                    return
+
+                # Fetch the web page conditionally and index only the chunks that changed
+                result = index_web_page(vector_store, web_url, index_key)
+                if result is None:
+                    st.status(f"Web page unchanged since it was last indexed, skipping.", state="complete")
+                    return
+
+                # Display the number of chunks
+                st.status(f"Number of chunks created: {result['total']}",state="complete")
+                st.toast('Chunks indexed successfully!', icon=":material/cloud_upload:")
+                st.status(f"Chunks added: {result['added']}, unchanged: {result['unchanged']}, removed: {result['removed']}", state="complete")
+
+                st.status(f"Web page content indexed successfully at Pinecone!", state="complete")
+
+        except ValueError as ve:
+            st.toast(f"A value error occurred during indexing process.", icon=":material/settings_alert:")
+            with st.expander("Error details"):
+                st.write(f"A value error occurred: {ve}")
+
+        except RuntimeError as re:
+            st.toast(f"A runtime error occurred during indexing process.", icon=":material/database_off:")
+            with st.expander("Error details"):
+                st.write(f"A runtime error occurred: {re}")
+
+        except Exception as e:
+            st.toast(f"An unexpected error occurred during indexing process.", icon=":material/cloud_off:")
+            with st.expander("Error details"):
+                st.write(f"An unexpected error occurred: {e}")
+
+def _index_crawled_site(vector_store, web_url: str, index_key: str, config: dict):
+    """
+    Crawl the site of the given URL and index every page as soon as it is rendered.
+
+    Args:
+        vector_store: The vector store to index into.
+        web_url (str): The URL the crawl starts from.
+        index_key (str): Key of the index's local state, from local_index_key.
+        config (dict): Configuration dictionary containing the crawl depth and page limit.
+    """
+    pipeline = IndexingPipeline(vector_store, index_key)
+    chunker = get_chunker("html")
+    progress = st.empty()
+    pages_indexed = 0
+    pages_unchanged = 0
+    fetch_state = get_fetch_state()
+
+    try:
+        crawled_pages = iter_crawled_pages(
+            web_url,
+            index_key=index_key,
+            max_depth=int(config.get("crawl_max_depth")),
+            max_pages=int(config.get("crawl_max_pages")),
+            known_urls=set(index_manifest.sources(index_key)),
+        )
+        for url, html, error, state in crawled_pages:
+            # Report pages that failed to render and keep crawling
+            if error is not None:
+                st.toast(f"Error crawling page '{url}': {error}", icon=":material/cloud_off:")
+                continue
+
+            # Pages unchanged since they were last indexed are skipped entirely
+            if html is None:
+                pages_unchanged += 1
+                continue
+
+            doc = html_to_document(html, url) if HTML_CONTENT_EXTRACTION_ENABLED else Document(page_content=html, metadata={"source": url})
+            index_chunks(vector_store, chunker.split_documents([doc]), url, index_key, pipeline)
+            pipeline.on_source_complete(url, lambda url=url, state=state: fetch_state.save(index_key, url, state))
+            pages_indexed += 1
+            progress.status(f"Pages indexed: {pages_indexed}, unchanged: {pages_unchanged}", state="running")
+    finally:
+        # Wait for the batches still being embedded and upserted
+        failed_sources = pipeline.close()
+
+    for source, error in failed_sources.items():
+        st.toast(f"Error indexing page '{source}': {error}", icon=":material/cloud_off:")
+
+    progress.status(f"Pages indexed: {pages_indexed}, unchanged: {pages_unchanged}, chunks indexed: {pipeline.indexed_chunks}", state="complete")
+    st.status(f"Site content indexed successfully at Pinecone!", state="complete")
+
+def run_file_indexing_mode(config: dict, uploaded_files: list):
+    """
+    Run the file indexing mode to extract text from uploaded files and index the content into Pinecone.
+
+    Args:
+        config (dict): Configuration dictionary containing Pinecone credentials and embedding model.
+        file: The uploaded file from Streamlit's file_uploader.
+    """
+    # Set configuration parameters
+    pinecone_api_key = config.get("pinecone_api_key")
+    pinecone_index_name = config.get("pinecone_index_name")
+    embedding_model = config.get("embedding_model")
+    vectorstore_backend = config.get("vectorstore_backend", VECTORSTORE_BACKEND)
+    
+    with st.chat_message("assistant", avatar=":material/cognition_2:"):
+        # Share one batched pipeline across every file of the upload
+        try:
+            vector_store = get_vectorstore(pinecone_api_key, pinecone_index_name, embedding_model, vectorstore_backend)
+            pipeline = IndexingPipeline(vector_store, local_index_key(pinecone_api_key, pinecone_index_name, embedding_model, vectorstore_backend))
+        except (ValueError, RuntimeError) as e:
+            st.toast(f"An error occurred while initializing Pinecone.", icon=":material/database_off:")
+            with st.expander("Error details"):
+                st.write(f"An error occurred: {e}")
+            return
+
+        try:
+            _index_uploaded_files(uploaded_files, pinecone_api_key, pinecone_index_name, embedding_model, pipeline)
+        finally:
+            # Wait for the batches still being embedded and upserted
+            with st.spinner("Indexing remaining chunks...", show_time=True):
+                failed_sources = pipeline.close()
+
+        for source, error in failed_sources.items():
+            st.toast(f"Error indexing file '{source}': {error}", icon=":material/cloud_off:")
+            with st.expander("Error details"):
+                st.write(f"An error occurred: {error}")
+
+        st.status(f"Chunks indexed at Pinecone: {pipeline.indexed_chunks}", state="complete")
+
+def _index_uploaded_files(uploaded_files: list, pinecone_api_key, pinecone_index_name, embedding_model, pipeline: IndexingPipeline):
+    """
+    Extract and chunk every uploaded file, feeding the chunks into the indexing pipeline.
+
+    Args:
+        uploaded_files (list): The uploaded files from Streamlit's file_uploader.
+        pinecone_api_key (str): Pinecone API key.
+        pinecone_index_name (str): Pinecone index name.
+        embedding_model (str): Embedding model to use.
+        pipeline (IndexingPipeline): The pipeline shared by the whole upload.
+    """
+    # Fan the files out to the extraction process pool
+    if PARALLEL_EXTRACTION_ENABLED:
+        _index_uploaded_files_in_parallel(uploaded_files, pinecone_api_key, pinecone_index_name, embedding_model, pipeline)
+        return
+
+    for file in uploaded_files:
+        file_extension = os.path.splitext(file.name)[-1].lower()
+        
+        # If the uploaded file is a ZIP archive extract its contents
+        if file_extension == ".zip":
+            try:
+                # Process each member as soon as it is read from the archive
+                for inner_filename, inner_file in iter_files_from_zip(file):
+                    inner_ext = os.path.splitext(inner_filename)[-1].lower()
+                    try:
+                        process_file_for_indexing(inner_file, inner_filename, inner_ext, pinecone_api_key, pinecone_index_name, embedding_model, pipeline)
+                    except Exception as e:
+                        st.toast(f"Error processing file '{inner_filename}': {e}", icon=":material/folder_zip:")
+                        with st.expander("Error details"):
+                            st.write(f"An error occurred: {e}")
+
+            except FileExtractorError as e:
+                st.toast(f"Error extracting ZIP file '{file.name}': {e}", icon=":material/folder_zip:")
+                with st.expander("Error details"):
+                    st.write(f"An error occurred: {e}")
+                continue
+        
+        # Regular simple file process it directly    
+        else:
+            try:
+                process_file_for_indexing(
+                    file, file.name, file_extension,
+                    pinecone_api_key, pinecone_index_name, embedding_model, pipeline
+                )
+            except Exception as e:
+                st.toast(f"Error processing file '{file.name}': {e}", icon=":material/feedback:")
+                with st.expander("Error details"):
+                    st.write(f"An error occurred: {e}")
+
+def _iter_uploaded_items(uploaded_files: list):
+    """
+    Yield every uploaded file and ZIP member as (filename, file extension, file object) tuples.
+    ZIP members are only valid until the next item is requested.
+    ZIP extraction errors are reported to the user and the rest of the archive is skipped.
+
+    Args:
+        uploaded_files (list): The uploaded files from Streamlit's file_uploader.
+    """
+    for file in uploaded_files:
+        file_extension = os.path.splitext(file.name)[-1].lower()
+
+        # Regular simple file yield it directly
+        if file_extension != ".zip":
+            yield file.name, file_extension, file
+            continue
+
+        # Members are read lazily so extraction starts before the whole archive is read
+        try:
+            for inner_filename, inner_file in iter_files_from_zip(file):
+                yield inner_filename, os.path.splitext(inner_filename)[-1].lower(), inner_file
+        except FileExtractorError as e:
+            st.toast(f"Error extracting ZIP file '{file.name}': {e}", icon=":material/folder_zip:")
+            with st.expander("Error details"):
+                st.write(f"An error occurred: {e}")
+
+def _index_uploaded_files_in_parallel(uploaded_files: list, pinecone_api_key, pinecone_index_name, embedding_model, pipeline: IndexingPipeline):
+    """
+    Extract the uploaded files in a process pool and index each one as soon as its text is ready.
+
+    Args:
+        uploaded_files (list): The uploaded files from Streamlit's file_uploader.
+        pinecone_api_key (str): Pinecone API key.
+        pinecone_index_name (str): Pinecone index name.
+        embedding_model (str): Embedding model to use.
+        pipeline (IndexingPipeline): The pipeline shared by the whole upload.
+    """
+    with st.spinner("Extracting files in parallel...", show_time=True):
+        for filename, file_ext, extracted_documents, error in extract_documents_in_parallel(_iter_uploaded_items(uploaded_files)):
+            # Report extraction errors per file and keep going with the others
+            if error is not None:
+                st.toast(f"Error processing file '{filename}': {error}", icon=":material/feedback:")
+                with st.expander("Error details"):
+                    st.write(f"An error occurred: {error}")
+                continue
+
+            process_file_for_indexing(
+                None, filename, file_ext,
+                pinecone_api_key, pinecone_index_name, embedding_model, pipeline,
+                extracted_documents=extracted_documents
+            )
+
+def process_file_for_indexing(file_obj, filename, file_ext, pinecone_api_key, pinecone_index_name, embedding_model, pipeline: IndexingPipeline = None, extracted_documents: list = None, vectorstore_backend: str = VECTORSTORE_BACKEND):
+    """
+    Process a single file for indexing into Pinecone.
+
+    Args:
+        file_obj: The uploaded file object.
+        filename (str): The name of the file.
+        file_ext (str): The file extension.
+        pinecone_api_key (str): Pinecone API key.
+        pinecone_index_name (str): Pinecone index name.
+        embedding_model (str): Embedding model to use.
+        pipeline (IndexingPipeline): Optional batched pipeline the chunks are queued into.
+        extracted_documents (list): Documents already extracted from the file, skips extraction when given.
+        vectorstore_backend (str): Vector store backend used when no pipeline is given.
+    """
+    try:
+        with st.spinner(f"Processing file {filename}..."):
+            
+            # Reuse the pipeline's vector store or initialize one and index the chunks
+            if pipeline is not None:
+                vector_store, index_key = pipeline.vector_store, pipeline.index_key
+            else:
+                vector_store = get_vectorstore(pinecone_api_key, pinecone_index_name, embedding_model, vectorstore_backend)
+                index_key = local_index_key(pinecone_api_key, pinecone_index_name, embedding_model, vectorstore_backend)
+            result = index_file(file_obj, filename, file_ext, vector_store, index_key, pipeline, extracted_documents)
+            st.toast('File content extracted and chunked successfully!', icon=":material/package:")
+
+            # Display number of chunks created
+            st.status(f"Number of chunks created: {result['total']}", state="complete")
+            st.status(f"Chunks added: {result['added']}, unchanged: {result['unchanged']}, removed: {result['removed']}", state="complete")
+
+            if pipeline is None:
+                st.toast('Chunks indexed successfully!', icon=":material/cloud_upload:")
+                st.status(f"File {filename} indexed successfully at Pinecone!", state="complete")
+            else:
+                st.toast('Chunks queued for indexing!', icon=":material/cloud_upload:")
+
+    except ValueError as ve:
+        st.toast(f"A value error occurred during indexing process.", icon=":material/settings_alert:")
+        with st.expander("Error details"):
+            st.write(f"A value error occurred: {ve}")
+
+    except RuntimeError as re:
+        st.toast(f"A runtime error occurred during indexing process.", icon=":material/database_off:")
+        with st.expander("Error details"):
+            st.write(f"A runtime error occurred: {re}")
+
+    except Exception as e:
+        st.toast(f"An unexpected error occurred during indexing process.", icon=":material/cloud_off:")
+        with st.expander("Error details"):
+            st.write(f"An unexpected error occurred: {e}")
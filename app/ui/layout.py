@@ -1,6 +1,8 @@
 import streamlit as st
 from langchain_core.messages import HumanMessage
-from langchain.schema import ChatMessage
+from services.chat_service import get_session_thread_id
+from services.checkpointer import load_thread_messages
+from services.state_machine import conversation_messages
 
 def set_page_config():
     # Set the page configuration for the Streamlit app
@@ -23,13 +25,12 @@ def display_banner():
     st.image("assets/banner.png")
 
 def initialize_chat_history():
-    """Initialize chat history in session state."""
+    """Initialize chat history in session state, resuming the session thread when it has checkpoints."""
     if "messages" not in st.session_state:
-        st.session_state["messages"] = [
-            ChatMessage(role="assistant", content="How can I assist you with campus resources today?")
-        ]
+        st.session_state["messages"] = conversation_messages(load_thread_messages(get_session_thread_id()))
 
 def display_chat_history():
+    st.chat_message(name="assistant", avatar=":material/smart_toy:").write("How can I assist you with campus resources today?")
     for msg in st.session_state["messages"]:
         if isinstance(msg, HumanMessage):
             st.chat_message(name="user", avatar=":material/face:").write(msg.content)
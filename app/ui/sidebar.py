@@ -1,4 +1,5 @@
 import streamlit as st
+from config.settings import CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, VECTORSTORE_BACKEND
 
 def configure_sidebar() -> dict:
     """"Configure the sidebar for the Streamlit app."""
@@ -9,7 +10,14 @@ def configure_sidebar() -> dict:
 
         # Variables for LLM API key and Pinecone configuration
         llm_api_key = keys_expander.text_input("Maritalk API Key", type="password")
-        pinecone_api_key = keys_expander.text_input("Pinecone API Key", type="password")
+        backend_options = ["pinecone", "local"]
+        vectorstore_backend = keys_expander.selectbox(
+            "Vector Store Backend",
+            backend_options,
+            index=backend_options.index(VECTORSTORE_BACKEND) if VECTORSTORE_BACKEND in backend_options else 0,
+            format_func=lambda backend: {"pinecone": "Pinecone", "local": "Local"}[backend],
+        )
+        pinecone_api_key = keys_expander.text_input("Pinecone API Key", type="password", disabled=vectorstore_backend == "local")
         pinecone_index_name = keys_expander.text_input("Pinecone Index Name")
         embedding_model = keys_expander.text_input("Ollama Embedding Model", value="nomic-embed-text")
 
@@ -26,26 +34,38 @@ def configure_sidebar() -> dict:
         if 'embedding_model' not in st.session_state:
             st.session_state['embedding_model'] = embedding_model
 
+        if 'vectorstore_backend' not in st.session_state:
+            st.session_state['vectorstore_backend'] = vectorstore_backend
+
         # Update session state variables   
         st.session_state['llm_api_key'] = llm_api_key
         st.session_state['pinecone_api_key'] = pinecone_api_key  
         st.session_state['pinecone_index_name'] = pinecone_index_name
         st.session_state['embedding_model'] = embedding_model
+        st.session_state['vectorstore_backend'] = vectorstore_backend
                 
         # Settings for indexing mode
         index_expander = st.expander("Indexing", expanded=True)
 
         # Web indexing section
         web_url = index_expander.text_input("Web Link", placeholder="https://example.com")
+        crawl_enabled = index_expander.toggle("Crawl Site Links", value=False)
+        crawl_max_depth, crawl_max_pages = CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES
+        if crawl_enabled:
+            crawl_max_depth = index_expander.number_input("Crawl Depth", min_value=0, max_value=10, value=CRAWL_MAX_DEPTH)
+            crawl_max_pages = index_expander.number_input("Crawl Page Limit", min_value=1, max_value=5000, value=CRAWL_MAX_PAGES)
         web_indexing_enabled = index_expander.button("Activate Web Indexing", icon=":material/database_upload:")
 
         # File indexing section
         uploaded_files = index_expander.file_uploader("File Upload", type=["pdf", "txt", "docx", "zip"], accept_multiple_files=True)
         file_indexing_enabled = index_expander.button("Activate File Indexing", icon=":material/database_upload:")
 
+    # The local backend does not need Pinecone credentials
+    pinecone_credentials_ready = vectorstore_backend == "local" or bool(pinecone_api_key)
+
     # Validate required fields for web indexing
     if web_indexing_enabled:
-        if not web_url or not pinecone_api_key or not pinecone_index_name or not embedding_model:
+        if not web_url or not pinecone_credentials_ready or not pinecone_index_name or not embedding_model:
             st.toast(
                 "Web Indexing failed — you must provide a valid URL and fill in all the required fields.",
                 icon=":material/assignment_late:"
@@ -56,7 +76,7 @@ def configure_sidebar() -> dict:
 
     # Validate required fields for file indexing
     if file_indexing_enabled:
-        if not uploaded_files or not pinecone_api_key or not pinecone_index_name or not embedding_model:
+        if not uploaded_files or not pinecone_credentials_ready or not pinecone_index_name or not embedding_model:
             st.toast(
                 "File indexing failed — please upload a file and fill in all the required fields.",
                 icon=":material/assignment_late:"
@@ -68,11 +88,15 @@ def configure_sidebar() -> dict:
     indexing_mode_config = {
         "web_indexing_enabled": web_indexing_enabled,
         "web_url": web_url,
+        "crawl_enabled": crawl_enabled,
+        "crawl_max_depth": crawl_max_depth,
+        "crawl_max_pages": crawl_max_pages,
         "file_indexing_enabled": file_indexing_enabled,   
         "uploaded_files": uploaded_files,                   
         "pinecone_api_key": pinecone_api_key,
         "pinecone_index_name": pinecone_index_name,
         "embedding_model": embedding_model,
+        "vectorstore_backend": vectorstore_backend,
     }
 
     return indexing_mode_config
\ No newline at end of file
@@ -0,0 +1,281 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Callable, Iterable, Iterator, List, Optional, Pattern, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from config.settings import CHUNKING_STRATEGY, CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_MIN_FILL, CHUNK_FAST_PATH_CHARS, CHUNK_PROFILES
+from utils.token_counter import count_text_tokens
+
+# Boundaries a chunk can end at, from the strongest to the weakest after sections: blank lines between
+# paragraphs, sentence ends and line breaks. The greedy prefix makes a single match find the last one in a window
+LAST_PARAGRAPH_PATTERN = re.compile(r"(?s:.*)\n[ \t]*\n")
+LAST_SENTENCE_PATTERN = re.compile(r"(?s:.*)[.!?;:]\s")
+SEPARATOR_PATTERN = re.compile(r"[.!?;:]\s+|\n\s*")
+WHITESPACE_PATTERN = re.compile(r"\s*")
+INDENT_PATTERN = re.compile(r"[ \t]*")
+
+# Abbreviations, list markers and numbers ending in a period that do not end a sentence
+ABBREVIATION_PATTERN = re.compile(r"(?:\b(?:art|arts|inc|al|par|cap|fls|pag|pg|prof|profa|dr|dra|sr|sra|n|no|nº|etc|ex|obs)|\b\w|\d+)\.$", re.IGNORECASE)
+
+# Markdown headings written by the HTML extractor
+MARKDOWN_HEADING_PATTERN = re.compile(r"^#{1,6} +(\S.*)$")
+
+# Headings of regulations and academic documents extracted as plain text
+KEYWORD_HEADING_PATTERN = re.compile(r"^(cap[ií]tulo|t[ií]tulo|se[cç][aã]o|anexo|chapter|section|appendix)\b", re.IGNORECASE)
+NUMBERED_HEADING_PATTERN = re.compile(r"^\d+(\.\d+)*\.? +[A-ZÀ-Ý]")
+
+# Articles start a new section of a regulation without being a heading themselves
+ARTICLE_LINE_PATTERN = re.compile(r"\n[ \t]*art(igo)?\.? ?\d", re.IGNORECASE)
+
+# Longest line still taken for a plain text heading
+MAX_HEADING_CHARS = 100
+
+# Lines each heading detector may accept, found by one regex pass so the detector only sees a few lines:
+# markdown heading lines, and short lines that start like a keyword or numbered heading or hold no lowercase letter.
+# Line patterns start at the line break, a literal prefix the regex engine scans for quickly
+MARKDOWN_HEADING_LINE_PATTERN = re.compile(r"\n[ \t]*#{1,6} +\S")
+TEXT_HEADING_LINE_PATTERN = re.compile(
+    r"\n[ \t]*(?=(?i:cap|t[ií]t|se[cç]|anexo|chapter|section|appendix)|\d|[^a-zà-ÿ\n]+(?:\n|\Z))"
+    rf"(?=\S[^\n]{{0,{MAX_HEADING_CHARS - 1}}}(?:\n|\Z))"
+)
+SHORT_LINE_PATTERN = re.compile(rf"\n[ \t]*\S[^\n]{{0,{MAX_HEADING_CHARS - 1}}}(?:\n|\Z)")
+
+# Characters sampled to calibrate the characters-per-token ratio of a text
+TOKEN_RATIO_SAMPLE_CHARS = 20_000
+
+def markdown_heading(line: str) -> Optional[str]:
+    """Return the title of a markdown heading line, or None."""
+    match = MARKDOWN_HEADING_PATTERN.match(line)
+    return match.group(1).strip() if match else None
+
+def text_heading(line: str) -> Optional[str]:
+    """Return a plain text line when it looks like a chapter, section or numbered heading, or None."""
+    if len(line) > MAX_HEADING_CHARS or line.endswith((".", ";", ",")):
+        return None
+    if KEYWORD_HEADING_PATTERN.match(line) or NUMBERED_HEADING_PATTERN.match(line):
+        return line
+    if line.isupper() and sum(char.isalpha() for char in line) >= 3:
+        return line
+    return None
+
+# Candidate lines of the built-in detectors, other detectors see every short line
+HEADING_LINE_PATTERNS = {markdown_heading: MARKDOWN_HEADING_LINE_PATTERN, text_heading: TEXT_HEADING_LINE_PATTERN}
+
+class StructuredChunker:
+    """
+    Token-sized, heading-aware text chunker.
+    Section starts (headings and articles) are found by one regex pass over candidate lines. Each chunk
+    then only searches the window between the minimum fill and the chunk size for its cut, taking the
+    strongest boundary there: a section, a paragraph, a sentence, a line, then a space, latest on ties.
+    Sizes are estimated from a characters-per-token ratio calibrated on the text, so the work is per
+    chunk rather than per sentence. Up to the fast path size, every chunk is also counted with the
+    tokenizer and shrunk when over the size, and the ratio follows the counts. Overlap restarts the
+    next chunk at a sentence or line within the overlap budget and never crosses a section.
+    """
+    def __init__(
+        self,
+        chunk_size: int = CHUNK_SIZE_TOKENS,
+        chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
+        heading_detector: Callable[[str], Optional[str]] = text_heading,
+        min_fill: float = CHUNK_MIN_FILL,
+        fast_path_chars: int = CHUNK_FAST_PATH_CHARS,
+        heading_lines: Optional[Pattern] = None,
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) must be smaller than the chunk size ({chunk_size}).")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.heading_detector = heading_detector
+        self.min_fill = min_fill
+        self.fast_path_chars = fast_path_chars
+        self.heading_lines = heading_lines or HEADING_LINE_PATTERNS.get(heading_detector, SHORT_LINE_PATTERN)
+
+    @staticmethod
+    def _line_starts(pattern: Pattern, text: str) -> Iterator[int]:
+        """Yield the offset of the first non-blank character of every line the pattern matches at its start."""
+        # The first line has no line break before it, match it as if it had one
+        first = pattern.match("\n" + text[:text.find("\n") if "\n" in text else len(text)])
+        if first is not None:
+            yield INDENT_PATTERN.match(text).end()
+        for match in pattern.finditer(text):
+            yield WHITESPACE_PATTERN.match(text, match.start()).end()
+
+    def _sections(self, text: str) -> Tuple[List[int], List[int], List[str]]:
+        """
+        Find where sections start and which heading is in effect from where.
+        Headings spread over consecutive lines, like "CAPÍTULO I" and its title, are one heading.
+
+        Returns:
+            tuple: (sorted section start offsets, sorted heading offsets, heading titles).
+        """
+        sections = list(self._line_starts(ARTICLE_LINE_PATTERN, text))
+        heading_offsets, headings = [], []
+        previous_end = -1
+        for start in self._line_starts(self.heading_lines, text):
+            end = text.find("\n", start)
+            end = len(text) if end < 0 else end
+            detected = self.heading_detector(text[start:end].strip())
+            if detected is None:
+                continue
+            if previous_end >= 0 and text[previous_end:start].isspace():
+                headings[-1] = f"{headings[-1]} {detected}"
+            else:
+                heading_offsets.append(start)
+                headings.append(detected)
+                sections.append(start)
+            previous_end = end
+        sections.sort()
+        return sections, heading_offsets, headings
+
+    @staticmethod
+    def _last_sentence_end(text: str, low: int, high: int) -> Optional[int]:
+        """Return the end of the last sentence ending in [low, high], skipping abbreviations, or None."""
+        limit = high + 1
+        while True:
+            match = LAST_SENTENCE_PATTERN.match(text, max(low - 1, 0), limit)
+            if match is None:
+                return None
+            end = match.end() - 1
+            # "Art. 5" and "1. Introdução" keep going, only a line break after them still splits
+            if text[end - 1] != "." or "\n" in text[end:WHITESPACE_PATTERN.match(text, end).end()] or not ABBREVIATION_PATTERN.search(text, max(0, end - 8), end):
+                return end
+            limit = end
+
+    def _cut(self, text: str, position: int, low: int, high: int, sections: List[int]) -> Tuple[int, int, bool]:
+        """
+        Choose where the chunk starting at position ends, between the low and high offsets.
+
+        Returns:
+            tuple: (end offset, start offset of the text after it, whether a section starts there).
+        """
+        # Start a new chunk at a section once the current one is reasonably full
+        index = bisect_left(sections, low)
+        if index < len(sections) and sections[index] <= min(high, len(text)):
+            section = sections[index]
+            return position + len(text[position:section].rstrip()), section, True
+
+        if high >= len(text):
+            return position + len(text[position:].rstrip()), len(text), False
+
+        paragraph = LAST_PARAGRAPH_PATTERN.match(text, low, high + 1)
+        if paragraph is not None:
+            end = paragraph.end() - 1
+            while text[end - 1] != "\n":
+                end -= 1
+            return end - 1, WHITESPACE_PATTERN.match(text, end).end(), False
+
+        sentence = self._last_sentence_end(text, low, high)
+        if sentence is not None:
+            return sentence, WHITESPACE_PATTERN.match(text, sentence).end(), False
+
+        line_break = text.rfind("\n", low, high)
+        if line_break >= 0:
+            return line_break, WHITESPACE_PATTERN.match(text, line_break).end(), False
+
+        # Cut runs of words at the last space, and text without spaces at the size
+        space = text.rfind(" ", low, high)
+        if space >= 0:
+            return space, WHITESPACE_PATTERN.match(text, space).end(), False
+        return high, WHITESPACE_PATTERN.match(text, high).end(), False
+
+    def _overlap_start(self, text: str, position: int, end: int, next_start: int, sections: List[int], chars_per_token: float) -> int:
+        """Return where the next chunk starts: the first sentence or line within the overlap budget before the end."""
+        low = max(position + 1, end - int(self.chunk_overlap * chars_per_token))
+        # Overlap never reaches back into the previous section
+        index = bisect_right(sections, end) - 1
+        if index >= 0 and sections[index] > position:
+            low = max(low, sections[index])
+
+        for match in SEPARATOR_PATTERN.finditer(text, max(low - 1, position), end):
+            if match.end() < low or match.end() >= end:
+                continue
+            if text[match.start()] == "." and "\n" not in match.group() and ABBREVIATION_PATTERN.search(text, max(0, match.start() - 7), match.start() + 1):
+                continue
+            return match.end()
+        return next_start
+
+    def split_spans(self, text: str) -> Iterator[Tuple[int, int, Optional[str]]]:
+        """
+        Chunk a text into spans.
+
+        Args:
+            text (str): The text to chunk.
+
+        Yields:
+            tuple: (start offset, end offset, heading in effect at the start of the chunk).
+        """
+        # Leading blank space is skipped, so whitespace-only text has no chunks at all
+        position = WHITESPACE_PATTERN.match(text).end()
+        if position >= len(text):
+            return
+
+        # The exact path only needs a first guess, its ratio then follows the counted chunks
+        exact = len(text) <= self.fast_path_chars
+        sample = text[position:position + (self.chunk_size * 4 if exact else TOKEN_RATIO_SAMPLE_CHARS)]
+        chars_per_token = len(sample) / max(count_text_tokens(sample), 1)
+        sections, heading_offsets, headings = self._sections(text)
+        previous_end = position
+
+        while position < len(text):
+            high = position + max(1, int(self.chunk_size * chars_per_token))
+            low = min(max(position + int(self.min_fill * self.chunk_size * chars_per_token), previous_end + 1), high)
+            end, next_start, at_section = self._cut(text, position, low, high, sections)
+
+            if exact:
+                # Shrink the window until the chunk fits, and follow the measured ratio for the next chunks
+                tokens = count_text_tokens(text[position:end])
+                while tokens > self.chunk_size and end - position > 1:
+                    high = position + max(1, (end - position) * self.chunk_size // tokens - 1)
+                    low = min(low, high)
+                    end, next_start, at_section = self._cut(text, position, low, high, sections)
+                    tokens = count_text_tokens(text[position:end])
+                chars_per_token = (end - position) / max(tokens, 1)
+
+            heading_index = bisect_right(heading_offsets, position) - 1
+            yield position, end, headings[heading_index] if heading_index >= 0 else None
+
+            if next_start >= len(text):
+                return
+            previous_end = end
+            position = next_start if at_section else self._overlap_start(text, position, end, next_start, sections, chars_per_token)
+
+    def split_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Lazily chunk documents, keeping their metadata.
+        Each chunk records its start offset in the document and the heading it falls under.
+
+        Args:
+            documents (Iterable[Document]): The documents to chunk.
+
+        Yields:
+            Document: The chunks, in document order.
+        """
+        for document in documents:
+            text = document.page_content
+            for start, end, heading in self.split_spans(text):
+                # Blank chunks carry nothing to retrieve, never embed them
+                content = text[start:end]
+                if content.isspace():
+                    continue
+                metadata = {**document.metadata, "start_index": start}
+                if heading:
+                    metadata["heading"] = heading
+                yield Document(page_content=content, metadata=metadata)
+
+def get_chunker(source_type: str):
+    """
+    Build the chunker configured for a source type.
+
+    Args:
+        source_type (str): A file extension (".pdf", ".docx", ".txt") or "html" for web pages.
+
+    Returns:
+        StructuredChunker | RecursiveCharacterTextSplitter: An object with split_documents.
+    """
+    if CHUNKING_STRATEGY == "recursive":
+        # Start offsets let the context packer merge adjacent chunks, like the structured chunker's
+        return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
+
+    chunk_size, chunk_overlap = CHUNK_PROFILES.get(source_type, (CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS))
+    heading_detector = markdown_heading if source_type == "html" else text_heading
+    return StructuredChunker(chunk_size, chunk_overlap, heading_detector)
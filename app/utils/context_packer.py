@@ -0,0 +1,151 @@
+from typing import List, Optional, Tuple
+from langchain_core.documents import Document
+from config.settings import CONTEXT_MAX_TOKENS, CONTEXT_MIN_OVERLAP_CHARS
+from utils.token_counter import count_text_tokens
+
+# Bookkeeping metadata that means nothing to the model and only costs prompt tokens
+HIDDEN_METADATA_KEYS = {"chunk_id", "start_index"}
+
+# Largest whitespace gap between two chunks that are still contiguous by their start offsets
+MAX_CONTIGUOUS_GAP = 2
+
+def merge_texts(first: str, second: str, min_overlap: int = CONTEXT_MIN_OVERLAP_CHARS) -> Optional[str]:
+    """
+    Merge two chunk texts when one follows the other with an overlap or one contains the other.
+
+    Args:
+        first (str): The text expected to come first.
+        second (str): The text expected to come second.
+        min_overlap (int): Shortest suffix/prefix overlap accepted as a real overlap.
+
+    Returns:
+        str: The merged text, without the repeated part.
+        None: If the texts do not overlap.
+    """
+    if second in first:
+        return first
+    if first in second:
+        return second
+    if len(first) < min_overlap or len(second) < min_overlap:
+        return None
+
+    # Look for the longest suffix of the first text that starts the second one
+    probe = second[:min_overlap]
+    start = first.find(probe, max(0, len(first) - len(second)))
+    while start != -1:
+        if second.startswith(first[start:]):
+            return first + second[len(first) - start:]
+        start = first.find(probe, start + 1)
+    return None
+
+def _merge_blocks(first: dict, second: dict) -> Optional[str]:
+    """Merge two blocks of the same source, by their start offsets when known and by their text otherwise."""
+    # Start offsets are relative to the extracted page or section the chunk came from
+    first_start, second_start = first["start"], second["start"]
+    same_part = all(first["metadata"].get(key) == second["metadata"].get(key) for key in ("page", "section"))
+    if first_start is not None and second_start is not None and same_part:
+        first_end = first_start + len(first["text"])
+        if second_start < first_start or second_start - first_end > MAX_CONTIGUOUS_GAP:
+            return None
+        if second_start >= first_end:
+            return first["text"] + "\n" + second["text"]
+        return first["text"] + second["text"][first_end - second_start:]
+
+    # Try both orders and keep the longer overlap, repeated boilerplate can fake a short one
+    merged = [text for text in (merge_texts(first["text"], second["text"]), merge_texts(second["text"], first["text"])) if text is not None]
+    return min(merged, key=len) if merged else None
+
+def merge_chunks(documents: List[Document]) -> List[dict]:
+    """
+    Merge overlapping, contiguous and duplicated chunks of the same source into blocks.
+    Each block keeps the metadata and rank of its most relevant chunk.
+
+    Args:
+        documents (List[Document]): Retrieved chunks, most relevant first.
+
+    Returns:
+        List[dict]: Blocks with text, metadata, rank, start offset and number of merged chunks.
+    """
+    blocks = [
+        {"text": doc.page_content, "metadata": doc.metadata, "rank": rank, "start": doc.metadata.get("start_index"), "chunks": 1}
+        for rank, doc in enumerate(documents)
+    ]
+
+    merged = True
+    while merged:
+        merged = False
+        for first in blocks:
+            for second in blocks:
+                if first is second or first["metadata"].get("source") != second["metadata"].get("source"):
+                    continue
+                text = _merge_blocks(first, second)
+                if text is None:
+                    continue
+
+                if second["rank"] < first["rank"]:
+                    first["metadata"], first["rank"] = second["metadata"], second["rank"]
+                first["text"] = text
+                first["chunks"] += second["chunks"]
+                blocks.remove(second)
+                merged = True
+                break
+            if merged:
+                break
+
+    return sorted(blocks, key=lambda block: block["rank"])
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text at a word boundary so it fits in a token budget."""
+    if count_text_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_text_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text.rfind(" ", 0, low)
+    return text[:cut if cut > 0 else low]
+
+def format_block(block: dict) -> str:
+    """Render a block the way the retrieve tool serializes a document."""
+    metadata = {key: value for key, value in block["metadata"].items() if key not in HIDDEN_METADATA_KEYS}
+    return f"Source: {metadata}\nContent: {block['text']}"
+
+def pack_context(documents: List[Document], max_tokens: int = CONTEXT_MAX_TOKENS) -> Tuple[str, dict]:
+    """
+    Pack retrieved chunks into a context that fits a token budget.
+    Chunks of the same source are merged without their overlap, blocks are added by relevance,
+    and blocks that do not fit are skipped in favour of smaller, less relevant ones. The most
+    relevant block is truncated rather than dropped when it alone exceeds the budget.
+
+    Args:
+        documents (List[Document]): Retrieved chunks, most relevant first.
+        max_tokens (int): Token budget of the packed context.
+
+    Returns:
+        tuple: (context text, packing statistics).
+    """
+    blocks = merge_chunks(documents)
+    sections = []
+    used_tokens = 0
+    for block in blocks:
+        section = format_block(block)
+        tokens = count_text_tokens(section)
+        if used_tokens + tokens <= max_tokens:
+            sections.append(section)
+            used_tokens += tokens
+        elif not sections:
+            section = truncate_to_tokens(section, max_tokens)
+            sections.append(section)
+            used_tokens += count_text_tokens(section)
+
+    stats = {
+        "chunks": len(documents),
+        "blocks": len(blocks),
+        "packed_blocks": len(sections),
+        "tokens": used_tokens,
+        "budget": max_tokens,
+    }
+    return "\n\n".join(sections), stats
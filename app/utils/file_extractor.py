@@ -1,51 +1,113 @@
+import shutil
 import zipfile
+import tempfile
 from io import BytesIO
-from typing import List, Tuple
+from typing import IO, Iterator, List, Tuple
+from config.settings import ZIP_MAX_TOTAL_BYTES, ZIP_MAX_MEMBER_BYTES, ZIP_MAX_COMPRESSION_RATIO, ZIP_SPOOL_THRESHOLD
+
+SUPPORTED_EXTS = [".pdf", ".txt", ".docx"]
+READ_CHUNK_SIZE = 1024 * 1024
 
 class FileExtractorError(Exception):
     """Custom exception for file extraction errors."""
     pass
 
-def extract_files_from_zip(zip_files: BytesIO) -> List[Tuple[str, BytesIO]]:
+def iter_files_from_zip(
+    zip_files: IO[bytes],
+    max_total_bytes: int = ZIP_MAX_TOTAL_BYTES,
+    max_member_bytes: int = ZIP_MAX_MEMBER_BYTES,
+    max_compression_ratio: float = ZIP_MAX_COMPRESSION_RATIO,
+    spool_threshold: int = ZIP_SPOOL_THRESHOLD,
+) -> Iterator[Tuple[str, IO[bytes]]]:
     """
-    Extract supported files from a .zip archive and return them as (filename, file_content) tuples.
+    Lazily extract supported files from a .zip archive, one member at a time.
+    Members are copied into spooled temporary files that stay in memory while small and
+    spill to disk past the threshold. Each yielded file is closed when the next one is requested.
 
     Args:
-        zip_files (BytesIO): The uploaded .zip file.
-    
-    Returns:
-        List[Tuple[str, BytesIO]]: A list of (filename, BytesIO) tuples for supported files.
+        zip_files (IO[bytes]): The uploaded .zip file.
+        max_total_bytes (int): Maximum uncompressed size of all supported members together.
+        max_member_bytes (int): Maximum uncompressed size of a single member.
+        max_compression_ratio (float): Maximum uncompressed to compressed size ratio of a member.
+        spool_threshold (int): Size above which a member is spooled to disk instead of memory.
+
+    Yields:
+        Tuple[str, IO[bytes]]: (filename, file object) positioned at the start of the member.
 
     Raises:
-        FileExtractorError: If the provided file is not a valid .zip archive or if no supported files are found.
+        FileExtractorError: If the archive is invalid, exceeds the size limits or has no supported files.
     """
-    supported_exts = [".pdf", ".txt", ".docx"]
-    extracted_files = []
+    total_bytes = 0
+    found_files = False
 
     try:
-        # Attempt to open the zip file
-        with zipfile.ZipFile(zip_files) as archive:
-            for file_info in archive.infolist():
-                filename = file_info.filename
-                file_ext = f".{filename.split('.')[-1].lower()}"
-
-                # Check if the file has a supported extension and is not a directory
-                if file_ext in supported_exts and not file_info.is_dir():
-                    try:
-                        with archive.open(file_info) as file:
-                            file_data = file.read()
-                            extracted_files.append((filename, BytesIO(file_data)))
-                    
-                    except Exception as e:
-                        raise FileExtractorError(f"Error reading file '{filename}' from the archive: {e}")
-    
+        archive = zipfile.ZipFile(zip_files)
     except zipfile.BadZipFile:
         raise FileExtractorError("The provided file is not a valid .zip archive.")
-    
     except Exception as e:
         raise FileExtractorError(f"An unexpected error occurred while extracting files: {e}")
 
-    if not extracted_files:
+    with archive:
+        for file_info in archive.infolist():
+            filename = file_info.filename
+            file_ext = f".{filename.split('.')[-1].lower()}"
+
+            # Check if the file has a supported extension and is not a directory
+            if file_ext not in SUPPORTED_EXTS or file_info.is_dir():
+                continue
+
+            # Reject members whose declared sizes already exceed the limits
+            if file_info.file_size > max_member_bytes:
+                raise FileExtractorError(f"File '{filename}' exceeds the maximum allowed size.")
+            if file_info.compress_size and file_info.file_size / file_info.compress_size > max_compression_ratio:
+                raise FileExtractorError(f"File '{filename}' exceeds the maximum compression ratio.")
+
+            with tempfile.SpooledTemporaryFile(max_size=spool_threshold) as spooled:
+                # Copy in chunks and enforce the limits on the bytes actually read, headers can lie
+                member_bytes = 0
+                member_limit = min(max_member_bytes, max(file_info.compress_size, 1) * max_compression_ratio)
+                try:
+                    with archive.open(file_info) as file:
+                        while chunk := file.read(READ_CHUNK_SIZE):
+                            member_bytes += len(chunk)
+                            total_bytes += len(chunk)
+                            if member_bytes > member_limit:
+                                raise FileExtractorError(f"File '{filename}' exceeds the allowed uncompressed size or compression ratio.")
+                            if total_bytes > max_total_bytes:
+                                raise FileExtractorError("The .zip archive exceeds the maximum allowed uncompressed size.")
+                            spooled.write(chunk)
+
+                except FileExtractorError:
+                    raise
+
+                except Exception as e:
+                    raise FileExtractorError(f"Error reading file '{filename}' from the archive: {e}")
+
+                spooled.seek(0)
+                found_files = True
+                yield filename, spooled
+
+    if not found_files:
         raise FileExtractorError("No supported files were found in the .zip archive.")
 
-    return extracted_files
\ No newline at end of file
+def extract_files_from_zip(zip_files: BytesIO) -> List[Tuple[str, BytesIO]]:
+    """
+    Extract supported files from a .zip archive and return them as (filename, file_content) tuples.
+    Prefer iter_files_from_zip for large archives, this loads every member into memory.
+
+    Args:
+        zip_files (BytesIO): The uploaded .zip file.
+    
+    Returns:
+        List[Tuple[str, BytesIO]]: A list of (filename, BytesIO) tuples for supported files.
+
+    Raises:
+        FileExtractorError: If the provided file is not a valid .zip archive or if no supported files are found.
+    """
+    extracted_files = []
+    for filename, file in iter_files_from_zip(zip_files):
+        buffer = BytesIO()
+        shutil.copyfileobj(file, buffer)
+        buffer.seek(0)
+        extracted_files.append((filename, buffer))
+    return extracted_files
@@ -0,0 +1,261 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+from typing import List, Tuple
+from config.settings import HTML_BOILERPLATE_PATH
+
+# Elements whose content never carries readable page text
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe", "object", "head"}
+
+# Elements that hold navigation and other page chrome
+BOILERPLATE_TAGS = {"nav", "footer", "header", "aside"}
+BOILERPLATE_HINTS = re.compile(r"(^|[-_\s])(nav|navbar|menu|footer|breadcrumbs?|sidebar|cookie|banner|skip-link|social|share)([-_\s]|$)", re.IGNORECASE)
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search"}
+
+# Page-level containers whose classes describe the layout ("page no-sidebar"), never judged by class or id
+CONTAINER_TAGS = {"html", "body", "main", "article"}
+
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr", "br", "hr",
+    "blockquote", "pre", "dl", "dt", "dd", "figcaption", "h1", "h2", "h3", "h4", "h5", "h6",
+}
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+MAIN_TAGS = {"main", "article"}
+
+# Bound parameters per query, below the limit of older SQLite builds
+SQLITE_MAX_PARAMS = 500
+
+class _ContentParser(HTMLParser):
+    """Single-pass HTML parser collecting readable lines, headings as markdown and the page title."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.lines = []
+        self.main_lines = []
+        self._current = []
+        self._skip_tag = None
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._in_title = False
+        self._heading_level = 0
+
+    def _is_boilerplate(self, tag: str, attrs: list) -> bool:
+        if tag in SKIPPED_TAGS or tag in BOILERPLATE_TAGS:
+            return True
+        attributes = dict(attrs)
+        if (attributes.get("role") or "").lower() in BOILERPLATE_ROLES:
+            return True
+        if attributes.get("aria-hidden") == "true" or "hidden" in attributes:
+            return True
+        if tag in CONTAINER_TAGS:
+            return False
+        hints = f"{attributes.get('id') or ''} {attributes.get('class') or ''}"
+        return bool(BOILERPLATE_HINTS.search(hints))
+
+    def _flush_line(self):
+        text = " ".join("".join(self._current).split())
+        self._current = []
+        if not text:
+            return
+        if self._heading_level:
+            text = f"{'#' * self._heading_level} {text}"
+        self.lines.append(text)
+        if self._main_depth:
+            self.main_lines.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+
+        # Track nesting of the skipped element so only its own end tag resumes output
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        if tag not in VOID_TAGS and tag != "title" and self._is_boilerplate(tag, attrs):
+            self._skip_tag, self._skip_depth = tag, 1
+            return
+
+        if tag in BLOCK_TAGS:
+            self._flush_line()
+        if tag in HEADING_TAGS:
+            self._heading_level = HEADING_TAGS[tag]
+        if tag in MAIN_TAGS:
+            self._main_depth += 1
+        if tag == "li":
+            self._current.append("- ")
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skip_tag = None
+            return
+
+        if tag in BLOCK_TAGS:
+            self._flush_line()
+        if tag in HEADING_TAGS:
+            self._heading_level = 0
+        if tag in MAIN_TAGS and self._main_depth:
+            self._main_depth -= 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_tag is None:
+            self._current.append(data)
+
+    def close(self):
+        super().close()
+        self._flush_line()
+
+def _dedupe_lines(lines: List[str]) -> List[str]:
+    """Drop non-heading lines repeated within the page, such as duplicated menus."""
+    seen = set()
+    unique = []
+    for line in lines:
+        if line.startswith("#") or line not in seen:
+            unique.append(line)
+            seen.add(line)
+    return unique
+
+def extract_main_content(html: str, min_main_chars: int = 200) -> Tuple[str, str]:
+    """
+    Extract the readable main content of an HTML page.
+    Scripts, styles and navigation chrome are removed, headings are kept as markdown
+    headings, and the content of <main>/<article> is preferred when it is substantial.
+
+    Args:
+        html (str): The rendered HTML content.
+        min_main_chars (int): Minimum size of the <main>/<article> text for it to be preferred.
+
+    Returns:
+        Tuple[str, str]: (extracted text, page title).
+    """
+    parser = _ContentParser()
+    parser.feed(html)
+    parser.close()
+
+    lines = parser.main_lines if sum(len(line) for line in parser.main_lines) >= min_main_chars else parser.lines
+    return "\n".join(_dedupe_lines(lines)), " ".join(parser.title.split())
+
+class BoilerplateFilter:
+    """
+    Removes lines repeated across many pages of the same site, such as footers and menus
+    that were not marked up as navigation. The line hashes of each page are stored per host
+    and URL, so a line counts once per distinct page and re-fetching a page replaces its lines
+    instead of counting them again. Counts are kept on disk, so they survive restarts.
+    """
+    def __init__(self, path: str = HTML_BOILERPLATE_PATH, min_pages: int = 3, max_ratio: float = 0.5):
+        self.min_pages = min_pages
+        self.max_ratio = max_ratio
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS pages (host TEXT NOT NULL, url TEXT NOT NULL, PRIMARY KEY (host, url))")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_lines (host TEXT NOT NULL, line_hash BLOB NOT NULL, url TEXT NOT NULL, "
+            "PRIMARY KEY (host, line_hash, url)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_page_lines_url ON page_lines (host, url)")
+        self._conn.commit()
+
+    def _line_counts(self, host: str, hashes: List[bytes]) -> dict:
+        """Return the number of distinct pages of the host holding each line hash."""
+        counts = {}
+        for offset in range(0, len(hashes), SQLITE_MAX_PARAMS):
+            group = hashes[offset:offset + SQLITE_MAX_PARAMS]
+            rows = self._conn.execute(
+                f"SELECT line_hash, COUNT(*) FROM page_lines WHERE host = ? AND line_hash IN ({','.join('?' * len(group))}) GROUP BY line_hash",
+                (host, *group),
+            )
+            counts.update(rows)
+        return counts
+
+    def filter(self, url: str, text: str) -> str:
+        """
+        Record the lines of a page and return it without lines seen on most pages of the host.
+
+        Args:
+            url (str): The URL of the page.
+            text (str): The extracted page text.
+
+        Returns:
+            str: The page text without site-wide boilerplate lines.
+        """
+        host = urlparse(url).netloc
+        lines = text.split("\n")
+        hashes = [hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest() for line in lines]
+        unique_hashes = list(set(hashes))
+
+        with self._lock:
+            # Replace the lines recorded for this URL by a previous fetch
+            self._conn.execute("DELETE FROM page_lines WHERE host = ? AND url = ?", (host, url))
+            self._conn.execute("INSERT OR IGNORE INTO pages (host, url) VALUES (?, ?)", (host, url))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO page_lines (host, line_hash, url) VALUES (?, ?, ?)",
+                [(host, line_hash, url) for line_hash in unique_hashes],
+            )
+            self._conn.commit()
+            pages = self._conn.execute("SELECT COUNT(*) FROM pages WHERE host = ?", (host,)).fetchone()[0]
+
+            # Only judge lines once enough distinct pages of the host have been seen
+            if pages < self.min_pages:
+                return text
+            counts = self._line_counts(host, unique_hashes)
+
+        kept = [line for line, line_hash in zip(lines, hashes) if line.startswith("#") or counts.get(line_hash, 0) / pages <= self.max_ratio]
+        return "\n".join(kept)
+
+_boilerplate_filter = None
+_boilerplate_filter_lock = threading.Lock()
+
+def get_boilerplate_filter() -> BoilerplateFilter:
+    """Return the process-wide boilerplate filter, opening its store on first use."""
+    global _boilerplate_filter
+    with _boilerplate_filter_lock:
+        if _boilerplate_filter is None:
+            _boilerplate_filter = BoilerplateFilter()
+        return _boilerplate_filter
+
+class _LinkParser(HTMLParser):
+    """Collects anchor targets and the canonical link of a page."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.canonical = None
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        if tag == "a" and attributes.get("href"):
+            if "nofollow" not in (attributes.get("rel") or "").lower():
+                self.links.append(attributes["href"])
+        elif tag == "link" and "canonical" in (attributes.get("rel") or "").lower().split() and attributes.get("href"):
+            self.canonical = attributes["href"]
+
+def extract_links(html: str) -> Tuple[List[str], str]:
+    """
+    Extract the raw link targets and the canonical link of an HTML page.
+
+    Args:
+        html (str): The rendered HTML content.
+
+    Returns:
+        Tuple[List[str], str]: (href values as written in the page, canonical href or None).
+    """
+    parser = _LinkParser()
+    parser.feed(html)
+    parser.close()
+    return parser.links, parser.canonical
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from typing import Iterable, Iterator, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from config.settings import EXTRACTION_WORKERS, STREAMING_EXTRACTION_ENABLED
+from langchain_core.documents import Document
+from utils.text_extractor import extract_text_from_file, iter_documents_from_file
+from utils.file_extractor import READ_CHUNK_SIZE
+
+# Workers never fork the multithreaded server process, whose held locks, SQLite connections
+# and browser threads would be copied into the child in whatever state they were in
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Return the process pool, creating it on first use or after it broke."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context(START_METHOD))
+        return _executor
+
+def _reset_executor():
+    """Discard a broken process pool so the next call starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _extract_worker(path: str, filetype: str, source: str) -> List[Document]:
+    """Extract page or section documents from a spooled file inside a worker process."""
+    with open(path, "rb") as f:
+        if STREAMING_EXTRACTION_ENABLED:
+            return list(iter_documents_from_file(f, filetype, source))
+        return [Document(page_content=extract_text_from_file(f, filetype), metadata={"source": source})]
+
+def _spool_to_disk(file_obj) -> str:
+    """Copy a file object to a temporary file in chunks and return its path."""
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="extract-", delete=False) as spooled:
+        shutil.copyfileobj(file_obj, spooled, READ_CHUNK_SIZE)
+        return spooled.name
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def extract_documents_in_parallel(items: Iterable[Tuple[str, str, object]]) -> Iterator[Tuple[str, str, List[Document], Exception]]:
+    """
+    Extract documents from several files in a process pool, yielding results as they complete.
+
+    Args:
+        items (Iterable[Tuple[str, str, object]]): (filename, file extension, file object) tuples.
+                                                   File objects must expose read(), they are only read
+                                                   before the next item is requested.
+
+    Yields:
+        Tuple[str, str, List[Document], Exception]: (filename, file extension, extracted documents, error).
+                                                    Exactly one of documents and error is None.
+    """
+    max_in_flight = EXTRACTION_WORKERS * 2
+    pending = {}
+
+    def drain(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            filename, file_ext, path = pending.pop(future)
+            _remove(path)
+            try:
+                yield filename, file_ext, future.result(), None
+            except BrokenProcessPool as e:
+                _reset_executor()
+                yield filename, file_ext, None, e
+            except Exception as e:
+                yield filename, file_ext, None, e
+
+    try:
+        for filename, file_ext, file_obj in items:
+            # Only a temporary file path crosses the process boundary, so members in flight
+            # stay on disk instead of in memory, and uploaded file objects need not be picklable
+            path = _spool_to_disk(file_obj)
+            try:
+                pending[_get_executor().submit(_extract_worker, path, file_ext, filename)] = (filename, file_ext, path)
+            except BrokenProcessPool as e:
+                _remove(path)
+                _reset_executor()
+                yield filename, file_ext, None, e
+                continue
+
+            # Keep a bounded number of files in flight so extracted documents do not pile up
+            if len(pending) >= max_in_flight:
+                yield from drain(FIRST_COMPLETED)
+
+        while pending:
+            yield from drain(FIRST_COMPLETED)
+    finally:
+        # Drop the spooled files of extractions abandoned by a consumer that stopped early
+        for future, (_, _, path) in pending.items():
+            future.cancel()
+            _remove(path)
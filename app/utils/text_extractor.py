@@ -1,15 +1,15 @@
 import docx
-import streamlit as st
-from io import BytesIO
-from typing import Union
+from io import TextIOWrapper
+from typing import BinaryIO, Iterator
 from PyPDF2 import PdfReader
+from langchain_core.documents import Document
 
-def extract_text_from_file(file: Union[BytesIO, st.runtime.uploaded_file_manager.UploadedFile], filetype: str) -> str:
+def extract_text_from_file(file: BinaryIO, filetype: str) -> str:
     """
     Extract text content from a file based on its type.
 
     Args:
-        file (Union[BytesIO, UploadedFile]): The uploaded file.
+        file (BinaryIO): The uploaded file or any binary file object.
         filetype (str): File extension indicating the type (e.g., .pdf, .txt, .docx).
     """
         
@@ -18,11 +18,76 @@ def extract_text_from_file(file: Union[BytesIO, st.runtime.uploaded_file_manager
         return "\n".join(page.extract_text() or "" for page in reader.pages)
     
     elif filetype == ".txt":
-        return file.getvalue().decode("utf-8")  
+        file.seek(0)
+        return file.read().decode("utf-8")
 
     elif filetype == ".docx":
         doc = docx.Document(file)
         return "\n".join([para.text for para in doc.paragraphs])
 
     else:
-        raise ValueError(f"Unsupported file type: {filetype}")
\ No newline at end of file
+        raise ValueError(f"Unsupported file type: {filetype}")
+
+def iter_documents_from_file(file: BinaryIO, filetype: str, source: str, max_section_chars: int = 20000) -> Iterator[Document]:
+    """
+    Lazily extract page or section sized documents from a file based on its type.
+    PDF pages are yielded one at a time with their page number, DOCX paragraphs are
+    grouped into sections delimited by headings, and TXT files are read in blocks.
+
+    Args:
+        file (BinaryIO): The uploaded file or any binary file object.
+        filetype (str): File extension indicating the type (e.g., .pdf, .txt, .docx).
+        source (str): The source name stored in the document metadata.
+        max_section_chars (int): Maximum size of a DOCX section or TXT block before it is yielded.
+
+    Yields:
+        Document: A LangChain document per page, section or block.
+    """
+    if filetype == ".pdf":
+        reader = PdfReader(file)
+        for page_number, page in enumerate(reader.pages, start=1):
+            text = page.extract_text() or ""
+            if text.strip():
+                yield Document(page_content=text, metadata={"source": source, "page": page_number})
+
+    elif filetype == ".txt":
+        file.seek(0)
+        reader = TextIOWrapper(file, encoding="utf-8")
+        block, block_chars, block_number = [], 0, 1
+        # Reading at most a block per line keeps text without line breaks from being read whole
+        for line in iter(lambda: reader.readline(max_section_chars), ""):
+            block.append(line)
+            block_chars += len(line)
+
+            # Prefer cutting blocks at blank lines so paragraphs stay together, but cut at the
+            # current line once a block without blank lines grows to twice the maximum
+            if block_chars >= 2 * max_section_chars or (block_chars >= max_section_chars and not line.strip()):
+                yield Document(page_content="".join(block), metadata={"source": source, "section": block_number})
+                block, block_chars, block_number = [], 0, block_number + 1
+
+        # Detach so closing the wrapper does not close the uploaded file
+        reader.detach()
+        if "".join(block).strip():
+            yield Document(page_content="".join(block), metadata={"source": source, "section": block_number})
+
+    elif filetype == ".docx":
+        doc = docx.Document(file)
+        section, section_chars, section_number, heading = [], 0, 1, ""
+        for para in doc.paragraphs:
+            is_heading = para.style is not None and para.style.name.startswith("Heading")
+
+            # Start a new section at each heading or when the current one grows too large
+            if section and (is_heading or section_chars >= max_section_chars):
+                yield Document(page_content="\n".join(section), metadata={"source": source, "section": section_number, "heading": heading})
+                section, section_chars, section_number = [], 0, section_number + 1
+
+            if is_heading:
+                heading = para.text
+            section.append(para.text)
+            section_chars += len(para.text)
+
+        if "\n".join(section).strip():
+            yield Document(page_content="\n".join(section), metadata={"source": source, "section": section_number, "heading": heading})
+
+    else:
+        raise ValueError(f"Unsupported file type: {filetype}")
@@ -0,0 +1,89 @@
+import re
+import json
+from typing import List
+from config.settings import TOKENIZER_ENCODING
+
+# Fast local tokenizer, the regex estimate only covers a tiktoken encoding that cannot be loaded, e.g. offline on first use
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+except Exception:
+    _encoding = None
+
+# Runs of up to four word characters and single punctuation marks, the units of the regex estimate
+TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+# Role and separator tokens every chat message adds to the prompt
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Key of the cached count in the message response metadata, never sent to the model
+TOKEN_COUNT_KEY = "token_count"
+
+def count_text_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the local tokenizer.
+    Without tiktoken, long words are counted as one token per four characters,
+    which tracks subword tokenizers closely enough for trimming.
+
+    Args:
+        text (str): The text to count.
+
+    Returns:
+        int: Number of tokens.
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode_ordinary(text))
+    return len(TOKEN_PATTERN.findall(text))
+
+def message_token_count(message) -> int:
+    """
+    Return the token count of a message, computing and caching it on first use.
+    The count lives in the message response metadata, so it travels with the message
+    through the session history and the graph state.
+
+    Args:
+        message (BaseMessage): The chat message.
+
+    Returns:
+        int: Number of tokens including the per-message overhead.
+    """
+    cached = message.response_metadata.get(TOKEN_COUNT_KEY)
+    if cached is not None:
+        return cached
+
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    count = MESSAGE_OVERHEAD_TOKENS + count_text_tokens(content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        count += count_text_tokens(json.dumps([call.get("args", {}) for call in tool_calls]))
+
+    message.response_metadata[TOKEN_COUNT_KEY] = count
+    return count
+
+def trim_history(messages: List, max_tokens: int) -> List:
+    """
+    Keep the most recent messages that fit in the token budget, starting on a human message.
+    Same result as trim_messages with strategy "last" and start_on "human", but every count is
+    cached so each turn only tokenizes the messages added since the previous one.
+
+    Args:
+        messages (List): Conversation history without system messages.
+        max_tokens (int): Token budget for the kept messages.
+
+    Returns:
+        List: The trimmed history.
+    """
+    total = 0
+    start = len(messages)
+    for index in range(len(messages) - 1, -1, -1):
+        total += message_token_count(messages[index])
+        if total > max_tokens:
+            break
+        start = index
+
+    # Drop leading messages until the history starts on a human message
+    while start < len(messages) and messages[start].type != "human":
+        start += 1
+    return messages[start:]
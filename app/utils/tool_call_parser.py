@@ -1,46 +1,128 @@
 import json
 import uuid
+from typing import Optional
 from config.logging_config import setup_logging, EnhancedLogger
 
 logger = EnhancedLogger(setup_logging())
 
+class IncrementalJSONParser:
+    """
+    Track a JSON object while it streams in, chunk by chunk.
+    Strings and escapes are followed so braces inside values never count, the object is
+    reported complete as soon as its outermost brace closes, and a truncated stream can be
+    closed with exactly the brackets that are still open.
+    """
+    def __init__(self):
+        self._chars = []
+        self._closers = []
+        self._in_string = False
+        self._escaped = False
+        self.complete = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chars)
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Consume the next streamed chunk.
+
+        Args:
+            chunk (str): Text received from the LLM.
+
+        Returns:
+            bool: True once the outermost JSON object is complete.
+        """
+        for char in chunk:
+            if self.complete:
+                break
+            self._chars.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._closers.append("}")
+            elif char == "[":
+                self._closers.append("]")
+            elif char in "}]" and self._closers:
+                self._closers.pop()
+                if not self._closers:
+                    self.complete = True
+        return self.complete
+
+    def result(self) -> Optional[dict]:
+        """
+        Decode the object, closing any brackets left open by a truncated stream.
+
+        Returns:
+            dict: The decoded object.
+            None: If the text is cut inside a string or is not valid JSON.
+        """
+        text = self.text.strip()
+        if not self.complete:
+            if self._in_string or not self._closers:
+                logger.parser_error("Incomplete JSON: stream ended inside a string or before any object")
+                return None
+            logger.parser_warning(f"Closing {len(self._closers)} unbalanced bracket(s) of a truncated tool call")
+            text += "".join(reversed(self._closers))
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.parser_error(f"JSON decode error: {str(e)}")
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
+def parse_tool_call_object(parsed: dict):
+    """
+    Map an already decoded tool call object to the LangChain tool call format.
+
+    Args:
+        parsed (dict): The decoded JSON object.
+
+    Returns:
+        dict: Parsed tool call with function name and arguments.
+        None: If the structure is invalid.
+    """
+    if not parsed or "tool_call" not in parsed:
+        logger.parser_warning("No tool call field found in the parsed JSON")
+        return None
+
+    call = parsed["tool_call"]
+
+    # Ensure required fields are present
+    if not isinstance(call, dict) or "function" not in call or "arguments" not in call:
+        logger.parser_error("Invalid tool call format: Missing required fields")
+        return None
+
+    # Map the tool call to the expected format
+    call["name"] = call.pop("function", "")
+    call["args"] = call.pop("arguments", {})
+    call["id"] = call.get("id", str(uuid.uuid4()))
+    return call
+
 def parse_tool_call(response):
     """
     Parse the tool call from the LLM response when we've already identified it as a potential JSON.
 
     Args:
         response (str): The LLM response content.
-        
+
     Returns:
         dict: Parsed tool call with function name and arguments.
         None: If the parsing fails or the structure is invalid.
     """
     try:
-        # Attempt to parse as JSON
-        parsed = json.loads(response.content)
-        
-        # Validate the structure
-        if "tool_call" in parsed:
-            call = parsed["tool_call"]
-            
-            # Ensure required fields are present
-            if "function" not in call or "arguments" not in call:
-                logger.parser_error("Invalid tool call format: Missing required fields")
-                return None
-                
-            # Map the tool call to the expected format
-            call["name"] = call.pop("function", "")
-            call["args"] = call.pop("arguments", {})
-            call["id"] = call.get("id", str(uuid.uuid4()))
-            return call
-        else:
-            logger.parser_warning("No tool call field found in the parsed JSON")
-            return None
-            
-    except json.JSONDecodeError as e:
-        logger.parser_error(f"JSON decode error: {str(e)}")
-        return None
-    
+        parser = IncrementalJSONParser()
+        parser.feed(response.content)
+        return parse_tool_call_object(parser.result())
+
     except Exception as e:
         logger.parser_error(f"Error parsing tool call: {str(e)}")
-        return None
\ No newline at end of file
+        return None
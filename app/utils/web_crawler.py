@@ -0,0 +1,226 @@
+import time
+import queue
+import asyncio
+import urllib.request
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Tuple
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, CRAWL_CONCURRENCY, CRAWL_HOST_DELAY, CRAWL_USE_SITEMAP, BROWSER_TIMEOUT_MS
+from utils.html_extractor import extract_links
+from utils.web_scraper import browser_pool
+from utils.web_fetcher import afetch_page, with_links
+
+logger = EnhancedLogger(setup_logging())
+
+# Link targets that never lead to an HTML page
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".zip", ".rar", ".gz",
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".mp3", ".mp4", ".avi", ".css", ".js", ".xml",
+)
+
+_DONE = object()
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so the same page is only crawled once.
+    Lowercases the scheme and host, drops fragments, default ports, tracking parameters
+    and trailing slashes, and sorts the query parameters.
+
+    Args:
+        url (str): The absolute URL to normalize.
+
+    Returns:
+        str: The canonical form of the URL.
+    """
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    if parsed.port and not ((scheme == "http" and parsed.port == 80) or (scheme == "https" and parsed.port == 443)):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if not k.lower().startswith("utm_")))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+class HostRateLimiter:
+    """Spaces out requests to the same host by a minimum delay."""
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._locks = {}
+        self._last_request = {}
+
+    async def wait(self, host: str):
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            elapsed = time.monotonic() - self._last_request.get(host, 0.0)
+            if elapsed < self.delay:
+                await asyncio.sleep(self.delay - elapsed)
+            self._last_request[host] = time.monotonic()
+
+def _fetch_sitemap_urls(sitemap_url: str, max_urls: int, depth: int = 0) -> List[str]:
+    """Read page URLs from a sitemap, following one level of sitemap indexes."""
+    try:
+        with urllib.request.urlopen(sitemap_url, timeout=BROWSER_TIMEOUT_MS / 1000) as response:
+            root = ET.fromstring(response.read())
+    except Exception as e:
+        logger.warning(f"Sitemap not available at {sitemap_url}: {e}")
+        return []
+
+    urls = []
+    for element in root.iter():
+        if not element.tag.endswith("loc") or not element.text:
+            continue
+        loc = element.text.strip()
+        if root.tag.endswith("sitemapindex") and depth == 0:
+            urls.extend(_fetch_sitemap_urls(loc, max_urls - len(urls), depth + 1))
+        else:
+            urls.append(loc)
+        if len(urls) >= max_urls:
+            break
+    return urls[:max_urls]
+
+class SiteCrawler:
+    """
+    Concurrent same-domain crawler fetching pages through the conditional fetch layer,
+    which falls back to the shared browser pool for pages that need rendering.
+    Pages are emitted as soon as they are fetched, so indexing can start before the crawl ends.
+    """
+    def __init__(
+        self,
+        start_url: str,
+        index_key: str,
+        max_depth: int = CRAWL_MAX_DEPTH,
+        max_pages: int = CRAWL_MAX_PAGES,
+        concurrency: int = CRAWL_CONCURRENCY,
+        host_delay: float = CRAWL_HOST_DELAY,
+        use_sitemap: bool = CRAWL_USE_SITEMAP,
+        known_urls: set = None,
+    ):
+        self.start_url = canonicalize_url(start_url)
+        self.host = urlparse(self.start_url).netloc
+        self.index_key = index_key
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.use_sitemap = use_sitemap
+        self.known_urls = known_urls or set()
+        self.rate_limiter = HostRateLimiter(host_delay)
+        self._seen = set()
+        self._scheduled = 0
+
+    def _accept(self, url: str) -> str:
+        """Return the canonical URL if it belongs to the site and was not seen yet, else None."""
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+            return None
+        canonical = canonicalize_url(url)
+        if urlparse(canonical).netloc != self.host or canonical in self._seen:
+            return None
+        return canonical
+
+    def _schedule(self, frontier: asyncio.Queue, url: str, depth: int):
+        """Queue a URL unless it is off-site, already seen or past the page limit."""
+        if self._scheduled >= self.max_pages:
+            return
+        canonical = self._accept(url)
+        if canonical is None:
+            return
+        self._seen.add(canonical)
+        self._scheduled += 1
+        frontier.put_nowait((canonical, depth))
+
+    async def _worker(self, frontier: asyncio.Queue, emit):
+        while True:
+            url, depth = await frontier.get()
+            try:
+                await self.rate_limiter.wait(self.host)
+
+                # Only previously indexed pages are fetched conditionally
+                fetched = await afetch_page(url, self.index_key, conditional=url in self.known_urls)
+
+                # Unchanged pages are not emitted for indexing but their stored links are still followed
+                if fetched["unchanged"]:
+                    links = fetched["state"].get("links", [])
+                    emit((url, None, None, fetched["state"]))
+                else:
+                    links, canonical = extract_links(fetched["html"])
+
+                    # Skip pages that declare another URL as canonical when that URL was already crawled
+                    if canonical:
+                        canonical_url = canonicalize_url(urljoin(url, canonical))
+                        if canonical_url != url and canonical_url in self._seen:
+                            continue
+                        self._seen.add(canonical_url)
+
+                    emit((url, fetched["html"], None, with_links(fetched["state"], links)))
+
+                if depth < self.max_depth:
+                    for link in links:
+                        self._schedule(frontier, urljoin(url, link), depth + 1)
+
+            except Exception as e:
+                logger.error(f"Crawling {url}", e)
+                emit((url, None, e, None))
+
+            finally:
+                frontier.task_done()
+
+    async def crawl(self, emit):
+        """
+        Crawl the site, calling emit with (url, html, error, state) for every page as it completes.
+
+        Args:
+            emit (Callable): Receives one (url, html, error, state) tuple per page. html is None for
+                             failed and unchanged pages, state is the fetch state to save once indexed.
+        """
+        frontier = asyncio.Queue()
+        self._schedule(frontier, self.start_url, 0)
+
+        # Seed the frontier with the sitemap pages of the site
+        if self.use_sitemap:
+            sitemap_url = urljoin(self.start_url, "/sitemap.xml")
+            for url in await asyncio.to_thread(_fetch_sitemap_urls, sitemap_url, self.max_pages):
+                self._schedule(frontier, url, self.max_depth)
+
+        workers = [asyncio.create_task(self._worker(frontier, emit)) for _ in range(self.concurrency)]
+        try:
+            await frontier.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+def iter_crawled_pages(start_url: str, index_key: str, **crawler_options) -> Iterator[Tuple[str, str, Exception, dict]]:
+    """
+    Crawl a site on the browser pool's event loop and yield pages as they are rendered.
+
+    Args:
+        start_url (str): The URL the crawl starts from.
+        index_key (str): Key of the index the pages are crawled for, from local_index_key.
+        **crawler_options: Options forwarded to SiteCrawler (max_depth, max_pages, known_urls, ...).
+
+    Yields:
+        Tuple[str, str, Exception, dict]: (url, html, error, state). html is None for failed pages,
+                                          which carry the error, and for unchanged pages.
+    """
+    crawler = SiteCrawler(start_url, index_key, **crawler_options)
+    results = queue.Queue()
+
+    async def run():
+        try:
+            await crawler.crawl(results.put)
+        finally:
+            results.put(_DONE)
+
+    future = browser_pool.submit(run())
+    try:
+        while (item := results.get()) is not _DONE:
+            yield item
+
+        # Surface errors raised outside of individual pages
+        future.result()
+    finally:
+        # Stop crawling when the consumer stops early
+        future.cancel()
@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+from typing import List
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import WEB_FETCH_STATE_PATH, WEB_HTTP_FAST_PATH_ENABLED, WEB_STATIC_MIN_TEXT_CHARS, WEB_HTTP_TIMEOUT, WEB_USER_AGENT, WEB_HTTP_RECHECK_INTERVAL
+from utils.html_extractor import extract_main_content
+from utils.web_scraper import browser_pool, get_rendered_webpage
+
+logger = EnhancedLogger(setup_logging())
+
+# Markers of client-side rendered pages whose HTML is an empty shell
+SPA_MARKERS = re.compile(
+    r'<div[^>]+id=["\'](root|app|__next|__nuxt)["\'][^>]*>\s*</div>|enable javascript|requires javascript',
+    re.IGNORECASE,
+)
+
+class FetchStateStore:
+    """
+    Remembers the HTTP validators, content hash and rendering needs of each fetched URL, per index.
+    State is written by the caller once the page was indexed, so a failed indexing run
+    never marks a page as unchanged, and indexing a page into one index never marks it
+    as unchanged for another.
+    """
+    def __init__(self, path: str = WEB_FETCH_STATE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_state ("
+            "index_key TEXT NOT NULL, url TEXT NOT NULL, etag TEXT, last_modified TEXT, content_hash TEXT, "
+            "needs_render INTEGER NOT NULL DEFAULT 0, http_checked_at REAL, links TEXT, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (index_key, url))"
+        )
+        self._conn.commit()
+
+    def get(self, index_key: str, url: str) -> dict:
+        """Return the stored state of a URL in an index, or an empty dict."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, content_hash, needs_render, http_checked_at, links FROM page_state "
+                "WHERE index_key = ? AND url = ?",
+                (index_key, url),
+            ).fetchone()
+        if row is None:
+            return {}
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "content_hash": row[2],
+            "needs_render": bool(row[3]),
+            "http_checked_at": row[4] or 0.0,
+            "links": json.loads(row[5]) if row[5] else [],
+        }
+
+    def save(self, index_key: str, url: str, state: dict):
+        """Store the state returned by fetch_page for a URL in an index."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO page_state "
+                "(index_key, url, etag, last_modified, content_hash, needs_render, http_checked_at, links, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    index_key, url, state.get("etag"), state.get("last_modified"), state.get("content_hash"),
+                    int(state.get("needs_render", False)), state.get("http_checked_at"),
+                    json.dumps(state.get("links") or []), time.time(),
+                ),
+            )
+            self._conn.commit()
+
+_fetch_state = None
+_fetch_state_lock = threading.Lock()
+
+def get_fetch_state() -> FetchStateStore:
+    """Return the process-wide fetch state store, opening it on first use."""
+    global _fetch_state
+    with _fetch_state_lock:
+        if _fetch_state is None:
+            _fetch_state = FetchStateStore()
+        return _fetch_state
+
+def _http_get(url: str, state: dict) -> dict:
+    """Issue a conditional GET request and return its status, headers and body."""
+    headers = {"User-Agent": WEB_USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=WEB_HTTP_TIMEOUT) as response:
+            charset = response.headers.get_content_charset() or "utf-8"
+            return {
+                "status": response.status,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_type": response.headers.get("Content-Type", ""),
+                "body": response.read().decode(charset, errors="replace"),
+            }
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return {"status": 304}
+        raise
+
+def _text_hash(text: str) -> str:
+    """
+    Hash the readable text of a page.
+    Rendered HTML changes on every load (nonces, timestamps, session tokens), its text only when the content does.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _looks_static(html: str, text: str) -> bool:
+    """Tell whether the HTML already holds the page content, extracted as text, without running JavaScript."""
+    return not SPA_MARKERS.search(html) and len(text) >= WEB_STATIC_MIN_TEXT_CHARS
+
+def _http_stage(url: str, index_key: str, conditional: bool) -> dict:
+    """
+    Run the plain HTTP part of a fetch: the conditional request and the static page check.
+
+    Returns:
+        dict: The fetch result so far; "html" is None when the page still has to be rendered.
+    """
+    state = get_fetch_state().get(index_key, url) if conditional else {}
+    result = {"url": url, "html": None, "unchanged": False, "rendered": False, "state": dict(state)}
+
+    # Validators of a JavaScript page only describe its shell, so go straight to the browser
+    # until it is time to check again whether the plain client can serve it
+    now = time.time()
+    if state.get("needs_render") and now - state.get("http_checked_at", 0.0) < WEB_HTTP_RECHECK_INTERVAL:
+        return result
+    result["state"]["http_checked_at"] = now
+
+    try:
+        response = _http_get(url, state)
+    except Exception as e:
+        # Let the browser try pages the plain client cannot fetch, the plain client is tried again after the recheck interval
+        logger.warning(f"Plain HTTP fetch failed for {url}: {e}")
+        result["state"]["needs_render"] = True
+        return result
+
+    if response["status"] == 304:
+        result["unchanged"] = True
+        return result
+
+    body = response["body"]
+    text = extract_main_content(body)[0] if WEB_HTTP_FAST_PATH_ENABLED and "html" in response["content_type"] else ""
+    if not _looks_static(body, text):
+        result["state"]["needs_render"] = True
+        return result
+
+    # Serve static pages straight from the HTTP response
+    page_hash = _text_hash(text)
+    result["state"].update({
+        "etag": response["etag"],
+        "last_modified": response["last_modified"],
+        "content_hash": page_hash,
+        "needs_render": False,
+    })
+    if conditional and page_hash == state.get("content_hash"):
+        result["unchanged"] = True
+    else:
+        result["html"] = body
+    return result
+
+def _render_stage(result: dict, html: str, conditional: bool) -> dict:
+    """Record the rendered HTML and compare the hash of its text against the previous fetch."""
+    page_hash = _text_hash(extract_main_content(html)[0])
+    previous_hash = result["state"].get("content_hash")
+    result["state"].update({"etag": None, "last_modified": None, "content_hash": page_hash, "needs_render": True})
+    result["rendered"] = True
+    if conditional and page_hash == previous_hash:
+        result["unchanged"] = True
+    else:
+        result["html"] = html
+    return result
+
+def fetch_page(url: str, index_key: str, conditional: bool = True) -> dict:
+    """
+    Fetch a page, skipping it when unchanged and rendering it in the browser only when needed.
+
+    Args:
+        url (str): The URL of the page.
+        index_key (str): Key of the index the page is fetched for, from local_index_key.
+        conditional (bool): Whether to compare against the stored state of the URL in that index.
+
+    Returns:
+        dict: "url", "html" (None when unchanged), "unchanged", "rendered", and "state",
+              which the caller saves with get_fetch_state().save() once the page is indexed.
+              The state of unchanged pages is saved here, since there is nothing to index.
+    """
+    result = _http_stage(url, index_key, conditional)
+    if result["html"] is None and not result["unchanged"]:
+        result = _render_stage(result, get_rendered_webpage(url).page_content, conditional)
+    if result["unchanged"]:
+        get_fetch_state().save(index_key, url, result["state"])
+    return result
+
+async def afetch_page(url: str, index_key: str, conditional: bool = True) -> dict:
+    """Async version of fetch_page to be awaited on the browser pool's event loop."""
+    result = await asyncio.to_thread(_http_stage, url, index_key, conditional)
+    if result["html"] is None and not result["unchanged"]:
+        result = _render_stage(result, await browser_pool.arender(url), conditional)
+    if result["unchanged"]:
+        await asyncio.to_thread(get_fetch_state().save, index_key, url, result["state"])
+    return result
+
+def with_links(state: dict, links: List[str]) -> dict:
+    """Return a copy of a fetch state including the outgoing links of the page."""
+    return {**state, "links": list(links)}
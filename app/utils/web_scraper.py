@@ -1,12 +1,145 @@
-from playwright.sync_api import sync_playwright
+import atexit
+import asyncio
+import threading
+from concurrent.futures import Future
+from playwright.async_api import async_playwright
 from langchain.schema import Document
 from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import BROWSER_MAX_PAGES, BROWSER_WAIT_UNTIL, BROWSER_WAIT_FOR_SELECTOR, BROWSER_TIMEOUT_MS, BROWSER_BLOCKED_RESOURCES
 
 logger = EnhancedLogger(setup_logging())
 
+class BrowserPool:
+    """
+    Long-lived headless Chromium shared by every web indexing request.
+    Playwright objects are bound to the event loop that created them, so the browser
+    lives on a dedicated background thread and callers submit rendering jobs to it.
+    """
+    def __init__(
+        self,
+        max_pages: int = BROWSER_MAX_PAGES,
+        wait_until: str = BROWSER_WAIT_UNTIL,
+        wait_for_selector: str = BROWSER_WAIT_FOR_SELECTOR,
+        timeout_ms: int = BROWSER_TIMEOUT_MS,
+        blocked_resources: list = BROWSER_BLOCKED_RESOURCES,
+    ):
+        self.max_pages = max_pages
+        self.wait_until = wait_until
+        self.wait_for_selector = wait_for_selector
+        self.timeout_ms = timeout_ms
+        self.blocked_resources = set(blocked_resources)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._semaphore = None
+        self._startup_lock = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background event loop thread on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    async def _block_resources(self, route):
+        """Abort requests for resources that do not contribute text to the page."""
+        if route.request.resource_type in self.blocked_resources:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _ensure_browser(self):
+        """Launch the browser and its shared context, or relaunch them after a crash."""
+        if self._startup_lock is None:
+            self._startup_lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_pages)
+
+        async with self._startup_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._context = await self._browser.new_context()
+            self._context.set_default_timeout(self.timeout_ms)
+            if self.blocked_resources:
+                await self._context.route("**/*", self._block_resources)
+
+    async def arender(self, url: str, wait_until: str = None, wait_for_selector: str = None) -> str:
+        """
+        Render a page on the pool's event loop and return its HTML.
+
+        Args:
+            url (str): The URL of the webpage to render.
+            wait_until (str): Load state to wait for (commit, domcontentloaded, load or networkidle).
+            wait_for_selector (str): Optional CSS selector that must appear before the content is read.
+
+        Returns:
+            str: The rendered HTML content.
+        """
+        await self._ensure_browser()
+
+        # Cap the number of pages open at the same time
+        async with self._semaphore:
+            page = await self._context.new_page()
+            try:
+                await page.goto(url, wait_until=wait_until or self.wait_until)
+                selector = wait_for_selector or self.wait_for_selector
+                if selector:
+                    await page.wait_for_selector(selector)
+                return await page.content()
+            finally:
+                await page.close()
+
+    def submit(self, coroutine) -> Future:
+        """Schedule a coroutine on the pool's event loop from any thread without waiting."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coroutine, loop)
+
+    def run(self, coroutine):
+        """Run a coroutine on the pool's event loop from any thread and wait for its result."""
+        return self.submit(coroutine).result()
+
+    def render(self, url: str, wait_until: str = None, wait_for_selector: str = None) -> str:
+        """Render a page from any thread and return its HTML."""
+        return self.run(self.arender(url, wait_until, wait_for_selector))
+
+    async def _aclose(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = None
+        self._context = None
+        self._playwright = None
+        self._semaphore = None
+        self._startup_lock = None
+
+    def close(self):
+        """Close the browser and stop the background event loop."""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._aclose(), loop).result(timeout=10)
+        except Exception as e:
+            logger.error("A problem occurred while closing the browser pool", e)
+        loop.call_soon_threadsafe(loop.stop)
+
+# Process-wide browser pool reused across web indexing requests
+browser_pool = BrowserPool()
+atexit.register(browser_pool.close)
+
 def get_rendered_webpage(url: str) -> Document:
     """
-    Scrape and render the content of a webpage using Playwright.
+    Scrape and render the content of a webpage using the shared Playwright browser pool.
 
     Args:
         url (str): The URL of the webpage to scrape.
@@ -15,14 +148,8 @@ def get_rendered_webpage(url: str) -> Document:
         Document: A Langchain Document object containing the rendered HTML content.
     """
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.goto(url)
-            page.wait_for_load_state("networkidle")
-            html = page.content()
-            browser.close()
-            return Document(page_content=html, metadata={"source": url})
+        html = browser_pool.render(url)
+        return Document(page_content=html, metadata={"source": url})
     except Exception as e:
         logger.error("A problem occurred while scraping the webpage", e)
         raise